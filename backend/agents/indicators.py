@@ -0,0 +1,63 @@
+# Rule-based trend from local technical indicators (no LLM)
+# Used by the quick and standard analysis depths in place of the OpenAI trend, prediction and
+# summary steps: the price series is run through the same incremental indicators as the
+# watchlist engine, and the trend is read off the window change and the EMA alignment.
+
+import logging
+from typing import Any, Dict
+from backend.agents.logger import log_agent
+from backend.services.indicators import IndicatorState
+from backend.services.price_series import series_of
+
+logger = logging.getLogger(__name__)
+
+INDICATOR_WINDOW = 14  # bars in the rolling volatility and VWAP, capped by the history length
+
+
+@log_agent("indicators")
+def indicator_agent(state: Any) -> Dict[str, Any]:
+    series = series_of(state)
+    if len(series) < 2:
+        logger.warning("No price data for indicator analysis")
+        return {"trend": {"direction": "Unknown", "strength": "N/A", "confidence": 0.0}, "indicators": {}}
+
+    indicators = IndicatorState(min(INDICATOR_WINDOW, len(series) - 1))
+    for ts, close, high, low, volume in zip(series.timestamps.tolist(), series.close.tolist(), series.high.tolist(),
+                                            series.low.tolist(), series.volume.tolist()):
+        indicators.update(ts, close, high, low, volume)
+    snapshot = indicators.snapshot()
+    stats = series.stats()
+    change = stats["change_pct"]
+
+    # Direction from the window change, confirmed (or not) by the EMA alignment
+    if change > 2:
+        direction = "Uptrend"
+    elif change < -2:
+        direction = "Downtrend"
+    else:
+        direction = "Sideways"
+    ema_agrees = (
+        (direction == "Uptrend" and indicators.ema_fast > indicators.ema_slow)
+        or (direction == "Downtrend" and indicators.ema_fast < indicators.ema_slow)
+    )
+    strength = "Strong" if abs(change) > 8 and ema_agrees else "Moderate" if abs(change) > 5 else "Weak"
+    volatility = stats["volatility_pct"]
+    risk = "High" if volatility > 3 else "Medium" if volatility > 1.5 else "Low"
+    rsi = snapshot["rsi"]
+    rsi_note = f", RSI {rsi:.0f}" if rsi is not None else ""
+
+    return {
+        "trend": {
+            "direction": direction,
+            "strength": strength,
+            "confidence": 0.7 if ema_agrees or direction == "Sideways" else 0.5,
+            "risk": risk,
+            "timeframe": f"{stats['bars']} {series.interval} bars",
+            "summary": (
+                f"Indicator analysis shows {direction.lower()} movement with {change:.1f}% change, "
+                f"{volatility:.2f}% volatility per bar{rsi_note}"
+            ),
+            "source": "indicators",
+        },
+        "indicators": snapshot,
+    }
@@ -7,6 +7,8 @@ from functools import wraps
 from typing import Any, Dict, Callable
 from pymongo import MongoClient
 from backend.config import settings
+from backend.services.news_items import extracted_dicts, news_dicts
+from backend.services.price_series import series_of
 from openai import OpenAIError
 
 logger = logging.getLogger(__name__)
@@ -45,19 +47,22 @@ def logger_agent(state: Any) -> Dict[str, Any]:
             "ticker": ticker,
             "timestamp": datetime.utcnow(),
             "price": getattr(state, "price", None),
-            "prices": getattr(state, "prices", {}),
+            "prices": series_of(state).to_dict(),  # stored in the API's {"date": close} shape
             "sentiment": getattr(state, "sentiment", None),
             "confidence": getattr(state, "confidence", None),
+            "article_sentiments": getattr(state, "article_sentiments", []),  # Per-article scores
             "trend": getattr(state, "trend", {}),
             "recommendation": getattr(state, "recommendation", None),
             "insight": getattr(state, "insight", None),
             "summary": getattr(state, "summary", None),
-            "news": getattr(state, "news", []),
-            "extracted_content": getattr(state, "extracted_content", []),  # Full content
+            "news": news_dicts(getattr(state, "news", [])),
+            "extracted_content": extracted_dicts(state, getattr(state, "extracted_content", [])),  # Full content
             "key_insights": getattr(state, "key_insights", []),  # Advanced insights
             "structured_data": getattr(state, "structured_data", {}),  # Mapped financial data
             "content_quality_score": getattr(state, "content_quality_score", None),  # Quality metrics
-            "chart_url": getattr(state, "chart_url", None)
+            "chart_url": getattr(state, "chart_url", None),
+            "indicators": getattr(state, "indicators", None),  # Local indicator snapshot (quick and standard)
+            "depth": getattr(state, "depth", None) or "deep",
         }
         # Save to MongoDB
         result = mongo.insert_one(analysis_record)
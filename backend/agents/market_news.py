@@ -4,12 +4,17 @@ import logging
 import requests
 import re
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from backend.config import settings
 from backend.agents.logger import log_agent
+from backend.services import article_index, circuit_breaker, deadline, rate_limiter
+from backend.services.news_items import NewsItem, stash_extracted
 
 logger = logging.getLogger(__name__)
 
+# Seconds of the request budget kept free for the LLM steps that run after news gathering
+DOWNSTREAM_RESERVE = 10
+
 @log_agent("market_news") # Logs news search+extract+crawl+map using our logger
 def market_news_agent(state: Any) -> Dict[str, Any]:
     ticker = getattr(state, "ticker", "")
@@ -22,35 +27,53 @@ def market_news_agent(state: Any) -> Dict[str, Any]:
     try:
         logger.info(f"[Tavily] Starting all 4 features for {ticker}: Search + Extract + Crawl + Map")
         
-        # Step 1: SEARCH For News
+        # Step 1: SEARCH For News (required - always runs while any budget is left)
         logger.info(f"[Tavily] Step 1 - SEARCH: Basic news for {ticker}")
-        search_news = _tavily_api_call(api_key, {
-            "query": f"{ticker} stock news earnings financial",
-            "search_depth": "basic",
-            "max_results": 6
-        }, "SEARCH")
+        search_news = _basic_search(api_key, ticker, state)
+        # Articles already indexed for this ticker, including ones fetched for other tickers
+        indexed = _indexed_articles(ticker, search_news)
+        
+        # Steps 2-4 are optional enrichment and are skipped when the budget runs short
+        def _budget(default: float) -> float:
+            return deadline.timeout_for(state, default, DOWNSTREAM_RESERVE)
         
         # Step 2: EXTRACT - Max content extraction from top articles
-        logger.info(f"[Tavily] Step 2 - EXTRACT: Full content from top {min(3, len(search_news))} articles")
-        extracted = _extract_content(api_key, search_news[:3])
+        extracted = []
+        if _budget(25) >= deadline.MIN_CALL_SECONDS:
+            top = (search_news + indexed)[:3]
+            logger.info(f"[Tavily] Step 2 - EXTRACT: Full content from top {len(top)} articles")
+            extracted = _extract_content(api_key, top, timeout=_budget(25), state=state)
+        else:
+            logger.warning(f"[Tavily] Step 2 - EXTRACT skipped: time budget exhausted")
         
         # Step 3: CRAWL - Advanced search
-        logger.info(f"[Tavily] Feature 3 - CRAWL: Advanced search ")
-        crawl_news = _tavily_api_call(api_key, {
-            "query": f"{ticker} financial analysis market outlook", 
-            "search_depth": "advanced",
-            "max_results": 4,
-            "include_raw_content": True,
-            "include_domains": ["bloomberg.com", "reuters.com", "wsj.com", "cnbc.com"],
-            "exclude_domains": ["reddit.com", "twitter.com"]
-        }, "CRAWL")
+        crawl_news = []
+        if _index_is_fresh(ticker, "CRAWL"):
+            logger.info(f"[Tavily] Feature 3 - CRAWL skipped: recent crawl is in the article index")
+        elif _budget(20) >= deadline.MIN_CALL_SECONDS:
+            logger.info(f"[Tavily] Feature 3 - CRAWL: Advanced search ")
+            crawl_news = _tavily_api_call(api_key, {
+                "query": f"{ticker} financial analysis market outlook", 
+                "search_depth": "advanced",
+                "max_results": 4,
+                "include_raw_content": True,
+                "include_domains": ["bloomberg.com", "reuters.com", "wsj.com", "cnbc.com"],
+                "exclude_domains": ["reddit.com", "twitter.com"],
+                **_delta_params(ticker, "CRAWL"),
+            }, "CRAWL", timeout=_budget(20), state=state, index_for=ticker)
+        else:
+            logger.warning(f"[Tavily] Feature 3 - CRAWL skipped: time budget exhausted")
         
         # Step 4: MAP - Structured financial data mapping
-        logger.info(f"[Tavily] Step 4 - MAP: Structured financial data mapping")
-        mapped = _map_financial_data(api_key, ticker)
+        mapped = {}
+        if _budget(15) >= deadline.MIN_CALL_SECONDS:
+            logger.info(f"[Tavily] Step 4 - MAP: Structured financial data mapping")
+            mapped = _map_financial_data(api_key, ticker, timeout=_budget(15), state=state)
+        else:
+            logger.warning(f"[Tavily] Step 4 - MAP skipped: time budget exhausted")
         
         # Process everything
-        result = _process_results(search_news + crawl_news, extracted, mapped)
+        result = _process_results(search_news + crawl_news + indexed, extracted, mapped, state)
         logger.info(f"[Tavily]  ALL 4 FEATURES COMPLETE: {len(result['news'])} articles, {len(result['key_insights'])} insights, quality={result['quality_score']}")
         return result
         
@@ -61,15 +84,97 @@ def market_news_agent(state: Any) -> Dict[str, Any]:
         return {"news": [], "extracted_content": [], "key_insights": [], "structured_data": {}, "content_quality_score": 0}
         
 
-def _tavily_api_call(api_key: str, params: Dict, feature_name: str = "API") -> List[Dict]:
+@log_agent("market_news_basic")  # Logs the search-only news step used by the standard depth
+def market_news_basic_agent(state: Any) -> Dict[str, Any]:
+    """Basic SEARCH only (one Tavily credit): no extract, crawl or map"""
+    ticker = getattr(state, "ticker", "")
+    api_key = settings.TAVILY_API_KEY
+    if not ticker or not api_key:
+        logger.error(f"Missing ticker ({bool(ticker)}) or API key ({bool(api_key)})")
+        return {"news": [], "extracted_content": [], "key_insights": [], "structured_data": {}, "content_quality_score": 0}
+    try:
+        logger.info(f"[Tavily] SEARCH only for {ticker}")
+        search_news = _basic_search(api_key, ticker, state)
+        result = _process_results(search_news + _indexed_articles(ticker, search_news), [], {}, state)
+        logger.info(f"[Tavily] SEARCH complete: {len(result['news'])} articles, quality={result['quality_score']}")
+        return result
+    except Exception as e:
+        logger.error(f"[Tavily] Basic search failed for {ticker}: {e}")
+        return {"news": [], "extracted_content": [], "key_insights": [], "structured_data": {}, "content_quality_score": 0}
+
+def _basic_search(api_key: str, ticker: str, state: Any) -> List[Dict]:
+    """Step 1: the basic news SEARCH (required - always runs while any budget is left, unless the
+    article index already holds a recent search for the ticker)"""
+    if _index_is_fresh(ticker, "SEARCH"):
+        logger.info(f"[Tavily] SEARCH skipped: recent search for {ticker} is in the article index")
+        return []
+    if not deadline.has_time(state, deadline.MIN_CALL_SECONDS):
+        return []
+    return _tavily_api_call(api_key, {
+        "query": f"{ticker} stock news earnings financial",
+        "search_depth": "basic",
+        "max_results": 6,
+        **_delta_params(ticker, "SEARCH"),
+    }, "SEARCH", timeout=max(deadline.MIN_CALL_SECONDS, deadline.timeout_for(state, 20, DOWNSTREAM_RESERVE)),
+        state=state, index_for=ticker)
+
+# --- Article index (cross-ticker reuse); index errors never fail the news step ---
+
+def _index_is_fresh(ticker: str, feature: str) -> bool:
+    if not settings.ARTICLE_INDEX_ENABLED:
+        return False
+    try:
+        return article_index.is_fresh(ticker, feature)
+    except Exception as e:
+        logger.warning(f"[ArticleIndex] Lookup failed for {ticker}: {e}")
+        return False
+
+def _delta_params(ticker: str, feature: str) -> Dict:
+    """Limit a repeat fetch to what was published since the ticker's last one"""
+    if not settings.ARTICLE_INDEX_ENABLED:
+        return {}
+    try:
+        window = article_index.delta_window(ticker, feature)
+    except Exception as e:
+        logger.warning(f"[ArticleIndex] Lookup failed for {ticker}: {e}")
+        return {}
+    return {"time_range": window} if window else {}
+
+def _indexed_articles(ticker: str, fetched: List[Dict]) -> List[Dict]:
+    """Indexed articles for the ticker that this run did not just fetch"""
+    if not settings.ARTICLE_INDEX_ENABLED:
+        return []
+    try:
+        articles = article_index.articles_for(ticker, exclude=[item.get("url") for item in fetched])
+    except Exception as e:
+        logger.warning(f"[ArticleIndex] Lookup failed for {ticker}: {e}")
+        return []
+    logger.info(f"[ArticleIndex] {len(articles)} indexed articles for {ticker}")
+    return articles
+
+def _tavily_api_call(api_key: str, params: Dict, feature_name: str = "API", timeout: float = 20, state: Any = None,
+                     index_for: Optional[str] = None) -> List[Dict]:
     """Unified Tavily API caller with detailed logging"""
     query = params.get('query', 'unknown')
+    breaker = circuit_breaker.get_breaker("tavily")
+    if not breaker.ready():
+        logger.warning(f"[Tavily] {feature_name} - Circuit open, skipping request")
+        return []
+    # Advanced searches cost two credits
+    credits = 2 if params.get("search_depth") == "advanced" else 1
+    if not rate_limiter.acquire_for(state, "tavily", credits, DOWNSTREAM_RESERVE):
+        logger.warning(f"[Tavily] {feature_name} - Rate limit wait exceeded the time budget, skipping request")
+        return []
+    if not rate_limiter.allow_or_refund(breaker, "tavily", credits):
+        logger.warning(f"[Tavily] {feature_name} - Circuit open, skipping request")
+        return []
     logger.info(f"[Tavily] {feature_name} - Sending request: '{query}' with depth='{params.get('search_depth', 'basic')}'")
     
     try:
-        response = requests.post("https://api.tavily.com/search", 
-                               json={"api_key": api_key, **params}, timeout=20)
+        response = requests.post(f"{settings.TAVILY_BASE_URL}/search", 
+                               json={"api_key": api_key, **params}, timeout=timeout)
         response.raise_for_status()
+        breaker.record_success()
         
         results = response.json().get("results", [])
         logger.info(f"[Tavily] {feature_name} - API returned {len(results)} results")
@@ -86,34 +191,77 @@ def _tavily_api_call(api_key: str, params: Dict, feature_name: str = "API") -> L
             })
         
         logger.info(f"[Tavily] {feature_name} - Processed {len(processed_results)} valid items")
+        if index_for and settings.ARTICLE_INDEX_ENABLED:
+            try:
+                article_index.record(index_for, feature_name, processed_results)
+            except Exception as e:
+                logger.warning(f"[ArticleIndex] Could not index {feature_name} results: {e}")
         return processed_results
         
     except requests.exceptions.Timeout:
-        logger.error(f"[Tavily] {feature_name} - API call TIMEOUT after 20s")
+        breaker.record_failure()
+        logger.error(f"[Tavily] {feature_name} - API call TIMEOUT after {timeout:.1f}s")
         return []
     except requests.exceptions.HTTPError as e:
+        if circuit_breaker.is_provider_failure(e):
+            breaker.record_failure()
         logger.error(f"[Tavily] {feature_name} - HTTP ERROR: {e.response.status_code}")
         return []
     except Exception as e:
+        if circuit_breaker.is_provider_failure(e):
+            breaker.record_failure()
         logger.error(f"[Tavily] {feature_name} - UNEXPECTED ERROR: {e}")
         return []
 
-def _extract_content(api_key: str, news_items: List[Dict]) -> List[Dict]:
+def _extract_content(api_key: str, news_items: List[Dict], timeout: float = 25, state: Any = None) -> List[Dict]:
     """ EXTRACT - Advanced content extraction with detailed logging"""
     urls = [item["url"] for item in news_items if item.get("url")][:3]
     if not urls:
         logger.warning("[Tavily] EXTRACT - No URLs to extract from")
         return []
     
+    # Full text already extracted for any ticker comes from the article index
+    indexed = {}
+    if settings.ARTICLE_INDEX_ENABLED:
+        try:
+            indexed = article_index.extracted_for(urls)
+        except Exception as e:
+            logger.warning(f"[ArticleIndex] Extract lookup failed: {e}")
+    if indexed:
+        logger.info(f"[Tavily] EXTRACT - {len(indexed)} of {len(urls)} articles already in the article index")
+    missing = [url for url in urls if url not in indexed]
+    if not missing:
+        return [indexed[url] for url in urls]
+    fetched = _extract_urls(api_key, missing, timeout, state)
+    if fetched and settings.ARTICLE_INDEX_ENABLED:
+        try:
+            article_index.record_extracted(getattr(state, "ticker", "") or "", fetched)
+        except Exception as e:
+            logger.warning(f"[ArticleIndex] Could not index extracted articles: {e}")
+    return [indexed[url] for url in urls if url in indexed] + fetched
+
+def _extract_urls(api_key: str, urls: List[str], timeout: float = 25, state: Any = None) -> List[Dict]:
+    """EXTRACT request for the given URLs"""
+    breaker = circuit_breaker.get_breaker("tavily")
+    if not breaker.ready():
+        logger.warning("[Tavily] EXTRACT - Circuit open, skipping request")
+        return []
+    if not rate_limiter.acquire_for(state, "tavily", 1, DOWNSTREAM_RESERVE):
+        logger.warning("[Tavily] EXTRACT - Rate limit wait exceeded the time budget, skipping request")
+        return []
+    if not rate_limiter.allow_or_refund(breaker, "tavily", 1):
+        logger.warning("[Tavily] EXTRACT - Circuit open, skipping request")
+        return []
     logger.info(f"[Tavily] EXTRACT - Requesting full content from {len(urls)} URLs")
     
     try:
-        response = requests.post("https://api.tavily.com/extract", json={
+        response = requests.post(f"{settings.TAVILY_BASE_URL}/extract", json={
             "api_key": api_key,
             "urls": urls,
             "include_raw_content": True
-        }, timeout=25)
+        }, timeout=timeout)
         response.raise_for_status()
+        breaker.record_success()
         
         api_results = response.json().get("results", [])
         logger.info(f"[Tavily] EXTRACT - API returned {len(api_results)} extracted articles")
@@ -137,27 +285,41 @@ def _extract_content(api_key: str, news_items: List[Dict]) -> List[Dict]:
         return results
         
     except requests.exceptions.Timeout:
-        logger.error("[Tavily] EXTRACT - TIMEOUT after 25s")
+        breaker.record_failure()
+        logger.error(f"[Tavily] EXTRACT - TIMEOUT after {timeout:.1f}s")
         return []
     except Exception as e:
+        if circuit_breaker.is_provider_failure(e):
+            breaker.record_failure()
         logger.error(f"[Tavily] EXTRACT - ERROR: {e}")
         return []
 
-def _map_financial_data(api_key: str, ticker: str) -> Dict:
+def _map_financial_data(api_key: str, ticker: str, timeout: float = 15, state: Any = None) -> Dict:
     """MAP - Structured financial data mapping with detailed logging"""
     query = f"{ticker} stock price earnings revenue financial metrics"
+    breaker = circuit_breaker.get_breaker("tavily")
+    if not breaker.ready():
+        logger.warning("[Tavily] MAP - Circuit open, skipping request")
+        return {}
+    if not rate_limiter.acquire_for(state, "tavily", 2, DOWNSTREAM_RESERVE):
+        logger.warning("[Tavily] MAP - Rate limit wait exceeded the time budget, skipping request")
+        return {}
+    if not rate_limiter.allow_or_refund(breaker, "tavily", 2):
+        logger.warning("[Tavily] MAP - Circuit open, skipping request")
+        return {}
     logger.info(f"[Tavily] MAP - Requesting structured data: '{query}'")
     
     try:
-        response = requests.post("https://api.tavily.com/search", json={
+        response = requests.post(f"{settings.TAVILY_BASE_URL}/search", json={
             "api_key": api_key,
             "query": query,
             "search_depth": "advanced", 
             "include_answer": True, 
             "max_results": 3,
             "include_domains": ["finance.yahoo.com", "marketwatch.com", "bloomberg.com"]
-        }, timeout=15)
+        }, timeout=timeout)
         response.raise_for_status()
+        breaker.record_success()
         
         data = response.json()
         answer = data.get("answer", "")
@@ -177,9 +339,12 @@ def _map_financial_data(api_key: str, ticker: str) -> Dict:
         return mapped
         
     except requests.exceptions.Timeout:
-        logger.error("[Tavily] MAP - TIMEOUT after 15s")
+        breaker.record_failure()
+        logger.error(f"[Tavily] MAP - TIMEOUT after {timeout:.1f}s")
         return {}
     except Exception as e:
+        if circuit_breaker.is_provider_failure(e):
+            breaker.record_failure()
         logger.error(f"[Tavily] MAP - ERROR: {e}")
         return {}
 
@@ -213,7 +378,7 @@ def _quick_analysis(content: str) -> Dict:
         "sentiment_indicators": sentiment
     }
 
-def _process_results(all_news: List[Dict], extracted: List[Dict], mapped: Dict) -> Dict:
+def _process_results(all_news: List[Dict], extracted: List[Dict], mapped: Dict, state: Any = None) -> Dict:
     """Ultra-fast processing and insights extraction"""
     
     # Deduplicate by URL and score
@@ -267,9 +432,10 @@ def _process_results(all_news: List[Dict], extracted: List[Dict], mapped: Dict)
     
     logger.info(f"[Tavily] PROCESSING - Unique articles: {len(unique_news)}, Insights: {len(insights)}, Avg quality: {avg_quality}")
     
+    # Article bodies go to the run's blob arena; the state only carries compact records and references
     return {
-        "news": unique_news[:8],  # Top 8 articles
-        "extracted_content": extracted,
+        "news": [NewsItem.from_dict(item, state) for item in unique_news[:8]],  # Top 8 articles
+        "extracted_content": stash_extracted(state, extracted),
         "key_insights": insights,
         "structured_data": mapped,
         "quality_score": avg_quality
@@ -1,36 +1,51 @@
 # Uses OpenAI to make a buy/hold/sell recommendation based on all analysis
 
-import json
-import re
 import logging
 from typing import Any, Dict
-import openai
-from openai import OpenAIError
-from backend.config import settings
 from backend.agents.logger import log_agent
-from openai import OpenAIError
+from backend.services import llm_gateway
+from backend.services.price_series import series_of
+from backend.services.stage_cache import reuse_if_unchanged
 
 logger = logging.getLogger(__name__)
 
-openai.api_key = settings.OPENAI_API_KEY
-PRIMARY_MODEL = getattr(settings, "OPENAI_MODEL", "gpt-4")
-FALLBACK_MODEL = "gpt-3.5-turbo"
+PRIMARY_MODEL = llm_gateway.PRIMARY_MODEL
+REQUEST_TIMEOUT = 15
+DOWNSTREAM_RESERVE = 2  # seconds kept for the summary
+
+def _latest_price(state: Any):
+    current_price = getattr(state, "price", None)
+    if isinstance(current_price, (int, float)) and current_price:
+        return current_price
+    return series_of(state).last_close()
+
+# Prediction reads the price, sentiment, trend and the top headlines
+def _prediction_inputs(state: Any) -> Dict[str, Any]:
+    trend = getattr(state, "trend", {}) or {}
+    news = getattr(state, "news", []) or []
+    return {
+        "ticker": getattr(state, "ticker", "").upper(),
+        "model": PRIMARY_MODEL,
+        "price": _latest_price(state),
+        "sentiment": getattr(state, "sentiment", None),
+        "confidence": round(getattr(state, "confidence", 0.0) or 0.0, 2),
+        "trend": {k: trend.get(k) for k in ("direction", "strength", "risk", "summary")},
+        "headlines": [article.get("title") for article in news[:3]],
+        "news_count": len(news),
+    }
+
+# Only OpenAI recommendations are reused; rule-based fallbacks and error results should be retried next run
+def _is_llm_prediction(out: Dict[str, Any]) -> bool:
+    prediction_data = out.get("prediction_data")
+    return bool(prediction_data) and not prediction_data.get("fallback")
 
 @log_agent("prediction")  # Logs prediction using custom logger
+@reuse_if_unchanged("prediction", _prediction_inputs, cacheable=_is_llm_prediction)
 def prediction_agent(state: Any) -> Dict[str, Any]:
     # Gathers data and asks OpenAI for a recommendation
     ticker = getattr(state, "ticker", "")
-    current_price = getattr(state, "price", None)
-    prices = getattr(state, "prices", {})
-    # Use latest price from prices if needed
-    if (not isinstance(current_price, (int, float)) or current_price is None or current_price == 0) and prices:
-        try:
-            current_price = prices[max(prices.keys())]
-        except Exception:
-            try:
-                current_price = list(prices.values())[-1]
-            except Exception:
-                current_price = None
+    # Use the latest close from the price history if needed
+    current_price = _latest_price(state)
     sentiment = getattr(state, "sentiment", "Neutral")
     confidence = getattr(state, "confidence", 0.0)
     trend = getattr(state, "trend", {})
@@ -85,51 +100,31 @@ def prediction_agent(state: Any) -> Dict[str, Any]:
             },
             {"role": "user", "content": prompt}
         ]
-        model = PRIMARY_MODEL
-        for attempt in range(2):
-            try:
-                # Ask OpenAI for a recommendation (fallback to GPT-3.5 if needed)
-                response = openai.ChatCompletion.create(
-                    model=model,
-                    messages=messages,
-                    temperature=0.2,
-                    max_tokens=512,
-                    timeout=15,
-                )
-                raw_response = response.choices[0].message.content.strip()
-                logger.info(f"OpenAI response: {raw_response}")
-                # Extract and parse JSON from OpenAI response
-                json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
-                if json_match:
-                    prediction_data = json.loads(json_match.group())
-                    required_fields = ["recommendation", "confidence", "reasoning"]
-                    if all(field in prediction_data for field in required_fields):
-                        recommendation = prediction_data["recommendation"]
-                        logger.info(f"Generated recommendation: {recommendation}")
-                        return {
-                            "recommendation": recommendation,
-                            "insight": prediction_data.get("reasoning", "No reasoning provided"),
-                            "prediction_data": prediction_data
-                        }
-                    else:
-                        raise ValueError(f"Missing required fields in response: {prediction_data.keys()}")
-                else:
-                    raise ValueError("No JSON found in OpenAI response")
-            except (OpenAIError, json.JSONDecodeError, ValueError) as e:
-                # Fallback to GPT-3.5 if needed
-                logger.error(f"Attempt {attempt+1} failed with model {model}: {e}")
-                if attempt == 0:
-                    model = FALLBACK_MODEL
-                    logger.info(f"Falling back to {model}")
-                    continue
-                break
-        # If OpenAI fails, use a conservative rule-based fallback
-        logger.warning("OpenAI recommendation failed, providing conservative fallback")
-        return _conservative_fallback_recommendation(sentiment, trend)
+        try:
+            # Hedged with the fallback model if the primary runs past its usual latency
+            prediction_data = llm_gateway.run(
+                state, messages, max_tokens=512, temperature=0.2, request_timeout=REQUEST_TIMEOUT,
+                reserve=DOWNSTREAM_RESERVE, parse=llm_gateway.json_parser(["recommendation", "confidence", "reasoning"]),
+            )
+        except llm_gateway.LLMUnavailable as e:
+            # If OpenAI fails, use a conservative rule-based fallback
+            logger.warning(f"OpenAI recommendation failed ({e}), providing conservative fallback")
+            return _conservative_fallback_recommendation(sentiment, trend)
+        recommendation = prediction_data["recommendation"]
+        logger.info(f"Generated recommendation: {recommendation}")
+        return {
+            "recommendation": recommendation,
+            "insight": prediction_data.get("reasoning", "No reasoning provided"),
+            "prediction_data": prediction_data
+        }
     except Exception as e:
         # Handle unexpected errors
         logger.error(f"Unexpected error generating recommendation: {e}")
-        return {"recommendation": "Hold", "insight": "Unable to generate recommendation due to analysis error"}
+        return {
+            "recommendation": "Hold",
+            "insight": "Unable to generate recommendation due to analysis error",
+            "prediction_data": {"recommendation": "Hold", "fallback": True},
+        }
 
 # Simple fallback: Hold unless signals are very clear
 def _conservative_fallback_recommendation(sentiment: str, trend: Dict[str, Any]) -> Dict[str, Any]:
@@ -150,6 +145,7 @@ def _conservative_fallback_recommendation(sentiment: str, trend: Dict[str, Any])
             "recommendation": recommendation,
             "confidence": 0.5,
             "reasoning": reasoning,
-            "riskLevel": "Medium"
+            "riskLevel": "Medium",
+            "fallback": True  # Rule-based, not reused by the stage cache
         }
     }
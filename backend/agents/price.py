@@ -1,4 +1,6 @@
-# Gets current price and recent price history for a stock using TwelveData API
+# Gets current price and price history for a stock using TwelveData API
+# History interval and window come from settings (PRICE_INTERVAL, PRICE_LOOKBACK_DAYS) and are
+# returned as an array-backed PriceSeries rather than a dict.
 
 
 import logging
@@ -7,18 +9,23 @@ from typing import Any, Dict
 import requests
 from backend.config import settings
 from backend.agents.logger import log_agent
+from backend.services import circuit_breaker, deadline, rate_limiter
+from backend.services.price_series import PriceSeries, fetch_plan, normalize_interval
 from openai import OpenAIError
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+REQUEST_TIMEOUT = 10
+
+
 @log_agent("price")  # Logs price analysis
 def price_agent(state: Any) -> Dict[str, Any]:
     ticker = getattr(state, "ticker", "").upper()
     if not ticker:
         # Make sure we have a ticker
         logger.error("No ticker provided")
-        return {"price": None, "prices": {}, "source": "none"}
+        return {"price": None, "price_series": None, "source": "none"}
 
     logger.info(f"Fetching price for {ticker}")
     try:
@@ -26,13 +33,29 @@ def price_agent(state: Any) -> Dict[str, Any]:
         if not api_key:
 
             logger.error("TWELVE_DATA_API_KEY not set")
-            return {"price": None, "prices": {}, "source": "none"}
+            return {"price": None, "price_series": None, "source": "none"}
+
+        if not deadline.has_time(state, deadline.MIN_CALL_SECONDS):
+            logger.warning(f"No time budget left to fetch price for {ticker}")
+            return {"price": None, "price_series": None, "source": "none"}
+
+        breaker = circuit_breaker.get_breaker("twelvedata")
+        if not breaker.ready():
+            logger.warning(f"TwelveData circuit open, skipping price fetch for {ticker}")
+            return {"price": None, "price_series": None, "source": "none"}
+        if not rate_limiter.acquire_for(state, "twelvedata"):
+            logger.warning(f"TwelveData rate limit wait exceeded the time budget for {ticker}")
+            return {"price": None, "price_series": None, "source": "none"}
+        if not rate_limiter.allow_or_refund(breaker, "twelvedata"):
+            logger.warning(f"TwelveData circuit open, skipping price fetch for {ticker}")
+            return {"price": None, "price_series": None, "source": "none"}
 
         # Get current price from TwelveData
-        url = "https://api.twelvedata.com/price"
+        url = f"{settings.TWELVE_DATA_BASE_URL}/price"
         params = {"symbol": ticker, "apikey": api_key}
-        resp = requests.get(url, params=params, timeout=10)
+        resp = requests.get(url, params=params, timeout=deadline.timeout_for(state, REQUEST_TIMEOUT))
         resp.raise_for_status()
+        breaker.record_success()
         payload = resp.json()
         price_str = payload.get("price")
         price = None
@@ -43,37 +66,32 @@ def price_agent(state: Any) -> Dict[str, Any]:
                 logger.warning(f"Could not convert price: {price_str}")
                 price = None
 
-        # Get 7 days of price history 
-        hist_url = "https://api.twelvedata.com/time_series"
-        hist_params = {
-            "symbol": ticker,
-            "interval": "1day",
-            "outputsize": 7,
-            "apikey": api_key
-        }
-        hist_resp = requests.get(hist_url, params=hist_params, timeout=10)
-        hist_resp.raise_for_status()
-        hist_payload = hist_resp.json()
-        prices = {}
-        if "values" in hist_payload:
-            for entry in hist_payload["values"]:
-                date = entry.get("datetime")
-                close = entry.get("close")
-                if date and close:
-                    try:
-                        prices[date] = float(close)
-                    except Exception:
-                        continue
-        if not prices and price is not None and price > 0:
-            today = datetime.utcnow().date()
-            prices[str(today)] = price
+        # Get price history (optional - skipped when the budget is nearly spent)
+        interval = normalize_interval(settings.PRICE_INTERVAL)
+        fetch_interval, window = fetch_plan(interval, settings.PRICE_LOOKBACK_DAYS)
+        series = PriceSeries.empty(interval)
+        if (deadline.has_time(state, deadline.MIN_CALL_SECONDS) and breaker.ready()
+                and rate_limiter.acquire_for(state, "twelvedata") and rate_limiter.allow_or_refund(breaker, "twelvedata")):
+            hist_url = f"{settings.TWELVE_DATA_BASE_URL}/time_series"
+            hist_params = {"symbol": ticker, **window, "apikey": api_key}
+            hist_resp = requests.get(hist_url, params=hist_params, timeout=deadline.timeout_for(state, REQUEST_TIMEOUT))
+            hist_resp.raise_for_status()
+            breaker.record_success()
+            # Weekly/monthly views are fetched as daily bars and aggregated here
+            series = PriceSeries.from_twelvedata(hist_resp.json().get("values") or [], fetch_interval).resample(interval)
+        else:
+            logger.warning(f"Skipping price history for {ticker}: time budget, circuit or rate limit")
+        if not len(series) and price is not None and price > 0:
+            series = PriceSeries.from_dict({str(datetime.utcnow().date()): price}, interval)
         if price is not None and price > 0:
             # Return price and history if found, else warn
-            return {"price": price, "prices": prices, "source": "twelvedata"}
+            return {"price": price, "price_series": series, "source": "twelvedata"}
         else:
             logger.warning(f"Price not found for {ticker}")
-            return {"price": None, "prices": prices, "source": "twelvedata"}
+            return {"price": None, "price_series": series, "source": "twelvedata"}
     except Exception as e:
         # Handle any errors and log them
+        if circuit_breaker.is_provider_failure(e):
+            circuit_breaker.get_breaker("twelvedata").record_failure()
         logger.error(f"Error fetching price for {ticker}: {e}")
-        return {"price": None, "prices": {}, "source": "none"}
+        return {"price": None, "price_series": None, "source": "none"}
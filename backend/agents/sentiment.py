@@ -1,122 +1,130 @@
 # Figures out if the news is bullish, bearish, or neutral for this stock
 
-import re
-import json
-import time
 import logging
-import openai
-from openai import OpenAIError
-from backend.config import settings
 from backend.agents.logger import log_agent
+from backend.services import article_sentiment, llm_gateway, rate_limiter
+from backend.services.news_items import extracted_text
+from backend.services.stage_cache import reuse_if_unchanged
 
 logger = logging.getLogger(__name__)
 
-openai.api_key = settings.OPENAI_API_KEY
-PRIMARY_MODEL = getattr(settings, "OPENAI_MODEL", "gpt-4")
-FALLBACK_MODEL = "gpt-3.5-turbo"
+PRIMARY_MODEL = llm_gateway.PRIMARY_MODEL
 
 MIN_NEWS_ITEMS = 3
 MAX_RETRIES = 3
 INITIAL_BACKOFF = 1
 REQUEST_TIMEOUT = 10
+DOWNSTREAM_RESERVE = 6  # seconds kept for trend, prediction and summary
+BATCHED_PRIORITIES = ("batch", "background")  # runs whose article scoring goes through the micro-batcher
+ARTICLES_PER_CALL = 8
+SYSTEM_PROMPT = "You are a financial-market sentiment analysis assistant."
+SCORE_FORMAT = (
+    "Give a score between -1 (very bearish) and 1 (very bullish), 0 being neutral, "
+    "and a confidence between 0 and 1."
+)
+
+# Sentiment only changes when the articles do: their URLs and the text extracted for them
+def _sentiment_inputs(state):
+    return {
+        "ticker": getattr(state, "ticker", "").upper(),
+        "model": PRIMARY_MODEL,
+        "news_urls": sorted(item.get("url", "") for item in (state.news or [])),
+        "extracted": sorted(
+            (item.get("url", ""), article_sentiment.content_hash(extracted_text(state, item)))
+            for item in getattr(state, "extracted_content", []) or []
+        ),
+    }
+
+# Only a complete aggregate is reused; one with unscored articles is retried on the next run
+def _is_complete(out):
+    return out.get("confidence", 0) > 0 and out.get("unscored_articles") == 0
 
 @log_agent("sentiment")  # Logs sentiment analysis
+@reuse_if_unchanged("sentiment", _sentiment_inputs, cacheable=_is_complete)
 def sentiment_agent(state):
-    # Checks news count, builds prompt, and asks OpenAI for sentiment
+    # Checks news count, scores the articles not seen before and aggregates all article scores
     news_items = state.news or []
-    extracted_content = getattr(state, "extracted_content", [])
-    key_insights = getattr(state, "key_insights", [])
+    extracted_content = getattr(state, "extracted_content", []) or []
     content_quality_score = getattr(state, "content_quality_score", 0)
     
     if len(news_items) < MIN_NEWS_ITEMS:
         logger.warning("Not enough news; defaulting to Neutral.")
         return {"sentiment": "Neutral", "confidence": 0.0}
 
-    logger.info(f"Analyzing sentiment from {len(news_items)} news items (Quality Score: {content_quality_score})...")
-    
-    # Use extracted content for deeper analysis if available
-    if extracted_content:
-        logger.info(f"Enhanced analysis using {len(extracted_content)} extracted articles with advanced processing")
-        combined = "\n".join(f"- {item['title']}: {item['snippet']}" for item in news_items)
-        
-        # Add key insights from advanced processing
-        if key_insights:
-            combined += "\n\nKey Market Insights:"
-            for insight in key_insights[:3]:
-                combined += f"\n- {insight.get('type', 'insight')}: {insight.get('key_point', '')[:100]}"
-        
-        # Add extracted content with financial analysis
-        for content in extracted_content[:2]:  # Use top 2 extracted articles
-            if content.get("content"):
-                combined += f"\n\nDetailed Analysis: {content['content'][:400]}..."
-                
-                # Include financial figures if available
-                if content.get("financial_figures"):
-                    combined += "\nFinancial Data: " + ", ".join([
-                        f"{fig['type']}: {fig['amount']} {fig['unit']}" 
-                        for fig in content["financial_figures"][:3]
-                    ])
-                
-                # Include sentiment indicators
-                if content.get("sentiment_indicators"):
-                    combined += "\nMarket Indicators: " + ", ".join(content["sentiment_indicators"][:3])
-                
-                # Include key quotes
-                if content.get("key_quotes"):
-                    combined += f"\nKey Quote: {content['key_quotes'][0][:150]}..."
-    else:
-        combined = "\n".join(f"- {item['title']}: {item['snippet']}" for item in news_items)
-    
-    # Build the enhanced prompt for OpenAI
-    analysis_type = "advanced" if extracted_content else "basic"
-    quality_score = content_quality_score or 0
-    confidence_boost = "high" if quality_score > 70 else "moderate" if quality_score > 40 else "low"
-    user_prompt = (
-        f"Given the following financial news analysis ({analysis_type} extraction, {confidence_boost} quality sources), "
-        "provide an overall sentiment: Bullish, Bearish, or Neutral. Also give a confidence score between 0 and 1."
-        "\n\n"
-        f"{combined}\n\n"
-        "Consider financial figures, executive statements, market indicators, and source quality in your analysis. "
-        "Respond ONLY with JSON in the format: {\"sentiment\": \"Bullish\", \"confidence\": 0.85}."
-    )
-    messages = [
-        {"role": "system", "content": "You are a financial-market sentiment analysis assistant."},
-        {"role": "user", "content": user_prompt}
+    # Each article is scored on its own text; full extracts replace snippets where available
+    ticker = getattr(state, "ticker", "").upper()
+    extracted_by_url = {
+        content["url"]: {**content, "content": extracted_text(state, content)}
+        for content in extracted_content if content.get("url")
+    }
+    articles = [
+        (item, article_sentiment.article_text(item, extracted_by_url.get(item["url"])))
+        for item in news_items if item.get("url")
     ]
-    model = PRIMARY_MODEL
-    backoff = INITIAL_BACKOFF
-    for attempt in range(1, MAX_RETRIES + 1):
+    scores, missing = article_sentiment.cached_scores(ticker, articles)
+    logger.info(f"Analyzing sentiment from {len(articles)} news items (Quality Score: {content_quality_score}): "
+                f"{len(scores)} already scored, {len(missing)} new")
+
+    # Only articles not seen before (or whose text changed) go to OpenAI
+    if missing:
+        new_articles = [articles[i] for i in missing]
+        for (item, text), score in zip(new_articles, _score_articles(state, ticker, new_articles)):
+            if score is not None:
+                article_sentiment.store_score(ticker, item["url"], text, score)
+                scores[item["url"]] = score
+
+    result = article_sentiment.aggregate(news_items, scores)
+    if not scores:
+        logger.error("No article could be scored; defaulting to Neutral.")
+    else:
+        logger.info(f"Analysis complete: {result['sentiment']} (confidence: {result['confidence']:.2f}, "
+                    f"score: {result['score']:+.2f} over {len(scores)} articles)")
+    return {
+        "sentiment": result["sentiment"],
+        "confidence": result["confidence"],
+        "article_sentiments": [
+            {"url": item["url"], "title": item.get("title", ""), **scores[item["url"]]}
+            for item, _ in articles if item["url"] in scores
+        ],
+        "unscored_articles": sum(1 for item, _ in articles if item["url"] not in scores),
+    }
+
+# Scores for (item, text) pairs, in order; None where no valid score came back
+def _score_articles(state, ticker, articles):
+    scores = [None] * len(articles)
+    if rate_limiter.priority_of(state) in BATCHED_PRIORITIES:
+        # Batch and pre-warm runs share requests with the other tickers being analysed
+        prompts = [
+            f"Rate the sentiment of this article for {ticker} stock.\n\n{text}\n\n{SCORE_FORMAT} "
+            "Respond ONLY with JSON in the format: {\"score\": 0.6, \"confidence\": 0.8}."
+            for _, text in articles
+        ]
+        answers = llm_gateway.classify(state, SYSTEM_PROMPT, prompts, 40, REQUEST_TIMEOUT, DOWNSTREAM_RESERVE)
+        scores = [article_sentiment.normalize_score(answer) for answer in answers]
+    # Whatever is left is scored directly, several articles per request
+    pending = [i for i, score in enumerate(scores) if score is None]
+    for start in range(0, len(pending), ARTICLES_PER_CALL):
+        chunk = pending[start:start + ARTICLES_PER_CALL]
+        listing = "\n\n".join(f"[{n}] {articles[i][1]}" for n, i in enumerate(chunk, 1))
+        user_prompt = (
+            f"Rate the sentiment of each financial news article below for {ticker} stock.\n\n"
+            f"{listing}\n\n"
+            f"{SCORE_FORMAT} Consider financial figures, executive statements and market indicators. "
+            "Respond ONLY with JSON mapping each article number to its rating, e.g. "
+            "{\"1\": {\"score\": 0.6, \"confidence\": 0.8}, \"2\": {\"score\": -0.2, \"confidence\": 0.5}}."
+        )
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
         try:
-            # Try up to 3 times, fallback to GPT-3.5 if needed
-            resp = openai.ChatCompletion.create(
-                model=model,
-                messages=messages,
-                temperature=0.0,
-                max_tokens=64,
-                request_timeout=REQUEST_TIMEOUT,
+            answers = llm_gateway.run(
+                state, messages, max_tokens=24 * len(chunk) + 16, temperature=0.0, request_timeout=REQUEST_TIMEOUT,
+                reserve=DOWNSTREAM_RESERVE, parse=llm_gateway.parse_json, attempts=MAX_RETRIES, backoff=INITIAL_BACKOFF,
             )
-            raw = resp.choices[0].message.content.strip()
-            logger.info(f"AI response: {raw}")
-
-            match = re.search(r"\{.*\}", raw, flags=re.DOTALL)
-            json_text = match.group(0) if match else raw
-            data = json.loads(json_text)
-            
-            if set(data.keys()) <= {"sentiment", "confidence"}:
-                sentiment = data.get("sentiment") or "Neutral"
-                confidence = float(data.get("confidence") or 0.0)
-                logger.info(f"Analysis complete: {sentiment} (confidence: {confidence:.2f})")
-                return {"sentiment": sentiment, "confidence": confidence}
-            else:
-                raise ValueError(f"Unexpected response format: {data.keys()}")
-        except (OpenAIError, json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Attempt {attempt} failed with model {model}: {e}")
-            if attempt < MAX_RETRIES:
-                time.sleep(backoff)
-                backoff *= 2
-                if attempt == 1:
-                    model = FALLBACK_MODEL
-                    logger.info(f"Falling back to {model}")
-                continue
-            logger.error("All retries failed; defaulting to Neutral.")
-            return {"sentiment": "Neutral", "confidence": 0.0}
+        except llm_gateway.LLMUnavailable as e:
+            logger.error(f"Article scoring unavailable ({e}); {len(pending) - start} articles left unscored.")
+            break
+        for n, i in enumerate(chunk, 1):
+            scores[i] = article_sentiment.normalize_score(answers.get(str(n)))
+    return scores
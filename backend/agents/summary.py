@@ -1,35 +1,52 @@
 # Uses OpenAI to write a summary of all the analysis
 
-import json
-import re
 import logging
 from typing import Any, Dict
-import openai
-from openai import OpenAIError
-from backend.config import settings
 from backend.agents.logger import log_agent
+from backend.services import llm_gateway
+from backend.services.price_series import series_of
+from backend.services.stage_cache import reuse_if_unchanged
 
 logger = logging.getLogger(__name__)
 
-openai.api_key = settings.OPENAI_API_KEY
-PRIMARY_MODEL = getattr(settings, "OPENAI_MODEL", "gpt-4")
-FALLBACK_MODEL = "gpt-3.5-turbo"
+PRIMARY_MODEL = llm_gateway.PRIMARY_MODEL
+REQUEST_TIMEOUT = 15
+DOWNSTREAM_RESERVE = 0  # last LLM step, may use whatever budget is left
+
+def _latest_price(state: Any):
+    current_price = getattr(state, "price", None)
+    if isinstance(current_price, (int, float)) and current_price:
+        return current_price
+    return series_of(state).last_close()
+
+# Summary reads everything the earlier stages produced plus the top headlines
+def _summary_inputs(state: Any) -> Dict[str, Any]:
+    trend = getattr(state, "trend", {}) or {}
+    news = getattr(state, "news", []) or []
+    return {
+        "ticker": getattr(state, "ticker", "").upper(),
+        "model": PRIMARY_MODEL,
+        "price": _latest_price(state),
+        "sentiment": getattr(state, "sentiment", None),
+        "confidence": round(getattr(state, "confidence", 0.0) or 0.0, 2),
+        "trend": {k: trend.get(k) for k in ("direction", "strength", "risk", "summary")},
+        "recommendation": getattr(state, "recommendation", None),
+        "insight": getattr(state, "insight", None),
+        "headlines": [article.get("title") for article in news[:5]],
+        "news_count": len(news),
+    }
+
+# Template summaries are fallbacks; the next run should try OpenAI again
+def _is_llm_summary(out: Dict[str, Any]) -> bool:
+    return not out.get("fallback")
 
 @log_agent("summary")  # Logs summary
+@reuse_if_unchanged("summary", _summary_inputs, cacheable=_is_llm_summary)
 def summary_agent(state: Any) -> Dict[str, Any]:
     # Gathers all analysis, builds prompt, and asks OpenAI for a summary
     ticker = getattr(state, "ticker", "")
-    current_price = getattr(state, "price", None)
-    prices = getattr(state, "prices", {})
-    # Use latest price from prices if needed
-    if (not isinstance(current_price, (int, float)) or current_price is None or current_price == 0) and prices:
-        try:
-            current_price = prices[max(prices.keys())]
-        except Exception:
-            try:
-                current_price = list(prices.values())[-1]
-            except Exception:
-                current_price = None
+    # Use the latest close from the price history if needed
+    current_price = _latest_price(state)
     sentiment = getattr(state, "sentiment", "Neutral")
     confidence = getattr(state, "confidence", 0.0)
     trend = getattr(state, "trend", {})
@@ -81,35 +98,22 @@ def summary_agent(state: Any) -> Dict[str, Any]:
             },
             {"role": "user", "content": prompt}
         ]
-        model = PRIMARY_MODEL
-        for attempt in range(2):
-            try:
-                # Ask OpenAI to write a summary (fallback to GPT-3.5 if needed)
-                response = openai.ChatCompletion.create(
-                    model=model,
-                    messages=messages,
-                    temperature=0.3,
-                    max_tokens=800,
-                    timeout=15,
-                )
-                summary_text = response.choices[0].message.content.strip()
-                logger.info(f"Generated summary ({len(summary_text)} characters)")
-                chart_url = f"https://example.com/chart/{ticker}"
-                return {
-                    "summary": summary_text,
-                    "chart_url": chart_url
-                }
-            except OpenAIError as e:
-                # Fallback to GPT-3.5 if needed
-                logger.error(f"Attempt {attempt+1} failed with model {model}: {e}")
-                if attempt == 0:
-                    model = FALLBACK_MODEL
-                    logger.info(f"Falling back to {model}")
-                    continue
-                break
-        # If OpenAI fails, use a simple template summary
-        logger.warning("OpenAI summary failed, creating template summary")
-        return _create_template_summary(ticker, current_price, sentiment, recommendation, insight, len(news))
+        try:
+            # Hedged with the fallback model if the primary runs past its usual latency
+            summary_text = llm_gateway.run(
+                state, messages, max_tokens=800, temperature=0.3, request_timeout=REQUEST_TIMEOUT,
+                reserve=DOWNSTREAM_RESERVE,
+            )
+        except llm_gateway.LLMUnavailable as e:
+            # If OpenAI fails, use a simple template summary
+            logger.warning(f"OpenAI summary failed ({e}), creating template summary")
+            return _create_template_summary(ticker, current_price, sentiment, recommendation, insight, len(news))
+        logger.info(f"Generated summary ({len(summary_text)} characters)")
+        chart_url = f"https://example.com/chart/{ticker}"
+        return {
+            "summary": summary_text,
+            "chart_url": chart_url
+        }
     except Exception as e:
         # Handle unexpected errors
         logger.error(f"Unexpected error creating summary: {e}")
@@ -133,5 +137,6 @@ def _create_template_summary(ticker: str, price: float, sentiment: str, recommen
     """
     return {
         "summary": summary.strip(),
-        "chart_url": f"https://example.com/chart/{ticker}"
+        "chart_url": f"https://example.com/chart/{ticker}",
+        "fallback": True  # Template, not reused by the stage cache
     }
@@ -1,37 +1,61 @@
 # Checks if the stock is trending up, down, or sideways using price history
 
-import json
-import re
 import logging
 from typing import Any, Dict
-import openai
-from openai import OpenAIError
-from backend.config import settings
 from backend.agents.logger import log_agent
+from backend.services import llm_gateway
+from backend.services.price_series import PriceSeries, series_of
+from backend.services.stage_cache import reuse_if_unchanged
 
 logger = logging.getLogger(__name__)
 
-openai.api_key = settings.OPENAI_API_KEY
-PRIMARY_MODEL = getattr(settings, "OPENAI_MODEL", "gpt-4")
-FALLBACK_MODEL = "gpt-3.5-turbo"
+PRIMARY_MODEL = llm_gateway.PRIMARY_MODEL
+REQUEST_TIMEOUT = 15
+DOWNSTREAM_RESERVE = 4  # seconds kept for prediction and summary
+PROMPT_MAX_BARS = 40  # longer histories are resampled to coarser bars before prompting
+
+# Trend only reads the price series
+def _trend_inputs(state: Any) -> Dict[str, Any]:
+    return {
+        "ticker": getattr(state, "ticker", "").upper(),
+        "model": PRIMARY_MODEL,
+        "price": getattr(state, "price", None),
+        "prices": series_of(state).fingerprint(),
+    }
+
+# Rule-based fallbacks are not worth reusing; the next run should try OpenAI again
+def _is_llm_trend(out: Dict[str, Any]) -> bool:
+    trend = out.get("trend") or {}
+    return bool(trend) and not trend.get("fallback")
+
+def _unknown_trend() -> Dict[str, Any]:
+    return {"trend": {"direction": "Unknown", "strength": "N/A", "confidence": 0.0, "fallback": True}}
 
 @log_agent("trend")  # Logs trend analysis
+@reuse_if_unchanged("trend", _trend_inputs, cacheable=_is_llm_trend)
 def trend_agent(state: Any) -> Dict[str, Any]:
-    prices = getattr(state, "prices", {})
+    series = series_of(state)
     current_price = getattr(state, "price", None)
     ticker = getattr(state, "ticker", "")
-    if not prices:
+    if not len(series):
         # If no price data, can't analyze trend
         logger.warning("No price data for trend analysis")
-        return {"trend": {"direction": "Unknown", "strength": "N/A", "confidence": 0.0}}
-    logger.info(f"Analyzing price trends for {ticker} using {len(prices)} data points")
+        return _unknown_trend()
+    logger.info(f"Analyzing price trends for {ticker} using {len(series)} {series.interval} bars")
     try:
-        # Build a summary of price history for OpenAI
+        # Build a summary of price history for OpenAI: window statistics plus at most PROMPT_MAX_BARS bars
         price_summary = f"Current price: ${current_price:.2f}\n" if current_price else ""
-        price_summary += "Recent price history:\n"
-        sorted_prices = sorted(prices.items())
-        for date, price in sorted_prices:
-            price_summary += f"  {date}: ${price:.2f}\n"
+        stats = series.stats()
+        if stats:
+            price_summary += (
+                f"Window: {stats['bars']} {series.interval} bars, change {stats['change_pct']:+.2f}%, "
+                f"range ${stats['low']:.2f}-${stats['high']:.2f}, volatility {stats['volatility_pct']:.2f}% per bar, "
+                f"max drawdown {stats['max_drawdown_pct']:.2f}%\n"
+            )
+        bars = series.downsample(PROMPT_MAX_BARS)
+        price_summary += f"Price history ({bars.interval} closes):\n"
+        for label, close in zip(bars.labels(), bars.close.tolist()):
+            price_summary += f"  {label}: ${close:.2f}\n"
         # Ask OpenAI to analyze the trend
         prompt = f"""
         Analyze the following stock price data and provide a trend analysis:
@@ -53,56 +77,30 @@ def trend_agent(state: Any) -> Dict[str, Any]:
             {"role": "system", "content": "You are a financial market trend analyst. Analyze price data objectively and provide clear, actionable insights."},
             {"role": "user", "content": prompt}
         ]
-        model = PRIMARY_MODEL
-        for attempt in range(2):
-            try:
-                # Ask OpenAI for trend analysis (fallback to GPT-3.5 if needed)
-                response = openai.ChatCompletion.create(
-                    model=model,
-                    messages=messages,
-                    temperature=0.1,
-                    max_tokens=512,
-                    timeout=15,
-                )
-                raw_response = response.choices[0].message.content.strip()
-                logger.info(f"OpenAI response: {raw_response}")
-                json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
-                if json_match:
-                    trend_data = json.loads(json_match.group())
-                    required_fields = ["direction", "strength", "confidence"]
-                    if all(field in trend_data for field in required_fields):
-                        logger.info(f"Trend analysis complete: {trend_data.get('strength', '')} {trend_data.get('direction', '')} trend")
-                        return {"trend": trend_data}
-                    else:
-                        raise ValueError(f"Missing required fields in response: {trend_data.keys()}")
-                else:
-                    raise ValueError("No JSON found in OpenAI response")
-            except (OpenAIError, json.JSONDecodeError, ValueError) as e:
-                # Fallback to GPT-3.5 if needed
-                logger.error(f"Attempt {attempt+1} failed with model {model}: {e}")
-                if attempt == 0:
-                    model = FALLBACK_MODEL
-                    logger.info(f"Falling back to {model}")
-                    continue
-                break
-        # If OpenAI fails, do a basic trend check
-        logger.warning("OpenAI analysis failed, providing basic trend assessment")
-        return _basic_trend_analysis(prices, current_price)
+        try:
+            # Hedged with the fallback model if the primary runs past its usual latency
+            trend_data = llm_gateway.run(
+                state, messages, max_tokens=512, temperature=0.1, request_timeout=REQUEST_TIMEOUT,
+                reserve=DOWNSTREAM_RESERVE, parse=llm_gateway.json_parser(["direction", "strength", "confidence"]),
+            )
+            logger.info(f"Trend analysis complete: {trend_data.get('strength', '')} {trend_data.get('direction', '')} trend")
+            return {"trend": trend_data}
+        except llm_gateway.LLMUnavailable as e:
+            # If OpenAI fails, do a basic trend check
+            logger.warning(f"OpenAI analysis failed ({e}), providing basic trend assessment")
+            return _basic_trend_analysis(series, current_price)
     except Exception as e:
         # Handle unexpected errors
         logger.error(f"Unexpected error in trend analysis: {e}")
-        return {"trend": {"direction": "Unknown", "strength": "N/A", "confidence": 0.0}}
+        return _unknown_trend()
 
 # Simple trend check if OpenAI is unavailable
-def _basic_trend_analysis(prices: Dict[str, float], current_price: float) -> Dict[str, Any]:
+def _basic_trend_analysis(series: PriceSeries, current_price: float) -> Dict[str, Any]:
     # Simple trend check if OpenAI is unavailable
-    if not prices or len(prices) < 2:
-        return {"trend": {"direction": "Unknown", "strength": "N/A", "confidence": 0.0}}
-    sorted_prices = sorted(prices.items())
-    first_price = sorted_prices[0][1]
-    last_price = sorted_prices[-1][1]
+    if len(series) < 2:
+        return _unknown_trend()
     # Calculate percent change
-    price_change_percent = ((last_price - first_price) / first_price) * 100
+    price_change_percent = series.stats()["change_pct"]
     # Decide direction and strength
     if price_change_percent > 2:
         direction = "Uptrend"
@@ -117,6 +115,7 @@ def _basic_trend_analysis(prices: Dict[str, float], current_price: float) -> Dic
             "direction": direction,
             "strength": strength,
             "confidence": 0.7,
-            "summary": f"Basic analysis shows {direction.lower()} movement with {price_change_percent:.1f}% change"
+            "summary": f"Basic analysis shows {direction.lower()} movement with {price_change_percent:.1f}% change",
+            "fallback": True  # Rule-based, not reused by the stage cache
         }
     }
@@ -20,6 +20,11 @@ class Settings:
     # Tavily API for news search
     TAVILY_API_KEY: str = os.getenv("TAVILY_API_KEY", "")
     
+    # Upstream base URLs (override to point the agents at local stand-ins, e.g. for benchmarks)
+    OPENAI_API_BASE: str = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+    TWELVE_DATA_BASE_URL: str = os.getenv("TWELVE_DATA_BASE_URL", "https://api.twelvedata.com")
+    TAVILY_BASE_URL: str = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com")
+    
     # MongoDB for storing analysis results
     MONGODB_URI: str = os.getenv("MONGODB_URI", "")
     MONGO_DB_NAME: str = os.getenv("MONGO_DB_NAME", "echomarket")
@@ -27,7 +32,119 @@ class Settings:
     
     # Optional: Analysis settings (with sensible defaults)
     MAX_NEWS_ITEMS: int = int(os.getenv("MAX_NEWS_ITEMS", "10"))
-    ANALYSIS_TIMEOUT: int = int(os.getenv("ANALYSIS_TIMEOUT", "30"))
+    ANALYSIS_TIMEOUT: int = int(os.getenv("ANALYSIS_TIMEOUT", "30"))  # Hard cap (seconds) for one full pipeline run
+    
+    # Price history: bar interval (1min, 5min, 15min, 30min, 45min, 1h, 2h, 4h, 1day, 1week, 1month) and window
+    PRICE_INTERVAL: str = os.getenv("PRICE_INTERVAL", "1day")
+    PRICE_LOOKBACK_DAYS: float = float(os.getenv("PRICE_LOOKBACK_DAYS", "10"))  # ~7 trading days by default
+    
+    # LLM routing: once a call runs past its model's observed latency percentile, hedge it with the fallback model
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # Calls observed before hedging starts
+    LLM_HEDGE_MIN_DELAY: float = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+    LLM_LATENCY_WINDOW: int = int(os.getenv("LLM_LATENCY_WINDOW", "200"))  # Recent calls per model in the percentiles
+    
+    # LLM gateway: concurrent calls per model, the queued bulk lane for offline jobs, and micro-batching
+    # of small classification prompts (sentiment during batch and pre-warm runs)
+    LLM_MAX_CONCURRENCY_PER_MODEL: int = int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", "8"))
+    LLM_BULK_CONCURRENCY: int = int(os.getenv("LLM_BULK_CONCURRENCY", "2"))  # Keep below the per-model limit
+    LLM_BULK_MAX_WAIT: float = float(os.getenv("LLM_BULK_MAX_WAIT", "120"))  # Rate-limit queueing allowed per bulk call
+    LLM_BATCH_WINDOW_MS: float = float(os.getenv("LLM_BATCH_WINDOW_MS", "250"))  # How long a batch collects prompts
+    LLM_BATCH_MAX_ITEMS: int = int(os.getenv("LLM_BATCH_MAX_ITEMS", "8"))
+    
+    # Circuit breakers: consecutive upstream failures before failing fast, and cool-down before probing again
+    BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_RECOVERY_SECONDS: float = float(os.getenv("BREAKER_RECOVERY_SECONDS", "30"))
+    
+    # Rate limits per provider (shared by all agents in the process) and the longest a call may queue
+    TWELVE_DATA_CREDITS_PER_MINUTE: int = int(os.getenv("TWELVE_DATA_CREDITS_PER_MINUTE", "8"))
+    TAVILY_CREDITS_PER_MINUTE: int = int(os.getenv("TAVILY_CREDITS_PER_MINUTE", "100"))
+    OPENAI_TOKENS_PER_MINUTE: int = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "40000"))
+    RATE_LIMIT_MAX_WAIT: float = float(os.getenv("RATE_LIMIT_MAX_WAIT", "20"))
+    
+    # Writable directory for local state (SQLite cache, learned symbols); defaults to var/ in the project root
+    DATA_DIR: str = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "var"))
+    
+    # Cache shared by all workers: "sqlite" (one host), "mongo" (multiple hosts) or "none"
+    SHARED_CACHE_BACKEND: str = os.getenv("SHARED_CACHE_BACKEND", "sqlite")
+    SHARED_CACHE_PATH: str = os.getenv("SHARED_CACHE_PATH", "")  # SQLite file, defaults to DATA_DIR/cache.sqlite3
+    ANALYSIS_CACHE_TTL: int = int(os.getenv("ANALYSIS_CACHE_TTL", "300"))  # Seconds a ticker analysis is reused
+    
+    # Stale-while-revalidate for /ui/analyze: serve analyses up to SWR_MAX_AGE seconds old while refreshing
+    UI_STALE_WHILE_REVALIDATE: bool = os.getenv("UI_STALE_WHILE_REVALIDATE", "true").lower() == "true"
+    SWR_MAX_AGE: int = int(os.getenv("SWR_MAX_AGE", "3600"))
+    
+    # Admission control per worker: concurrent pipeline runs (0 disables), plus how many requests may wait
+    # for a slot and for how long before getting a 429 with Retry-After
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "12"))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "24"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+    
+    # Async analysis jobs (POST /jobs, long-poll GET /jobs/{id}), persisted in MongoDB
+    JOBS_ENABLED: bool = os.getenv("JOBS_ENABLED", "true").lower() == "true"  # Run job runners in this worker
+    JOBS_COLLECTION: str = os.getenv("JOBS_COLLECTION", "analysis_jobs")
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "2"))  # Job runners per worker
+    JOBS_POLL_SECONDS: float = float(os.getenv("JOBS_POLL_SECONDS", "2"))
+    JOBS_STALE_SECONDS: int = int(os.getenv("JOBS_STALE_SECONDS", "120"))  # No heartbeat for this long = runner died
+    JOBS_MAX_ATTEMPTS: int = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+    JOBS_MAX_WAIT: float = float(os.getenv("JOBS_MAX_WAIT", "30"))  # Longest long-poll per GET
+    JOBS_RETENTION_DAYS: float = float(os.getenv("JOBS_RETENTION_DAYS", "7"))
+    
+    # Reuse an LLM stage's stored output when the inputs it reads are unchanged
+    STAGE_REUSE_ENABLED: bool = os.getenv("STAGE_REUSE_ENABLED", "true").lower() == "true"
+    STAGE_RESULT_TTL: int = int(os.getenv("STAGE_RESULT_TTL", "86400"))
+    
+    # Cross-ticker article index: news fetched for one ticker is reused by every ticker it mentions
+    ARTICLE_INDEX_ENABLED: bool = os.getenv("ARTICLE_INDEX_ENABLED", "true").lower() == "true"
+    ARTICLE_INDEX_REFRESH_SECONDS: int = int(os.getenv("ARTICLE_INDEX_REFRESH_SECONDS", "600"))  # Re-query Tavily after this
+    ARTICLE_INDEX_MAX_AGE_HOURS: float = float(os.getenv("ARTICLE_INDEX_MAX_AGE_HOURS", "48"))  # Older articles aren't reused
+    ARTICLE_INDEX_MAX_PER_TICKER: int = int(os.getenv("ARTICLE_INDEX_MAX_PER_TICKER", "40"))
+    
+    # Per-article sentiment scores are kept per ticker, URL and content hash, so only new articles are scored
+    ARTICLE_SENTIMENT_TTL_DAYS: float = float(os.getenv("ARTICLE_SENTIMENT_TTL_DAYS", "30"))
+    
+    # Response compression (gzip, or brotli when installed) for analysis and export routes
+    COMPRESSION_MIN_BYTES: int = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))  # Smaller bodies are sent as-is
+    
+    # Live quotes over /ws/quotes: one TwelveData poll per subscribed symbol every QUOTE_POLL_SECONDS
+    # (0 = derived from the credit budget, so the live feeds of all workers together use at most QUOTE_CREDIT_SHARE of it)
+    QUOTE_POLL_SECONDS: float = float(os.getenv("QUOTE_POLL_SECONDS", "0"))
+    QUOTE_CREDIT_SHARE: float = float(os.getenv("QUOTE_CREDIT_SHARE", "0.25"))
+    QUOTE_MAX_SYMBOLS_PER_CONNECTION: int = int(os.getenv("QUOTE_MAX_SYMBOLS_PER_CONNECTION", "20"))
+    
+    # Watchlist engine: incremental indicators per watched symbol, full re-analysis when a threshold is crossed
+    WATCH_ENABLED: bool = os.getenv("WATCH_ENABLED", "true").lower() == "true"
+    WATCH_SYMBOLS: str = os.getenv("WATCH_SYMBOLS", "")  # Initial watchlist (comma-separated) until one is saved
+    WATCH_MAX_SYMBOLS: int = int(os.getenv("WATCH_MAX_SYMBOLS", "5000"))
+    WATCH_INTERVAL: str = os.getenv("WATCH_INTERVAL", "5min")
+    WATCH_POLL_SECONDS: float = float(os.getenv("WATCH_POLL_SECONDS", "0"))  # 0 = once per bar interval
+    WATCH_WARMUP_BARS: int = int(os.getenv("WATCH_WARMUP_BARS", "100"))
+    WATCH_WINDOW: int = int(os.getenv("WATCH_WINDOW", "20"))  # Bars in the rolling volatility and VWAP
+    WATCH_RSI_HIGH: float = float(os.getenv("WATCH_RSI_HIGH", "70"))
+    WATCH_RSI_LOW: float = float(os.getenv("WATCH_RSI_LOW", "30"))
+    WATCH_VOLATILITY_PCT: float = float(os.getenv("WATCH_VOLATILITY_PCT", "1.5"))  # Per-bar return std dev
+    WATCH_VWAP_DEVIATION_PCT: float = float(os.getenv("WATCH_VWAP_DEVIATION_PCT", "2.5"))
+    WATCH_COOLDOWN_SECONDS: int = int(os.getenv("WATCH_COOLDOWN_SECONDS", "1800"))  # Per symbol, across workers
+    WATCH_CONCURRENCY: int = int(os.getenv("WATCH_CONCURRENCY", "2"))
+    
+    # PDF reports are rendered in a process pool; rendered files are kept in a size-bounded cache
+    PDF_RENDER_WORKERS: int = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+    PDF_CACHE_MAX_BYTES: int = int(os.getenv("PDF_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    
+    # Symbol listing for ticker detection (defaults to backend/data/symbols.csv) and where web-search finds are
+    # saved (defaults to DATA_DIR/symbols_learned.csv)
+    SYMBOL_LISTING_PATH: str = os.getenv("SYMBOL_LISTING_PATH", "")
+    SYMBOL_LEARNED_PATH: str = os.getenv("SYMBOL_LEARNED_PATH", "")
+    
+    # Background pre-warming of the most requested tickers (opt-in: every cycle runs full deep pipelines)
+    PREWARM_ENABLED: bool = os.getenv("PREWARM_ENABLED", "false").lower() == "true"
+    PREWARM_TOP_N: int = int(os.getenv("PREWARM_TOP_N", "50"))
+    PREWARM_INTERVAL_SECONDS: int = int(os.getenv("PREWARM_INTERVAL_SECONDS", "240"))  # Keep below ANALYSIS_CACHE_TTL
+    PREWARM_LOOKBACK_HOURS: int = int(os.getenv("PREWARM_LOOKBACK_HOURS", "72"))
+    PREWARM_PREOPEN_MINUTES: str = os.getenv("PREWARM_PREOPEN_MINUTES", "30,5")  # Extra runs before 09:30 ET
+    PREWARM_CONCURRENCY: int = int(os.getenv("PREWARM_CONCURRENCY", "2"))
+    PREWARM_STARTUP_DELAY: float = float(os.getenv("PREWARM_STARTUP_DELAY", "15"))
     
     def __init__(self):
         required_keys = [
@@ -2,25 +2,45 @@
 
 # Set up imports and app config
 
-import io, csv, re, os
-from fpdf import FPDF
+import io, csv, re, os, time, asyncio
+from contextlib import asynccontextmanager
 import anyio
 import uvicorn
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from fastapi.responses import JSONResponse
-from typing import Any, Dict, List, Optional
-from fastapi import FastAPI, HTTPException
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import logging
 import requests
-
-
-app = FastAPI(title="EchoMarket API", version="0.1.0")
+from backend.config import settings
+
+
+# Start and stop background work with the app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the symbol index up front so the first ticker lookup is instant
+    await anyio.to_thread.run_sync(symbols.get_index)
+    if settings.PREWARM_ENABLED:
+        prewarm_scheduler.start()
+    if settings.WATCH_ENABLED:
+        watch_engine.start()
+    if settings.JOBS_ENABLED:
+        job_queue.start()
+    yield
+    await job_queue.stop()
+    await prewarm_scheduler.stop()
+    await watch_engine.stop()
+    await quote_hub.stop()
+    pdf_renderer.shutdown()
+    llm_gateway.shutdown()
+
+app = FastAPI(title="EchoMarket API", version="0.1.0", lifespan=lifespan)
 
 # Allow frontend to make requests from different port
 app.add_middleware(
@@ -60,61 +80,172 @@ from langgraph.graph import StateGraph
 
 # Import our analysis agents - each one handles a specific part of the analysis
 from backend.agents.price import price_agent
-from backend.agents.market_news import market_news_agent
+from backend.agents.market_news import market_news_agent, market_news_basic_agent
+from backend.agents.indicators import indicator_agent
 from backend.agents.sentiment import sentiment_agent
 from backend.agents.trend import trend_agent
 from backend.agents.prediction import prediction_agent
 from backend.agents.summary import summary_agent
 from backend.agents.logger import logger_agent
+from backend.services import (
+    admission, article_index, blob_arena, circuit_breaker, deadline, history_export, jobs, llm_gateway, model_router,
+    news_items, pdf_renderer, prewarm, price_series, quotes, rate_limiter, shared_cache, symbols, watch,
+)
+from backend.services.responses import analysis_etag, etag_for, json_response, negotiated_response, not_modified
 
 # Data models for API requests and responses
 
 class GraphState(BaseModel):
     """Data that gets passed between analysis steps"""
     ticker: str
-    news: List[Dict[str, Any]] = []
-    extracted_content: List[Dict[str, Any]] = []  # Full article content from Tavily extract
+    news: List[Any] = []  # NewsItem records; crawled page bodies live in the run's blob arena
+    extracted_content: List[Dict[str, Any]] = []  # Tavily extract results, full text referenced by "content_ref"
     key_insights: List[Dict[str, Any]] = []  # Key insights from advanced processing
     structured_data: Dict[str, Any] = {}  # Mapped financial data
     content_quality_score: Optional[float] = None  # Overall content quality
     sentiment: Optional[str] = None
     confidence: Optional[float] = None
-    prices: Dict[str, float] = {}
+    article_sentiments: List[Dict[str, Any]] = []  # Per-article scores behind the aggregate sentiment
+    prices: Dict[str, float] = {}  # {"date": close}; only filled from price_series at the API edge
+    price_series: Optional[Any] = None  # PriceSeries (NumPy OHLCV columns) from the price agent
     trend: Optional[Dict[str, Any]] = None
     recommendation: Optional[str] = None
     insight: Optional[str] = None
     summary: Optional[str] = None
     log_id: Optional[str] = None
+    deadline_at: Optional[float] = None  # Epoch seconds by which the whole run must finish
+    priority: str = "default"  # Rate-limiter queue priority: interactive, default, batch or background
+    depth: str = "deep"  # Which pipeline produced this state: quick, standard or deep
+    indicators: Optional[Dict[str, Any]] = None  # Local indicator snapshot (quick and standard depths)
+    arena_id: Optional[str] = None  # Blob arena holding this run's article bodies
+
+# Analysis depth: quick = price + local indicators (no LLM), standard = basic news search + one
+# sentiment call, deep = the full pipeline (all four Tavily features and four LLM steps)
+Depth = Literal["quick", "standard", "deep"]
+DEPTHS = ("quick", "standard", "deep")  # shallowest first
 
 class QueryRequest(BaseModel):
     """Request format for analysis endpoints"""
     ticker: str
+    depth: Depth = "deep"
+
+# Set up the analysis workflows - each step feeds into the next; one compiled graph per depth
+
+# The order of steps for each depth
+PIPELINES = {
+    # price -> indicators -> log
+    "quick": [("price", price_agent), ("indicators", indicator_agent), ("logger", logger_agent)],
+    # price -> basic news search -> sentiment -> indicators -> log
+    "standard": [("price", price_agent), ("market_news", market_news_basic_agent), ("sentiment", sentiment_agent),
+                 ("indicators", indicator_agent), ("logger", logger_agent)],
+    # price -> news -> sentiment -> trend -> prediction -> summary -> log
+    "deep": [("price", price_agent), ("market_news", market_news_agent), ("sentiment", sentiment_agent),
+             ("trend", trend_agent), ("prediction", prediction_agent), ("summary", summary_agent),
+             ("logger", logger_agent)],
+}
+
+def build_graph(steps) -> StateGraph:
+    graph = StateGraph(state_schema=GraphState)
+    for name, agent in steps:
+        graph.add_node(name, agent)
+    graph.set_entry_point(steps[0][0])
+    for (current, _), (following, _) in zip(steps, steps[1:]):
+        graph.add_edge(current, following)
+    graph.set_finish_point(steps[-1][0])
+    return graph
+
+# Compile the workflows
+compiled_graphs = {depth: build_graph(steps).compile() for depth, steps in PIPELINES.items()}
+compiled_graph = compiled_graphs["deep"]
+
+# Initial state for one pipeline run, stamped with the request-level deadline
+def pipeline_input(ticker: str, priority: str = "default", depth: str = "deep",
+                   arena_id: Optional[str] = None) -> Dict[str, Any]:
+    return {"ticker": ticker, "deadline_at": deadline.new_deadline(), "priority": priority, "depth": depth,
+            "arena_id": arena_id}
+
+# Final graph state -> plain API result: the array-backed price series becomes the {"date": close} dict,
+# news records become dicts and extracted article text is read back from the run's blob arena
+def to_api_result(state: Any) -> Dict[str, Any]:
+    result = dict(state)
+    series = result.pop("price_series", None)
+    if isinstance(series, price_series.PriceSeries):
+        result["prices"] = series.to_dict()
+    result["news"] = news_items.news_dicts(result.get("news"))
+    result["extracted_content"] = news_items.extracted_dicts(result, result.get("extracted_content"))
+    result.pop("arena_id", None)
+    return result
+
+# One pipeline run with its own blob arena, released as soon as the result is built
+def invoke_pipeline(ticker: str, priority: str = "default", depth: str = "deep") -> Dict[str, Any]:
+    arena_id = blob_arena.open_arena()
+    try:
+        return to_api_result(compiled_graphs[depth].invoke(pipeline_input(ticker, priority, depth, arena_id)))
+    finally:
+        blob_arena.close_arena(arena_id)
+
+# Shared-cache keys for a ticker's analysis at a depth (deep keeps the original, unprefixed keys)
+def analysis_key(ticker: str, depth: str = "deep", last: bool = False) -> str:
+    prefix = "analysis:last:" if last else "analysis:"
+    return f"{prefix}{ticker.upper()}" if depth == "deep" else f"{prefix}{depth}:{ticker.upper()}"
+
+# Depths whose results can answer a request for `depth` (a deep analysis covers a quick one), deepest first
+def covering_depths(depth: str) -> List[str]:
+    return list(reversed(DEPTHS[DEPTHS.index(depth):]))
+
+# Caps concurrent pipeline runs in this worker and sheds the excess with 429 + Retry-After
+admission_controller = admission.AdmissionController()
+
+# Run the pipeline for a ticker, reusing a recent result from the shared cache.
+# Across all workers only one computes a given ticker and depth at a time; the rest wait for its result.
+# A fresh cached result of a deeper run is served as-is to shallower requests.
+# refresh=True recomputes even if a cached result exists (used by the pre-warm scheduler).
+async def run_pipeline(ticker: str, priority: str = "default", refresh: bool = False, depth: str = "deep") -> Dict[str, Any]:
+    cache = shared_cache.get_cache()
+    key = analysis_key(ticker, depth)
+    if not refresh and depth == "deep":
+        prewarm_scheduler.record_request(ticker)
+
+    def cached_result() -> Optional[Dict[str, Any]]:
+        for candidate in covering_depths(depth):
+            result = cache.get(analysis_key(ticker, candidate))
+            if result is not None:
+                return result
+        return None
+
+    def compute() -> Dict[str, Any]:
+        result = invoke_pipeline(ticker, priority, depth)
+        result["analyzed_at"] = time.time()
+        # Longer-lived copy that stale-while-revalidate can serve while a refresh runs
+        cache.set(analysis_key(ticker, depth, last=True), result, settings.SWR_MAX_AGE)
+        return result
+
+    if not refresh:
+        result = await anyio.to_thread.run_sync(cached_result)
+        if result is not None:
+            return result
+    # Cached results are served above whatever the load; only an actual run needs a slot (429 when shedding)
+    async with admission_controller.admit(priority):
+        return await anyio.to_thread.run_sync(
+            lambda: cache.get_or_compute(key, compute, ttl=settings.ANALYSIS_CACHE_TTL, force=refresh)
+        )
 
-# Set up the analysis workflow - each step feeds into the next
-
-graph = StateGraph(state_schema=GraphState)
-
-# Add each analysis step
-graph.add_node("price", price_agent)
-graph.add_node("market_news", market_news_agent)
-graph.add_node("sentiment", sentiment_agent)
-graph.add_node("trend", trend_agent)
-graph.add_node("prediction", prediction_agent)
-graph.add_node("summary", summary_agent)
-graph.add_node("logger", logger_agent)
+# Keeps the most requested tickers fresh in the shared cache
+prewarm_scheduler = prewarm.PrewarmScheduler(
+    collection=lambda: mongo,
+    refresh=lambda ticker: run_pipeline(ticker, priority="background", refresh=True),
+)
 
-# Define the order: price -> news -> sentiment -> trend -> prediction -> summary -> log
-graph.set_entry_point("price")
-graph.add_edge("price", "market_news")
-graph.add_edge("market_news", "sentiment")
-graph.add_edge("sentiment", "trend")
-graph.add_edge("trend", "prediction")
-graph.add_edge("prediction", "summary")
-graph.add_edge("summary", "logger")
-graph.set_finish_point("logger")
+# Watches indicators for the watchlist and re-analyses a ticker when a threshold is crossed
+watch_engine = watch.WatchEngine(
+    trigger=lambda ticker: run_pipeline(ticker, priority="background", refresh=True),
+)
 
-# Compile the workflow
-compiled_graph = graph.compile()
+# Analyses run as jobs: stored in MongoDB, claimed by any worker's runners, results kept for polling
+job_queue = jobs.JobQueue(
+    collection=lambda: mongo.database[settings.JOBS_COLLECTION],
+    run=lambda ticker, depth: run_pipeline(ticker, depth=depth),
+)
 
 # Helper function to format results for storage
 
@@ -126,6 +257,7 @@ def normalize_output(query_id, ticker, result):
         "summary": result.get("summary"),
         "sentiment": result.get("sentiment"),
         "confidence": result.get("confidence"),
+        "article_sentiments": result.get("article_sentiments", []),
         "recommendation": result.get("recommendation"),
         "insight": result.get("insight"),
         "trend": result.get("trend"),  # if available
@@ -134,7 +266,8 @@ def normalize_output(query_id, ticker, result):
         "extracted_content": result.get("extracted_content", []),  # Full article content
         "key_insights": result.get("key_insights", []),  # Advanced insights
         "structured_data": result.get("structured_data", {}),  # Mapped financial data
-        "content_quality_score": result.get("content_quality_score")  # Quality metrics
+        "content_quality_score": result.get("content_quality_score"),  # Quality metrics
+        "depth": result.get("depth") or "deep",
     }
 
 # Routes
@@ -144,62 +277,169 @@ def normalize_output(query_id, ticker, result):
 async def health_check():
     return {"status": "ok"}
 
+# Pipeline slots in use, queued requests and shed load (for monitoring)
+@app.get("/health/admission", tags=["Health"])
+async def admission_health():
+    return admission_controller.stats()
+
+# Upstream circuit breaker states (for monitoring)
+@app.get("/health/breakers", tags=["Health"])
+async def breaker_health():
+    return circuit_breaker.breaker_states()
+
+# Upstream rate limiter buckets and queue depth (for monitoring)
+@app.get("/health/rate_limits", tags=["Health"])
+async def rate_limit_health():
+    return rate_limiter.limiter_states()
+
+# LLM latency percentiles per model and hedged-request outcomes (for monitoring)
+@app.get("/health/models", tags=["Health"])
+async def model_health():
+    return model_router.get_router().stats()
+
+# LLM calls in flight per model, bulk lane queue and micro-batching counters (for monitoring)
+@app.get("/health/llm", tags=["Health"])
+async def llm_health():
+    return llm_gateway.gateway_stats()
+
+# Cross-ticker article index: articles reused, extracts reused and Tavily fetches skipped (for monitoring)
+@app.get("/health/articles", tags=["Health"])
+async def article_index_health():
+    return article_index.index_stats()
+
+# Blob arenas of in-flight pipeline runs; arenas that never close point at a leak (for monitoring)
+@app.get("/health/arenas", tags=["Health"])
+async def arena_health():
+    return blob_arena.arena_stats()
+
+# Job runners in this worker and the jobs they are running (for monitoring)
+@app.get("/health/jobs", tags=["Health"])
+async def jobs_health():
+    return job_queue.status()
+
+# Pre-warm scheduler status (for monitoring)
+@app.get("/health/prewarm", tags=["Health"])
+async def prewarm_health():
+    return prewarm_scheduler.status()
+
+# Watchlist engine counters and recent threshold events (for monitoring)
+@app.get("/health/watch", tags=["Health"])
+async def watch_health():
+    return watch_engine.status()
+
+# Live quote pollers and subscriber counts (for monitoring)
+@app.get("/health/quotes", tags=["Health"])
+async def quotes_health():
+    return quote_hub.status()
+
+# Rendered PDF cache and render pool (for monitoring)
+@app.get("/health/pdf", tags=["Health"])
+async def pdf_health():
+    return pdf_renderer.cache_stats()
+
 # Run full analysis (POST)
+# Analysis routes accept `fields=` (e.g. "price,recommendation") to return only part of the payload
+# and `depth=` (quick | standard | deep, default deep) to trade detail for cost and latency
 @app.post("/analyze", response_model=GraphState, tags=["Analysis"])
-async def analyze_post(req: QueryRequest):
+async def analyze_post(req: QueryRequest, request: Request, fields: Optional[str] = None):
     try:
-        return await anyio.to_thread.run_sync(compiled_graph.invoke, {"ticker": req.ticker})
+        result = await run_pipeline(req.ticker, depth=req.depth)
+    except admission.Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return await json_response(result, fields, request)
 
 # Run full analysis (GET)
 @app.get("/analyze/{ticker}", response_model=GraphState, tags=["Analysis"])
-async def analyze_get(ticker: str):
+async def analyze_get(ticker: str, request: Request, fields: Optional[str] = None, depth: Depth = "deep"):
     try:
-        return await anyio.to_thread.run_sync(compiled_graph.invoke, {"ticker": ticker})
+        result = await run_pipeline(ticker, depth=depth)
+    except admission.Overloaded:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    return await json_response(result, fields, request, analysis_etag(result, "analyze", fields))
     
+# Analysis jobs
+# POST /jobs answers at once with 202 and the job's URL; GET /jobs/{job_id}?wait=N holds the request
+# for up to N seconds (capped at JOBS_MAX_WAIT) until the job finishes, then returns it with its result.
+# Jobs run whether or not the client stays connected, so nothing is lost when a connection is cut.
+@app.post("/jobs", status_code=202, tags=["Jobs"])
+async def create_job(req: QueryRequest):
+    try:
+        job = await job_queue.submit(req.ticker.strip().upper(), req.depth)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Could not queue the job: {e}")
+    return JSONResponse(job, status_code=202, headers={"Location": f"/jobs/{job['job_id']}"})
+
+@app.get("/jobs/{job_id}", tags=["Jobs"])
+async def get_job(job_id: str, wait: float = 0):
+    try:
+        job = await (job_queue.wait(job_id, wait) if wait > 0 else job_queue.get(job_id))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Could not read the job: {e}")
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
 # Detect ticker from company name
+# The local symbol index answers almost every lookup; Tavily web search is only a fallback
+# for misses, and what it finds is written back into the index.
 @app.get("/detect_ticker", tags=["Ticker"])
 async def detect_ticker(company: str):
-    from tavily import TavilyClient
-    client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+    match = symbols.get_index().lookup(company)
+    if match:
+        return {**match, "source": "index"}
 
     try:
-        response = client.search(query=f"Ticker symbol for {company}", max_results=3)
-        for res in response["results"]:
-            title = res["title"]
-            content = res.get("content", "")
-            combined_text = f"{title} {content}"
-
-            # Match patterns for ticker symbols
-            match = (
-                # Company Name (TICKER) format
-                re.search(r'\(([A-Z]{1,5})\)', combined_text) or
-                # NYSE: TICKER or NASDAQ: TICKER format
-                re.search(r'(?:NYSE|NASDAQ)[:\s]+([A-Z]{1,5})', combined_text) or
-                # Ticker: TICKER format
-                re.search(r'Ticker[:\s]+([A-Z]{1,5})', combined_text) or
-                # Symbol: TICKER format
-                re.search(r'Symbol[:\s]+([A-Z]{1,5})', combined_text) or
-                # General Motors Corporation (GM) - specific pattern
-                re.search(r'Corporation[:\s]+\(([A-Z]{1,5})\)', combined_text) or
-                # Look for ticker patterns in content
-                re.search(r'\b([A-Z]{1,5})\s+stock', combined_text) or
-                re.search(r'stock\s+([A-Z]{1,5})\b', combined_text)
-            )
-
-            if match:
-                ticker = match.group(1)
-                if ticker not in ["NYSE", "NASDAQ", "STOCK", "INC", "CORP", "LLC", "LTD"]:
-                    return {"ticker": ticker}
-
-        return {"ticker": None, "message": "Ticker not found in results"}
+        ticker = await anyio.to_thread.run_sync(_search_ticker, company)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if ticker:
+        await anyio.to_thread.run_sync(symbols.get_index().learn, company, ticker)
+        return {"ticker": ticker, "source": "search"}
+    return {"ticker": None, "message": "Ticker not found in results"}
+
+# Autocomplete for the search bar, answered entirely from the in-memory symbol index
+@app.get("/symbols/suggest", tags=["Ticker"])
+async def suggest_symbols(q: str = "", limit: int = 8):
+    return {"query": q, "suggestions": symbols.get_index().suggest(q, limit)}
+
+def _search_ticker(company: str) -> Optional[str]:
+    from tavily import TavilyClient
+    client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+
+    response = client.search(query=f"Ticker symbol for {company}", max_results=3)
+    for res in response["results"]:
+        title = res["title"]
+        content = res.get("content", "")
+        combined_text = f"{title} {content}"
+
+        # Match patterns for ticker symbols
+        match = (
+            # Company Name (TICKER) format
+            re.search(r'\(([A-Z]{1,5})\)', combined_text) or
+            # NYSE: TICKER or NASDAQ: TICKER format
+            re.search(r'(?:NYSE|NASDAQ)[:\s]+([A-Z]{1,5})', combined_text) or
+            # Ticker: TICKER format
+            re.search(r'Ticker[:\s]+([A-Z]{1,5})', combined_text) or
+            # Symbol: TICKER format
+            re.search(r'Symbol[:\s]+([A-Z]{1,5})', combined_text) or
+            # General Motors Corporation (GM) - specific pattern
+            re.search(r'Corporation[:\s]+\(([A-Z]{1,5})\)', combined_text) or
+            # Look for ticker patterns in content
+            re.search(r'\b([A-Z]{1,5})\s+stock', combined_text) or
+            re.search(r'stock\s+([A-Z]{1,5})\b', combined_text)
+        )
+
+        if match:
+            ticker = match.group(1)
+            if ticker not in ["NYSE", "NASDAQ", "STOCK", "INC", "CORP", "LLC", "LTD"]:
+                return ticker
+    return None
 
 
 
@@ -211,169 +451,363 @@ def root():
     
 # Query handler
 @app.post("/query")
-async def query_handler(req: QueryRequest):
+async def query_handler(req: QueryRequest, request: Request, fields: Optional[str] = None):
     query_id = str(uuid4())
     logging.info(f"[QUERY] Started analysis for {req.ticker} | Query ID: {query_id}")
 
     try:
-        result = await anyio.to_thread.run_sync(compiled_graph.invoke, {"ticker": req.ticker})
+        result = await run_pipeline(req.ticker, depth=req.depth)
         normalized = normalize_output(query_id, req.ticker, result)
 
         mongo.insert_one({**normalized})
         logging.info(f"[MONGO] Inserted query result into MongoDB | Query ID: {query_id}")
 
-        return normalized
-
+    except admission.Overloaded:
+        raise
     except Exception as e:
         logging.error(f"[ERROR] Query pipeline failed for {req.ticker} | Error: {e}")
         raise HTTPException(status_code=500, detail="Internal error in agent pipeline")
+    return await json_response(normalized, fields, request)
 
-# UI analyzer
-@app.get("/ui/analyze/{ticker}", tags=["UI"])
-async def analyze_ui(ticker: str):
-    try:
-        raw_result = await anyio.to_thread.run_sync(compiled_graph.invoke, {"ticker": ticker})
-
-    
-        if hasattr(raw_result, "dict"):
-            raw_result = raw_result.dict()
-        elif not isinstance(raw_result, dict):
-            try:
-                raw_result = dict(raw_result)
-            except Exception:
-                raw_result = vars(raw_result)
+# Shape a raw pipeline result into the payload the dashboard expects
+def build_ui_response(ticker: str, raw_result: Any) -> Dict[str, Any]:
+    if hasattr(raw_result, "dict"):
+        raw_result = raw_result.dict()
+    elif not isinstance(raw_result, dict):
+        try:
+            raw_result = dict(raw_result)
+        except Exception:
+            raw_result = vars(raw_result)
 
-        # --- Ensure 'price' is set to latest from 'prices' if missing or invalid ---
-        prices = raw_result.get("prices", {})
-        price = raw_result.get("price", None)
-        if (not isinstance(price, (int, float)) or price is None or price == 0) and prices:
-            # Get the latest price by date
+    # --- Ensure 'price' is set to latest from 'prices' if missing or invalid ---
+    prices = raw_result.get("prices", {})
+    price = raw_result.get("price", None)
+    if (not isinstance(price, (int, float)) or price is None or price == 0) and prices:
+        # Get the latest price by date
+        try:
+            latest_price = prices[max(prices.keys())]
+            raw_result["price"] = latest_price
+        except Exception:
             try:
-                latest_price = prices[max(prices.keys())]
-                raw_result["price"] = latest_price
+                raw_result["price"] = list(prices.values())[-1]
             except Exception:
-                try:
-                    raw_result["price"] = list(prices.values())[-1]
-                except Exception:
-                    pass
+                pass
 
-        summary = raw_result.get("summary", {})
-        if isinstance(summary, str):
-            summary = {"content": summary}
+    summary = raw_result.get("summary", {})
+    if isinstance(summary, str):
+        summary = {"content": summary}
 
-        sentiment = raw_result.get("sentiment", {})
-        if isinstance(sentiment, str):
-            sentiment = {"sentiment": sentiment}
+    sentiment = raw_result.get("sentiment", {})
+    if isinstance(sentiment, str):
+        sentiment = {"sentiment": sentiment}
 
-        trend = raw_result.get("trend", {})
-        if isinstance(trend, str):
-            trend = {"trend": trend}
+    trend = raw_result.get("trend", {})
+    if isinstance(trend, str):
+        trend = {"trend": trend}
 
-        recommendation = raw_result.get("recommendation", {})
-        if isinstance(recommendation, str):
-            recommendation = {"recommendation": recommendation}
+    recommendation = raw_result.get("recommendation", {})
+    if isinstance(recommendation, str):
+        recommendation = {"recommendation": recommendation}
 
-        price = raw_result.get("price", {})
-        if isinstance(price, str):
-            price = {"current_price": price}
+    price = raw_result.get("price", {})
+    if isinstance(price, str):
+        price = {"current_price": price}
 
-        news = raw_result.get("market_news", {})
-        if isinstance(news, str):
-            news = {"headlines": [news]}
+    news = raw_result.get("market_news", {})
+    if isinstance(news, str):
+        news = {"headlines": [news]}
 
-        prices = raw_result.get("prices", {})
-        latest_price = None
-        if isinstance(prices, dict) and prices:
-            # Get the latest price by date
-            try:
-                latest_price = prices[max(prices.keys())]
-            except Exception:
-                latest_price = list(prices.values())[-1]
-
-        news = raw_result.get("news", [])
-
-        # Ensure real_time_price is present and not overwritten by trend_agent
-        real_time_price = raw_result.get("price")
-        historical_prices = raw_result.get("prices", {})
-        summary_price = raw_result.get("summary", {}).get("price") if isinstance(raw_result.get("summary"), dict) else None
-        # Fallback: if real_time_price is missing or invalid, use latest non-zero from prices, then summary agent's price
-        def get_latest_nonzero_price(prices_dict):
-            if isinstance(prices_dict, dict) and prices_dict:
-                sorted_items = sorted(prices_dict.items())
-                for date, price in reversed(sorted_items):
-                    if isinstance(price, (int, float)) and price > 0:
-                        return price
-                    # Try to convert string price to float
-                    try:
-                        fprice = float(price)
-                        if fprice > 0:
-                            return fprice
-                    except Exception:
-                        continue
-            return None
-        # Try to convert real_time_price to float if it's a string
+    prices = raw_result.get("prices", {})
+    latest_price = None
+    if isinstance(prices, dict) and prices:
+        # Get the latest price by date
         try:
-            if isinstance(real_time_price, str):
-                real_time_price = float(real_time_price)
+            latest_price = prices[max(prices.keys())]
+        except Exception:
+            latest_price = list(prices.values())[-1]
+
+    news = raw_result.get("news", [])
+
+    # Ensure real_time_price is present and not overwritten by trend_agent
+    real_time_price = raw_result.get("price")
+    historical_prices = raw_result.get("prices", {})
+    summary_price = raw_result.get("summary", {}).get("price") if isinstance(raw_result.get("summary"), dict) else None
+    # Fallback: if real_time_price is missing or invalid, use latest non-zero from prices, then summary agent's price
+    def get_latest_nonzero_price(prices_dict):
+        if isinstance(prices_dict, dict) and prices_dict:
+            sorted_items = sorted(prices_dict.items())
+            for date, price in reversed(sorted_items):
+                if isinstance(price, (int, float)) and price > 0:
+                    return price
+                # Try to convert string price to float
+                try:
+                    fprice = float(price)
+                    if fprice > 0:
+                        return fprice
+                except Exception:
+                    continue
+        return None
+    # Try to convert real_time_price to float if it's a string
+    try:
+        if isinstance(real_time_price, str):
+            real_time_price = float(real_time_price)
+    except Exception:
+        real_time_price = None
+    if not isinstance(real_time_price, (int, float)) or real_time_price <= 0:
+        real_time_price = get_latest_nonzero_price(historical_prices)
+    if (real_time_price is None or real_time_price == 0) and summary_price:
+        try:
+            real_time_price = float(summary_price)
         except Exception:
-            real_time_price = None
-        if not isinstance(real_time_price, (int, float)) or real_time_price <= 0:
-            real_time_price = get_latest_nonzero_price(historical_prices)
-        if (real_time_price is None or real_time_price == 0) and summary_price:
-            try:
-                real_time_price = float(summary_price)
-            except Exception:
-                real_time_price = "N/A"
-        if real_time_price is None:
             real_time_price = "N/A"
-
-        # Ensure confidence is present from sentiment agent
-        confidence = raw_result.get("confidence")
+    if real_time_price is None:
+        real_time_price = "N/A"
+
+    # Ensure confidence is present from sentiment agent
+    confidence = raw_result.get("confidence")
+    if confidence is None:
+        sentiment_obj = raw_result.get("sentiment")
+        if isinstance(sentiment_obj, dict):
+            confidence = sentiment_obj.get("confidence")
         if confidence is None:
-            sentiment_obj = raw_result.get("sentiment")
-            if isinstance(sentiment_obj, dict):
-                confidence = sentiment_obj.get("confidence")
-            if confidence is None:
-                confidence = 0.0
-
-        response_dict = {
-            "symbol": ticker.upper(),
-            "price": real_time_price,
-            "prices": historical_prices,
-            "sentiment": raw_result.get("sentiment", "N/A"),
-            "confidence": confidence,
-            "summary": raw_result.get("summary", "N/A"),
-            "trend": raw_result.get("trend", {}),
-            "recommendation": raw_result.get("recommendation", "N/A"),
-            "insight": raw_result.get("insight", "N/A"),
-            "news": raw_result.get("news", []),
-            "chart_url": ""
-        }
-        print("FINAL RESPONSE:", response_dict)
-        return response_dict
+            confidence = 0.0
+
+    response_dict = {
+        "symbol": ticker.upper(),
+        "price": real_time_price,
+        "prices": historical_prices,
+        "sentiment": raw_result.get("sentiment", "N/A"),
+        "confidence": confidence,
+        "article_sentiments": raw_result.get("article_sentiments") or [],
+        "summary": raw_result.get("summary", "N/A"),
+        "trend": raw_result.get("trend", {}),
+        "recommendation": raw_result.get("recommendation", "N/A"),
+        "insight": raw_result.get("insight", "N/A"),
+        "news": raw_result.get("news", []),
+        "indicators": raw_result.get("indicators") or {},
+        "depth": raw_result.get("depth") or "deep",
+        "chart_url": ""
+    }
+    return response_dict
+
+# Most recent stored analysis for a ticker at `depth` or deeper, from the shared cache or MongoDB,
+# if not older than max_age
+def find_recent_analysis(ticker: str, max_age: float, depth: str = "deep") -> Optional[Dict[str, Any]]:
+    depths = covering_depths(depth)
+    for candidate in depths:
+        cached = shared_cache.get_cache().get(analysis_key(ticker, candidate, last=True))
+        if cached and cached.get("analyzed_at") and time.time() - cached["analyzed_at"] <= max_age:
+            return cached
+    try:
+        since = datetime.utcnow() - timedelta(seconds=max_age)
+        # Records stored before depths existed have no depth field and are deep analyses
+        stored_depths = depths + [None] if "deep" in depths else depths
+        record = mongo.find_one(
+            {"ticker": {"$in": [ticker, ticker.upper(), ticker.lower()]}, "timestamp": {"$gte": since},
+             "depth": {"$in": stored_depths}},
+            sort=[("timestamp", -1)],
+        )
+    except Exception as e:
+        logging.error(f"[SWR] Stored analysis lookup failed for {ticker}: {e}")
+        return None
+    if not record:
+        return None
+    record.pop("_id", None)
+    record["analyzed_at"] = record["timestamp"].replace(tzinfo=timezone.utc).timestamp()
+    return record
+
+# Refresh a ticker in the background, at most once at a time per worker
+_refreshing_tickers: set = set()
+_background_tasks: set = set()
+
+def schedule_refresh(ticker: str, depth: str = "deep") -> None:
+    key = analysis_key(ticker, depth)
+    if key in _refreshing_tickers:
+        return
+    _refreshing_tickers.add(key)
+
+    async def _refresh():
+        try:
+            await run_pipeline(ticker, refresh=True, depth=depth)
+            logging.info(f"[SWR] Background refresh finished for {key}")
+        except Exception as e:
+            logging.error(f"[SWR] Background refresh failed for {key}: {e}")
+        finally:
+            _refreshing_tickers.discard(key)
+
+    task = asyncio.create_task(_refresh())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
+# UI analyzer
+# With stale-while-revalidate (default on), a fresh cached result is returned as-is; otherwise a
+# recent stored analysis is returned immediately, flagged stale, while a refresh runs in the background.
+@app.get("/ui/analyze/{ticker}", tags=["UI"])
+async def analyze_ui(ticker: str, request: Request, swr: Optional[bool] = None, fields: Optional[str] = None,
+                     depth: Depth = "deep"):
+    use_swr = settings.UI_STALE_WHILE_REVALIDATE if swr is None else swr
+    try:
+        stale = False
+        raw_result = None
+        if use_swr:
+            cache = shared_cache.get_cache()
+            for candidate in covering_depths(depth):
+                raw_result = await anyio.to_thread.run_sync(cache.get, analysis_key(ticker, candidate))
+                if raw_result is not None:
+                    break
+            if raw_result is None:
+                raw_result = await anyio.to_thread.run_sync(find_recent_analysis, ticker, settings.SWR_MAX_AGE, depth)
+                if raw_result is not None:
+                    stale = True
+                    schedule_refresh(ticker, depth)
+        if raw_result is None:
+            raw_result = await run_pipeline(ticker, priority="interactive", depth=depth)
+
+        # Same analysis run as the client already has: skip shaping and serializing it again
+        etag = analysis_etag(raw_result, "ui", stale, fields) if isinstance(raw_result, dict) else None
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
+        response_dict = build_ui_response(ticker, raw_result)
+        analyzed_at = raw_result.get("analyzed_at") if isinstance(raw_result, dict) else None
+        response_dict["stale"] = stale
+        response_dict["age_seconds"] = round(time.time() - analyzed_at, 1) if analyzed_at else 0.0
+        response_dict["analyzed_at"] = datetime.utcfromtimestamp(analyzed_at).isoformat() if analyzed_at else None
+
+    except admission.Overloaded:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="UI analyzer failed: " + str(e))
+    return await json_response(response_dict, fields, request, etag)
+
+# Live quotes
+# Clients connect to /ws/quotes?symbols=AAPL,MSFT and may send {"action": "subscribe" | "unsubscribe",
+# "symbols": [...]}. Each symbol is polled once per worker no matter how many clients follow it.
+quote_hub = quotes.QuoteHub()
+
+@app.websocket("/ws/quotes")
+async def quotes_ws(websocket: WebSocket, initial: Optional[str] = Query(None, alias="symbols")):
+    await websocket.accept()
+    queue = quote_hub.new_queue()
+    subscribed: set = set()
+
+    def subscribe(requested) -> None:
+        for symbol in quotes.parse_symbols(requested) - subscribed:
+            if len(subscribed) >= settings.QUOTE_MAX_SYMBOLS_PER_CONNECTION:
+                quotes.offer(queue, {"type": "error", "message": f"At most {settings.QUOTE_MAX_SYMBOLS_PER_CONNECTION} symbols per connection"})
+                return
+            subscribed.add(symbol)
+            quote_hub.subscribe(symbol, queue)
+
+    async def sender() -> None:
+        try:
+            while True:
+                await websocket.send_json(await queue.get())
+        except Exception:
+            # The socket closed; the receive loop below notices and cleans up
+            pass
 
-    
+    subscribe(initial)
+    send_task = asyncio.create_task(sender())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action") if isinstance(message, dict) else None
+            if action == "subscribe":
+                subscribe(message.get("symbols"))
+            elif action == "unsubscribe":
+                for symbol in quotes.parse_symbols(message.get("symbols")) & subscribed:
+                    subscribed.discard(symbol)
+                    quote_hub.unsubscribe(symbol, queue)
+            else:
+                quotes.offer(queue, {"type": "error", "message": "Expected {\"action\": \"subscribe\" | \"unsubscribe\", \"symbols\": [...]}"})
+    except (WebSocketDisconnect, ValueError):
+        # ValueError: the client sent something that isn't JSON
+        pass
+    finally:
+        send_task.cancel()
+        quote_hub.unsubscribe_all(queue)
+
+# Watchlist
+# Watched tickers are followed bar by bar; a full analysis runs only when an indicator threshold is crossed
+def _watch_symbol(ticker: str) -> str:
+    symbol = ticker.strip().upper()
+    if not quotes.SYMBOL_PATTERN.match(symbol):
+        raise HTTPException(status_code=400, detail=f"Invalid ticker: {ticker}")
+    return symbol
+
+@app.get("/watch", tags=["Watch"])
+async def get_watchlist():
+    symbols = await anyio.to_thread.run_sync(watch_engine.watchlist)
+    return {"symbols": symbols, "indicators": watch_engine.indicators()}
+
+@app.get("/watch/{ticker}", tags=["Watch"])
+async def get_watch(ticker: str):
+    symbol = _watch_symbol(ticker)
+    indicators = watch_engine.indicators(symbol)
+    if symbol not in indicators:
+        raise HTTPException(status_code=404, detail=f"{symbol} is not watched yet")
+    return indicators[symbol]
+
+@app.post("/watch/{ticker}", tags=["Watch"])
+async def add_watch(ticker: str):
+    symbol = _watch_symbol(ticker)
+    try:
+        symbols = await anyio.to_thread.run_sync(watch_engine.add, symbol)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"symbols": symbols}
 
-        return normalized
+@app.delete("/watch/{ticker}", tags=["Watch"])
+async def remove_watch(ticker: str):
+    symbols = await anyio.to_thread.run_sync(watch_engine.remove, _watch_symbol(ticker))
+    return {"symbols": symbols}
 
-    except Exception as e:
-        logging.error(f"Query failed: {e}")
-        raise HTTPException(status_code=500, detail="Internal error in agent pipeline")
-    
 # Export query JSON
 @app.get("/export/query/{query_id}", tags=["Export"])
-def export_query_json(query_id: str):
-    record = mongo.find_one({"query_id": query_id})
+async def export_query_json(query_id: str, request: Request, fields: Optional[str] = None):
+    # Stored query records never change, so a client holding this ID's ETag needs no lookup
+    etag = etag_for("query", query_id, fields)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    record = await anyio.to_thread.run_sync(mongo.find_one, {"query_id": query_id})
     if not record:
         raise HTTPException(status_code=404, detail="Query ID not found")
     
     record.pop("_id", None)
-    return record
+    return await json_response(record, fields, request, etag)
+
+# Bulk export of stored analyses, streamed from a Mongo cursor
+# tickers: comma-separated; start/end: ISO dates or datetimes (UTC), end exclusive; format: csv | parquet
+@app.get("/export/history", tags=["Export"])
+async def export_history(tickers: Optional[str] = None, start: Optional[str] = None,
+                         end: Optional[str] = None, format: str = "csv"):
+    try:
+        start_at = datetime.fromisoformat(start) if start else None
+        end_at = datetime.fromisoformat(end) if end else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be ISO dates, e.g. 2025-01-31")
+    if format not in ("csv", "parquet"):
+        raise HTTPException(status_code=400, detail="format must be csv or parquet")
+    if format == "parquet" and not history_export.parquet_available():
+        # Only reachable when the pyarrow requirement failed to install
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed on the server")
+
+    ticker_list = [t.strip() for t in (tickers or "").split(",") if t.strip()]
+    query = history_export.history_filter(ticker_list, start_at, end_at)
+    cursor = await anyio.to_thread.run_sync(history_export.open_cursor, mongo, query)
+    # Sync generators: Starlette iterates them in its threadpool, so cursor reads don't block the loop
+    if format == "parquet":
+        body, media_type = history_export.iter_parquet(cursor), "application/vnd.apache.parquet"
+    else:
+        body, media_type = history_export.iter_csv(cursor), "text/csv"
+    filename = f"analysis_history_{datetime.utcnow().strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 # Test MongoDB connection
 @app.get("/test-mongo")
@@ -390,8 +824,12 @@ def test_mongo():
 
 # Export CSV
 @app.get("/analyze/{ticker}/export/csv", tags=["Export"])
-async def export_csv(ticker: str):
-    result: dict = await anyio.to_thread.run_sync(compiled_graph.invoke, {"ticker": ticker})
+async def export_csv(ticker: str, request: Request):
+    result: dict = await run_pipeline(ticker)
+    etag = analysis_etag(result, "csv")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
     buf = io.StringIO()
     writer = csv.writer(buf)
     writer.writerow(["field", "value"])
@@ -410,26 +848,22 @@ async def export_csv(ticker: str):
     for date, price in result["prices"].items():
         writer.writerow([date, price])
 
-    buf.seek(0)
-    return StreamingResponse(
-        buf,
-        media_type="text/csv",
+    return await negotiated_response(
+        request,
+        buf.getvalue().encode("utf-8"),
+        "text/csv",
+        etag,
         headers={"Content-Disposition": f"attachment; filename={ticker}_analysis.csv"},
     )
 
 # ─── PDF Export ───
 
-def safe_text(text):
-    clean = re.sub(r'[^\x20-\x7E]+', ' ', str(text))  # strip non-ASCII
-    clean = clean.replace("\n", " ").replace("\r", " ")
-    return clean[:200]
-
 # Export PDF
 @app.get("/analyze/{ticker}/export/pdf", tags=["Export"])
-async def export_pdf(ticker: str):
+async def export_pdf(ticker: str, request: Request):
     try:
         # Get analysis data
-        raw_result = await anyio.to_thread.run_sync(compiled_graph.invoke, {"ticker": ticker})
+        raw_result = await run_pipeline(ticker)
         
         # Convert to dict if it's a Pydantic model
         if hasattr(raw_result, "dict"):
@@ -441,73 +875,25 @@ async def export_pdf(ticker: str):
                 result = vars(raw_result)
         else:
             result = raw_result
-            
-        # Create PDF
-        buf = io.BytesIO()
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-
-        # Header
-        pdf.cell(0, 10, f"EchoMarket Analysis Report - {ticker}", ln=True)
-        pdf.ln(5)
-
-        # Key metrics
-        sentiment = safe_text(result.get('sentiment', 'N/A'))
-        confidence = safe_text(result.get('confidence', 'N/A'))
-        recommendation = safe_text(result.get('recommendation', 'N/A'))
-        
-        pdf.cell(0, 8, f"Sentiment: {sentiment} (Confidence: {confidence})", ln=True)
-        pdf.cell(0, 8, f"Recommendation: {recommendation}", ln=True)
-        pdf.ln(3)
-
-        # Insight
-        insight = safe_text(result.get('insight', 'No insight available'))
-        pdf.multi_cell(0, 8, f"Key Insight: {insight}")
-        pdf.ln(3)
-
-        # Summary
-        pdf.set_font("Arial", style="B", size=11)
-        pdf.cell(0, 8, "Executive Summary:", ln=True)
-        pdf.set_font("Arial", size=10)
-        summary = safe_text(result.get('summary', 'No summary available'))
-        pdf.multi_cell(0, 6, summary)
-        pdf.ln(3)
-
-        # News headlines (limit to 5)
-        pdf.set_font("Arial", style="B", size=11)
-        pdf.cell(0, 8, "Top News Headlines:", ln=True)
-        pdf.set_font("Arial", size=10)
-        
-        news_items = result.get("news", [])
-        for idx, item in enumerate(news_items[:5], start=1):
-            if isinstance(item, dict):
-                title = safe_text(item.get("title", "News item"))
-                pdf.multi_cell(0, 6, f"{idx}. {title}")
-                pdf.ln(1)
-
-        # Price data
-        pdf.ln(3)
-        pdf.set_font("Arial", style="B", size=11)
-        pdf.cell(0, 8, "Recent Price Data:", ln=True)
-        pdf.set_font("Arial", size=10)
-        
-        prices = result.get("prices", {})
-        if prices:
-            for date, price in list(prices.items())[-5:]:  # Last 5 days
-                pdf.cell(0, 6, f"{date}: ${price}", ln=True)
-        else:
-            pdf.cell(0, 6, "No price data available", ln=True)
 
-        pdf.output(buf)
-        buf.seek(0)
+        etag = analysis_etag(result, "pdf")
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+            
+        # Rendered in the worker pool, or served from the rendered-report cache
+        pdf_bytes = await pdf_renderer.render_pdf(ticker, result, etag)
         
-        return StreamingResponse(
-            buf,
-            media_type="application/pdf",
+        return await negotiated_response(
+            request,
+            pdf_bytes,
+            "application/pdf",
+            etag,
             headers={"Content-Disposition": f"attachment; filename={ticker}_analysis.pdf"},
         )
         
+    except admission.Overloaded:
+        raise
     except Exception as e:
         logging.error(f"PDF export failed for {ticker}: {e}")
         import traceback
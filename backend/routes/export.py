@@ -9,6 +9,7 @@ from fpdf import FPDF
 from datetime import datetime
 from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
+from backend.services.pdf_renderer import safe_text
 
 logger = logging.getLogger(__name__)
 
@@ -56,16 +57,8 @@ def export_to_pdf(analysis_data: dict, ticker: str) -> StreamingResponse:
         pdf.ln(2)
         pdf.cell(0, 6, "Reasoning:", ln=True)
         
-        insight_words = insight.split()
-        line = ""
-        for word in insight_words:
-            if len(line + word + " ") < 80:
-                line += word + " "
-            else:
-                pdf.cell(0, 5, line.strip(), ln=True)
-                line = word + " "
-        if line:
-            pdf.cell(0, 5, line.strip(), ln=True)
+        # multi_cell wraps to the page width itself
+        pdf.multi_cell(0, 5, safe_text(insight, 1000))
         pdf.ln(5)
         
         
@@ -73,17 +66,7 @@ def export_to_pdf(analysis_data: dict, ticker: str) -> StreamingResponse:
             pdf.set_font("Arial", "B", 12)
             pdf.cell(0, 8, "Executive Summary", ln=True)
             pdf.set_font("Arial", size=10)
-            summary = analysis_data["summary"]
-            summary_words = summary.split()
-            line = ""
-            for word in summary_words:
-                if len(line + word + " ") < 80:
-                    line += word + " "
-                else:
-                    pdf.cell(0, 5, line.strip(), ln=True)
-                    line = word + " "
-            if line:
-                pdf.cell(0, 5, line.strip(), ln=True)
+            pdf.multi_cell(0, 5, safe_text(analysis_data["summary"], 4000))
         
         # Add disclaimer
         pdf.ln(10)
@@ -93,10 +76,7 @@ def export_to_pdf(analysis_data: dict, ticker: str) -> StreamingResponse:
         pdf.cell(0, 4, "before making investment decisions.", ln=True)
         
         # Convert PDF to bytes and return as streaming response
-        pdf_output = io.BytesIO()
-        pdf_content = pdf.output(dest='S').encode('latin-1')
-        pdf_output.write(pdf_content)
-        pdf_output.seek(0)
+        pdf_content = bytes(pdf.output())
         filename = f"stock_analysis_{ticker}_{datetime.now().strftime('%Y%m%d')}.pdf"
         return StreamingResponse(
             io.BytesIO(pdf_content),
@@ -0,0 +1,125 @@
+# Admission control for pipeline runs
+# Each worker runs at most ADMISSION_MAX_IN_FLIGHT pipelines at once. Further requests wait in a
+# bounded queue (interactive requests ahead of the rest) for at most ADMISSION_QUEUE_TIMEOUT
+# seconds; when the queue is full or the wait runs out they get a fast 429 with Retry-After
+# instead of piling onto the thread pool until upstream timeouts cascade. Background and batch
+# runs never queue: they only start when a slot is free. Only actual pipeline runs are
+# admitted here, so health checks, cached results and exports of stored analyses are unaffected.
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+from fastapi import HTTPException
+from backend.config import settings
+
+QUEUEING_PRIORITIES = ("interactive", "default")
+RUN_SECONDS_PRIOR = 30.0  # assumed run time until real runs have been measured
+MAX_RETRY_AFTER = 300
+
+
+class Overloaded(HTTPException):
+    """429 telling the client when a slot is likely to be free"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(status_code=429, detail=f"Server busy: {reason}",
+                         headers={"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency plus a bounded, deadline-limited wait queue for one worker's event loop"""
+
+    def __init__(self):
+        self._in_flight = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {p: deque() for p in QUEUEING_PRIORITIES}
+        self._run_seconds = RUN_SECONDS_PRIOR
+        self._admitted = 0
+        self._queued = 0
+        self._rejected_full = 0
+        self._rejected_timeout = 0
+        self._shed_background = 0
+
+    def _waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def retry_after(self) -> int:
+        """Seconds until the requests already waiting (plus this one) have likely been served"""
+        rounds = math.ceil((self._waiting() + 1) / max(1, settings.ADMISSION_MAX_IN_FLIGHT))
+        return int(min(MAX_RETRY_AFTER, max(1, rounds * self._run_seconds)))
+
+    async def _acquire(self, priority: str) -> None:
+        if settings.ADMISSION_MAX_IN_FLIGHT <= 0:
+            self._in_flight += 1  # admission control disabled
+            return
+        if self._in_flight < settings.ADMISSION_MAX_IN_FLIGHT and not self._waiting():
+            self._in_flight += 1
+            return
+        if priority not in QUEUEING_PRIORITIES:
+            self._shed_background += 1
+            raise Overloaded(f"no free pipeline slot for {priority} work", self.retry_after())
+        if self._waiting() >= settings.ADMISSION_QUEUE_SIZE:
+            self._rejected_full += 1
+            raise Overloaded("analysis queue is full", self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._queues[priority]
+        queue.append(waiter)
+        self._queued += 1
+        try:
+            # The slot is handed over by _release, which resolves the future
+            await asyncio.wait_for(asyncio.shield(waiter), settings.ADMISSION_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return  # the slot arrived as the wait ran out
+            waiter.cancel()
+            queue.remove(waiter)
+            self._rejected_timeout += 1
+            raise Overloaded("timed out waiting for a pipeline slot", self.retry_after())
+        except asyncio.CancelledError:
+            # Client went away while queued; pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            elif waiter in queue:
+                queue.remove(waiter)
+            raise
+
+    def _release(self) -> None:
+        for priority in QUEUEING_PRIORITIES:
+            queue = self._queues[priority]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)  # the slot moves to the waiter; in_flight is unchanged
+                    return
+        self._in_flight -= 1
+
+    @asynccontextmanager
+    async def admit(self, priority: str = "default") -> AsyncIterator[None]:
+        """Hold a pipeline slot for the duration of the block; raises Overloaded (429) when shedding"""
+        await self._acquire(priority)
+        self._admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            # Moving average of run time, for Retry-After
+            self._run_seconds = 0.8 * self._run_seconds + 0.2 * (time.monotonic() - started)
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": settings.ADMISSION_MAX_IN_FLIGHT,
+            "in_flight": self._in_flight,
+            "queued": {p: len(q) for p, q in self._queues.items()},
+            "queue_size": settings.ADMISSION_QUEUE_SIZE,
+            "queue_timeout": settings.ADMISSION_QUEUE_TIMEOUT,
+            "avg_run_seconds": round(self._run_seconds, 1),
+            "retry_after": self.retry_after(),
+            "admitted_total": self._admitted,
+            "queued_total": self._queued,
+            "rejected_queue_full": self._rejected_full,
+            "rejected_queue_timeout": self._rejected_timeout,
+            "shed_background": self._shed_background,
+        }
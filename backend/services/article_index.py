@@ -0,0 +1,202 @@
+# Cross-ticker article index
+# News is searched per ticker but articles are not per ticker: a piece on "NVDA, AMD and INTC
+# earnings" used to be fetched and extracted once for each of the three. Every SEARCH, CRAWL and
+# EXTRACT result is recorded here by URL, with its text and the tickers and companies it mentions
+# (found with the local symbol index), plus an inverted index from each mentioned ticker to its
+# recent articles. The news agent starts from a ticker's indexed articles, asks Tavily only for
+# articles published since the ticker's last fetch (and not at all when that fetch is recent), and
+# extracts full text only for URLs no earlier analysis of any ticker has extracted.
+# Both maps live in the shared cache, so every worker (and host, with the Mongo backend) shares them.
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from backend.config import settings
+from backend.services import shared_cache, symbols
+
+logger = logging.getLogger(__name__)
+
+NEWS_FIELDS = ("title", "url", "snippet", "raw_content", "score", "source")
+EXTRACT_FIELDS = ("content", "word_count", "financial_figures", "key_quotes", "sentiment_indicators")
+MENTION_CHARS = 20000  # article text scanned for mentioned tickers
+LEASE_SECONDS = 5
+
+# Explicit ticker tags: "$NVDA", "(NASDAQ: AMD)". Bare upper-case words are not trusted (ALL, ONE, KEY and
+# headline caps are tickers too); a ticker written without a tag counts only through its company name.
+_TAGGED = re.compile(r"(?:\$|\b(?:NYSE|NASDAQ|Nasdaq|AMEX)\s*:\s*)([A-Z]{1,5}(?:\.[A-Z])?)\b")
+
+_stats = {"indexed_articles": 0, "reused_articles": 0, "reused_extracts": 0, "skipped_fetches": 0, "delta_fetches": 0,
+          "skipped_updates": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+
+def article_key(url: str) -> str:
+    return f"news_article:{_url_hash(url)}"
+
+
+def ticker_key(ticker: str) -> str:
+    return f"news_ticker:{ticker.upper()}"
+
+
+def _max_age() -> float:
+    return settings.ARTICLE_INDEX_MAX_AGE_HOURS * 3600
+
+
+def mentioned(text: str) -> Dict[str, str]:
+    """Tickers mentioned in `text`, with their company names"""
+    index = symbols.get_index()
+    text = (text or "")[:MENTION_CHARS]
+    found = set(_TAGGED.findall(text)) | index.mentions(text)
+    records = (index.get(symbol) for symbol in found)
+    return {record.symbol: record.name for record in records if record is not None}
+
+
+# --- Per-ticker index (URL -> time indexed, plus the last fetch per feature) ---
+
+def _ticker_entry(cache: shared_cache.SharedCache, ticker: str) -> Dict[str, Any]:
+    entry = cache.get(ticker_key(ticker)) or {}
+    return {"articles": entry.get("articles", {}), "fetched": entry.get("fetched", {})}
+
+
+def _update_ticker(cache: shared_cache.SharedCache, ticker: str, urls: Iterable[str] = (),
+                   feature: Optional[str] = None) -> None:
+    key = ticker_key(ticker)
+    # Read-modify-write under a short lease. If another worker holds it the update is skipped: the
+    # articles themselves are already indexed, and a missed link or fetch time only costs a refetch.
+    token = cache.acquire_lease(key, LEASE_SECONDS)
+    if token is None:
+        _count("skipped_updates")
+        return
+    try:
+        now = time.time()
+        entry = _ticker_entry(cache, ticker)
+        for url in urls:
+            entry["articles"].setdefault(url, now)
+        if feature:
+            entry["fetched"][feature] = now
+        # Newest articles within the age limit, at most ARTICLE_INDEX_MAX_PER_TICKER
+        recent = sorted(((t, u) for u, t in entry["articles"].items() if now - t <= _max_age()), reverse=True)
+        entry["articles"] = {u: t for t, u in recent[:settings.ARTICLE_INDEX_MAX_PER_TICKER]}
+        cache.set(key, entry, ttl=_max_age())
+    finally:
+        cache.release_lease(key, token)
+
+
+def last_fetch(ticker: str, feature: str) -> Optional[float]:
+    """When `feature` (SEARCH / CRAWL) last returned results for the ticker, as a Unix time"""
+    return _ticker_entry(shared_cache.get_cache(), ticker)["fetched"].get(feature)
+
+
+def is_fresh(ticker: str, feature: str) -> bool:
+    """True when the ticker's last `feature` fetch is recent enough to answer from the index alone"""
+    fetched = last_fetch(ticker, feature)
+    fresh = fetched is not None and time.time() - fetched < settings.ARTICLE_INDEX_REFRESH_SECONDS
+    if fresh:
+        _count("skipped_fetches")
+    return fresh
+
+
+def delta_window(ticker: str, feature: str) -> Optional[str]:
+    """Tavily `time_range` covering what was published since the ticker's last fetch; None for a full search"""
+    fetched = last_fetch(ticker, feature)
+    if fetched is None or time.time() - fetched > _max_age():
+        return None  # older articles are no longer in the index
+    _count("delta_fetches")
+    return "day" if time.time() - fetched < 86400 else "week"
+
+
+# --- Articles ---
+
+def record(ticker: str, feature: str, items: List[Dict[str, Any]]) -> None:
+    """Index SEARCH / CRAWL results fetched for `ticker` under every ticker they mention"""
+    if not items:
+        return
+    cache = shared_cache.get_cache()
+    by_ticker: Dict[str, List[str]] = {ticker.upper(): []}
+    for item in items:
+        url = item.get("url")
+        if not url:
+            continue
+        article = cache.get(article_key(url)) or {"url": url, "indexed_at": time.time()}
+        for field in NEWS_FIELDS:
+            # A crawl's raw page is kept when a later search only has the snippet
+            if item.get(field) or field not in article:
+                article[field] = item.get(field)
+        tickers = mentioned(f"{article.get('title', '')} {article.get('snippet', '')} {article.get('raw_content') or ''}")
+        article["tickers"] = sorted(set(article.get("tickers", [])) | set(tickers) | {ticker.upper()})
+        article["entities"] = sorted(set(article.get("entities", [])) | set(tickers.values()))
+        cache.set(article_key(url), article, ttl=_max_age())
+        _count("indexed_articles")
+        for symbol in article["tickers"]:
+            by_ticker.setdefault(symbol, []).append(url)
+    for symbol, urls in by_ticker.items():
+        _update_ticker(cache, symbol, urls, feature if symbol == ticker.upper() else None)
+
+
+def record_extracted(ticker: str, extracted: List[Dict[str, Any]]) -> None:
+    """Add EXTRACT full text to the indexed articles, so no ticker extracts the same URL again"""
+    cache = shared_cache.get_cache()
+    by_ticker: Dict[str, List[str]] = {}
+    for content in extracted:
+        url = content.get("url")
+        if not url or not content.get("content"):
+            continue
+        article = cache.get(article_key(url)) or {"url": url, "title": content.get("title", ""),
+                                                  "indexed_at": time.time()}
+        article.update({field: content.get(field) for field in EXTRACT_FIELDS})
+        article["extracted_at"] = time.time()
+        tickers = mentioned(f"{article.get('title', '')} {content['content']}")
+        article["tickers"] = sorted(set(article.get("tickers", [])) | set(tickers) | ({ticker.upper()} if ticker else set()))
+        article["entities"] = sorted(set(article.get("entities", [])) | set(tickers.values()))
+        cache.set(article_key(url), article, ttl=_max_age())
+        for symbol in article["tickers"]:
+            by_ticker.setdefault(symbol, []).append(url)
+    for symbol, urls in by_ticker.items():
+        _update_ticker(cache, symbol, urls)
+
+
+def articles_for(ticker: str, exclude: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """The ticker's recent indexed articles as news results (newest first), minus URLs in `exclude`"""
+    cache = shared_cache.get_cache()
+    entry = _ticker_entry(cache, ticker)
+    skip, now = set(exclude), time.time()
+    articles = []
+    for url, indexed_at in sorted(entry["articles"].items(), key=lambda kv: kv[1], reverse=True):
+        if url in skip or now - indexed_at > _max_age():
+            continue
+        article = cache.get(article_key(url))
+        if article is not None:
+            articles.append({field: article.get(field) for field in NEWS_FIELDS})
+    _count("reused_articles", len(articles))
+    return articles
+
+
+def extracted_for(urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Full-text extracts already in the index, by URL, in the shape EXTRACT returns them"""
+    cache = shared_cache.get_cache()
+    found = {}
+    for url in urls:
+        article = cache.get(article_key(url))
+        if article and article.get("content"):
+            found[url] = {"url": url, "title": article.get("title", ""),
+                          **{field: article.get(field) for field in EXTRACT_FIELDS}, "source": "tavily_extract"}
+    _count("reused_extracts", len(found))
+    return found
+
+
+def index_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        counters = dict(_stats)
+    return {"enabled": settings.ARTICLE_INDEX_ENABLED, **counters}
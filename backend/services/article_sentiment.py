@@ -0,0 +1,100 @@
+# Per-article sentiment scores, persisted per ticker, article URL and content hash
+# The sentiment agent scores each article on its own (-1 bearish .. +1 bullish, plus a
+# confidence) and stores the score in the shared cache. A re-analysis only has to score articles
+# it has not seen, or whose text changed (e.g. a full-text extract replacing the search snippet),
+# and the ticker-level sentiment is a weighted aggregate of the article scores.
+
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+from backend.config import settings
+from backend.services import shared_cache
+
+BULLISH_THRESHOLD = 0.15  # aggregate score above which the ticker reads Bullish (below the negative, Bearish)
+CONTENT_CHARS = 600  # extracted article text included in the scoring prompt
+
+
+def article_text(item: Dict[str, Any], extracted: Optional[Dict[str, Any]] = None) -> str:
+    """The text an article is scored on: headline, snippet and, when extracted, an excerpt plus figures"""
+    text = f"{item.get('title', '')}: {item.get('snippet', '')}"
+    if extracted and extracted.get("content"):
+        text += f"\nExcerpt: {extracted['content'][:CONTENT_CHARS]}"
+        if extracted.get("financial_figures"):
+            # _quick_analysis gives figures as ready-made strings ("revenue: $5 billion", "Change: 12%")
+            text += "\nFinancial Data: " + ", ".join(str(fig) for fig in extracted["financial_figures"][:3])
+        if extracted.get("sentiment_indicators"):
+            text += "\nMarket Indicators: " + ", ".join(extracted["sentiment_indicators"][:3])
+    return text
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def score_key(ticker: str, url: str, text: str) -> str:
+    # The same article can be good news for one ticker and bad news for another
+    url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+    return f"article_sentiment:{ticker.upper()}:{url_hash}:{content_hash(text)}"
+
+
+def cached_scores(ticker: str, articles: List[Tuple[Dict[str, Any], str]]) -> Tuple[Dict[str, Dict[str, Any]], List[int]]:
+    """Stored scores by URL for (item, text) pairs, plus the indexes of the articles still unscored"""
+    cache = shared_cache.get_cache()
+    scores: Dict[str, Dict[str, Any]] = {}
+    missing: List[int] = []
+    for i, (item, text) in enumerate(articles):
+        stored = cache.get(score_key(ticker, item["url"], text))
+        if stored is not None:
+            scores[item["url"]] = stored
+        else:
+            missing.append(i)
+    return scores, missing
+
+
+def normalize_score(data: Any) -> Optional[Dict[str, float]]:
+    """A model answer as {"score", "confidence"} clamped to range, or None if it isn't one"""
+    if not isinstance(data, dict):
+        return None
+    try:
+        score = float(data["score"])
+        confidence = float(data.get("confidence", 0.5))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return {"score": max(-1.0, min(1.0, score)), "confidence": max(0.0, min(1.0, confidence))}
+
+
+def store_score(ticker: str, url: str, text: str, score: Dict[str, float]) -> None:
+    shared_cache.get_cache().set(score_key(ticker, url, text), score, settings.ARTICLE_SENTIMENT_TTL_DAYS * 86400)
+
+
+def weight(item: Dict[str, Any], score: Dict[str, float]) -> float:
+    # The model's confidence, scaled up to 3x for relevant articles from premium sources
+    # (overall_score comes from the news agent's ranking)
+    quality = 1.0 + min(max(item.get("overall_score", 0) or 0, 0), 100) / 50.0
+    return score["confidence"] * quality
+
+
+def aggregate(items: List[Dict[str, Any]], scores: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Ticker-level sentiment from the scored articles"""
+    total_weight = weighted = weighted_abs = weighted_confidence = 0.0
+    for item in items:
+        score = scores.get(item.get("url", ""))
+        if score is None:
+            continue
+        w = weight(item, score)
+        total_weight += w
+        weighted += w * score["score"]
+        weighted_abs += w * abs(score["score"])
+        weighted_confidence += w * score["confidence"]
+    if total_weight <= 0:
+        return {"sentiment": "Neutral", "confidence": 0.0, "score": 0.0}
+    value = weighted / total_weight
+    # Articles pulling in opposite directions lower the confidence
+    agreement = abs(weighted) / weighted_abs if weighted_abs else 1.0
+    confidence = weighted_confidence / total_weight * (0.5 + 0.5 * agreement)
+    if value > BULLISH_THRESHOLD:
+        label = "Bullish"
+    elif value < -BULLISH_THRESHOLD:
+        label = "Bearish"
+    else:
+        label = "Neutral"
+    return {"sentiment": label, "confidence": round(confidence, 2), "score": round(value, 3)}
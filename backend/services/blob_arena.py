@@ -0,0 +1,85 @@
+# Per-run arena for large payloads kept out of the graph state
+# Article bodies (CRAWL raw content, EXTRACT full text) are only read by a couple of agents, but
+# anything in GraphState is re-validated and merged at every one of the pipeline's steps. They
+# are stored here instead and the state carries short "blob:<n>" references. One arena is opened
+# per pipeline run and closed when the run's result has been built, which frees every body at once.
+
+import itertools
+import threading
+from typing import Any, Dict, Optional
+
+REF_PREFIX = "blob:"
+
+
+class BlobArena:
+    """Payloads of one pipeline run, addressed by reference strings"""
+
+    __slots__ = ("_blobs", "_ids", "_lock")
+
+    def __init__(self):
+        self._blobs: Dict[str, Any] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def put(self, value: Any) -> str:
+        with self._lock:
+            ref = f"{REF_PREFIX}{next(self._ids)}"
+            self._blobs[ref] = value
+        return ref
+
+    def get(self, ref: str, default: Any = None) -> Any:
+        return self._blobs.get(ref, default)
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def nbytes(self) -> int:
+        """Approximate payload size (characters of text blobs)"""
+        return sum(len(v) for v in list(self._blobs.values()) if isinstance(v, (str, bytes)))
+
+
+_arenas: Dict[str, BlobArena] = {}
+_arenas_lock = threading.Lock()
+_arena_ids = itertools.count(1)
+
+
+def open_arena() -> str:
+    with _arenas_lock:
+        arena_id = f"arena-{next(_arena_ids)}"
+        _arenas[arena_id] = BlobArena()
+    return arena_id
+
+
+def close_arena(arena_id: Optional[str]) -> None:
+    with _arenas_lock:
+        _arenas.pop(arena_id, None)
+
+
+def arena_of(state: Any) -> Optional[BlobArena]:
+    arena_id = getattr(state, "arena_id", None) if not isinstance(state, dict) else state.get("arena_id")
+    with _arenas_lock:
+        return _arenas.get(arena_id) if arena_id else None
+
+
+def store(state: Any, value: Any) -> Any:
+    """A reference to `value` in the run's arena; the value itself when the run has no arena
+    (agents called on their own, outside run_pipeline)"""
+    if not value:
+        return value
+    arena = arena_of(state)
+    return arena.put(value) if arena is not None else value
+
+
+def load(state: Any, ref: Any, default: Any = None) -> Any:
+    """The payload behind a reference from store(); values stored inline are returned as-is"""
+    if not isinstance(ref, str) or not ref.startswith(REF_PREFIX):
+        return default if ref is None else ref
+    arena = arena_of(state)
+    return arena.get(ref, default) if arena is not None else default
+
+
+def arena_stats() -> Dict[str, Any]:
+    with _arenas_lock:
+        arenas = list(_arenas.values())
+    return {"open_arenas": len(arenas), "blobs": sum(len(a) for a in arenas),
+            "payload_chars": sum(a.nbytes() for a in arenas)}
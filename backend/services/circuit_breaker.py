@@ -0,0 +1,143 @@
+# Circuit breakers for upstream providers (TwelveData, Tavily, and each OpenAI model)
+# Breakers are process-wide and shared across requests: after repeated failures a breaker
+# opens and agents go straight to their fallbacks instead of waiting on a dead upstream.
+# After a cool-down it lets a limited number of probe calls through (half-open) and closes
+# again on success.
+
+import threading
+import time
+from typing import Any, Dict, Optional
+import requests
+from openai import error as openai_error
+from backend.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# OpenAI errors that mean the provider/model is unhealthy (not a bad request on our side)
+_OPENAI_TRANSIENT = (
+    openai_error.Timeout,
+    openai_error.APIError,
+    openai_error.APIConnectionError,
+    openai_error.RateLimitError,
+    openai_error.ServiceUnavailableError,
+    openai_error.TryAgain,
+)
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker guarding one upstream dependency"""
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None,
+                 recovery_timeout: Optional[float] = None, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.BREAKER_FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or settings.BREAKER_RECOVERY_SECONDS
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+        # Counters for monitoring
+        self._successes_total = 0
+        self._failures_total = 0
+        self._rejected_total = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.time() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        # A probe that never reported back must not wedge the breaker half-open forever
+        if self._state == HALF_OPEN and self._probes and time.time() - self._probe_started >= self.recovery_timeout:
+            self._probes = 0
+
+    def ready(self) -> bool:
+        """True if allow() would admit a call right now. Takes no probe, so callers can check before
+        queueing for rate-limit tokens and call allow() only once the request is about to be sent."""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state == CLOSED or (self._state == HALF_OPEN and self._probes < self.half_open_max_calls)
+
+    def allow(self) -> bool:
+        """True if a call may go through now; half-open admits a limited number of probes"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                self._probe_started = time.time()
+                return True
+            self._rejected_total += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._successes_total += 1
+            self._failures = 0
+            self._probes = 0
+            self._state = CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures_total += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.time()
+                self._probes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = round(max(0.0, self.recovery_timeout - (time.time() - self._opened_at)), 1)
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_in_seconds": retry_in,
+                "successes_total": self._successes_total,
+                "failures_total": self._failures_total,
+                "rejected_total": self._rejected_total,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Shared breaker for a provider, e.g. "tavily" or "openai:gpt-4" """
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every breaker, for the monitoring endpoint"""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def is_provider_failure(exc: BaseException) -> bool:
+    """Whether an exception says the upstream is unhealthy (and should count against its breaker)"""
+    if isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(exc, requests.exceptions.HTTPError):
+        status = getattr(exc.response, "status_code", None)
+        return status is None or status >= 500 or status == 429
+    return isinstance(exc, _OPENAI_TRANSIENT)
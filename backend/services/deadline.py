@@ -0,0 +1,49 @@
+# Request-level deadline shared by every step of an analysis run
+# The route stamps an absolute `deadline_at` (epoch seconds) into the graph state,
+# and each agent sizes its upstream timeouts and retries to whatever budget is left.
+
+import time
+from typing import Any, Optional
+from backend.config import settings
+
+# Never hand an upstream client a timeout shorter than this; below it the call is skipped instead
+MIN_CALL_SECONDS = 1.0
+
+
+def new_deadline(budget: Optional[float] = None) -> float:
+    """Absolute deadline for a run starting now (defaults to ANALYSIS_TIMEOUT)"""
+    return time.time() + (budget if budget is not None else settings.ANALYSIS_TIMEOUT)
+
+
+def remaining(state: Any) -> Optional[float]:
+    """Seconds left in the budget, or None if the run has no deadline"""
+    deadline_at = getattr(state, "deadline_at", None)
+    if deadline_at is None:
+        return None
+    return max(0.0, deadline_at - time.time())
+
+
+def has_time(state: Any, needed: float) -> bool:
+    """True if at least `needed` seconds remain (always True without a deadline)"""
+    left = remaining(state)
+    return left is None or left >= needed
+
+
+def timeout_for(state: Any, default: float, reserve: float = 0.0) -> float:
+    """Per-call timeout capped to the remaining budget, keeping `reserve` seconds for later steps"""
+    left = remaining(state)
+    if left is None:
+        return default
+    return max(0.0, min(default, left - reserve))
+
+
+def sleep_within(state: Any, seconds: float, reserve: float = MIN_CALL_SECONDS) -> bool:
+    """Back off for up to `seconds`; returns False (without sleeping) if no budget is left for a retry"""
+    left = remaining(state)
+    if left is not None:
+        if left - reserve <= 0:
+            return False
+        seconds = min(seconds, left - reserve)
+    if seconds > 0:
+        time.sleep(seconds)
+    return True
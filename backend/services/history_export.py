@@ -0,0 +1,175 @@
+# Bulk export of stored analyses
+# Streams analysis records straight from a MongoDB cursor to the client, one flat row per
+# analysis, as CSV (a chunk every few hundred rows) or Parquet (one row group at a time, with
+# pyarrow). Only the columns below are fetched from Mongo, so article bodies never leave the
+# database, and memory stays constant however many rows match.
+
+import csv
+import io
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # in requirements.txt; guarded so a slim install still serves CSV
+    pa = None
+    pq = None
+
+HISTORY_COLUMNS = [
+    "query_id", "ticker", "timestamp", "price", "sentiment", "confidence", "recommendation",
+    "trend_direction", "trend_strength", "trend_risk", "insight", "summary", "news_count",
+    "content_quality_score",
+]
+
+# Fields read from each Mongo document to build the columns above
+_PROJECTION = {
+    "_id": 0, "query_id": 1, "ticker": 1, "timestamp": 1, "price": 1, "sentiment": 1, "confidence": 1,
+    "recommendation": 1, "trend": 1, "insight": 1, "summary": 1, "news.url": 1, "content_quality_score": 1,
+}
+
+CSV_CHUNK_ROWS = 500
+PARQUET_ROW_GROUP = 10000
+CURSOR_BATCH_SIZE = 1000
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def history_filter(tickers: Optional[List[str]], start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Any]:
+    """Mongo filter for a ticker set and a [start, end) date range"""
+    query: Dict[str, Any] = {}
+    if tickers:
+        variants = {v for t in tickers for v in (t, t.upper(), t.lower())}
+        query["ticker"] = {"$in": sorted(variants)}
+    if start or end:
+        # The logger agent stores datetimes, /query stores ISO strings; Mongo compares within a type
+        by_datetime: Dict[str, Any] = {}
+        by_string: Dict[str, Any] = {}
+        if start:
+            by_datetime["$gte"], by_string["$gte"] = start, start.isoformat()
+        if end:
+            by_datetime["$lt"], by_string["$lt"] = end, end.isoformat()
+        query["$or"] = [{"timestamp": by_datetime}, {"timestamp": by_string}]
+    return query
+
+
+def open_cursor(collection: Any, query: Dict[str, Any]) -> Any:
+    # _id is indexed and grows with insertion time, so this needs no in-memory sort
+    return collection.find(query, _PROJECTION).sort("_id", 1).batch_size(CURSOR_BATCH_SIZE)
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return value.get("content") or value.get("summary") or str(value)
+    return str(value)
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def flatten(doc: Dict[str, Any]) -> Dict[str, Any]:
+    trend = doc.get("trend") if isinstance(doc.get("trend"), dict) else {}
+    timestamp = doc.get("timestamp")
+    return {
+        "query_id": doc.get("query_id"),
+        "ticker": (doc.get("ticker") or "").upper(),
+        "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
+        "price": _number(doc.get("price")),
+        "sentiment": _text(doc.get("sentiment")),
+        "confidence": _number(doc.get("confidence")),
+        "recommendation": _text(doc.get("recommendation")),
+        "trend_direction": _text(trend.get("direction")),
+        "trend_strength": _text(trend.get("strength")),
+        "trend_risk": _text(trend.get("risk")),
+        "insight": _text(doc.get("insight")),
+        "summary": _text(doc.get("summary")),
+        "news_count": len(doc.get("news") or []),
+        "content_quality_score": _number(doc.get("content_quality_score")),
+    }
+
+
+def iter_csv(docs: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """CSV bytes in chunks of CSV_CHUNK_ROWS rows"""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=HISTORY_COLUMNS)
+    writer.writeheader()
+    rows = 0
+    for doc in docs:
+        writer.writerow(flatten(doc))
+        rows += 1
+        if rows % CSV_CHUNK_ROWS == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file that hands back (and forgets) what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_schema():
+    floats = {"price", "confidence", "content_quality_score"}
+    return pa.schema([
+        (name, pa.float64() if name in floats else pa.int64() if name == "news_count" else pa.string())
+        for name in HISTORY_COLUMNS
+    ])
+
+
+def iter_parquet(docs: Iterable[Dict[str, Any]], row_group_size: int = PARQUET_ROW_GROUP) -> Iterator[bytes]:
+    """Parquet bytes, written and flushed one row group at a time"""
+    schema = _parquet_schema()
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    columns: Dict[str, List[Any]] = {name: [] for name in HISTORY_COLUMNS}
+
+    def write_group() -> bytes:
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+        return sink.drain()
+
+    try:
+        rows = 0
+        for doc in docs:
+            for name, value in flatten(doc).items():
+                columns[name].append(value)
+            rows += 1
+            if rows % row_group_size == 0:
+                yield write_group()
+        if rows % row_group_size or rows == 0:
+            chunk = write_group()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    # Footer
+    yield sink.drain()
@@ -0,0 +1,156 @@
+# Incremental technical indicators
+# Rolling indicator state for one symbol, updated one bar at a time in O(1): EMAs, Wilder's RSI,
+# rolling volatility of returns and a rolling VWAP. Nothing here rescans the history, so
+# keeping thousands of symbols current costs a few float operations per new bar.
+
+import math
+from collections import deque
+from typing import Any, Dict, Optional, Set
+
+EMA_FAST = 12
+EMA_SLOW = 26
+RSI_PERIOD = 14
+
+
+class IndicatorState:
+    """Running EMA / RSI / volatility / VWAP for one symbol's bars"""
+
+    __slots__ = (
+        "window", "bars", "last_ts", "close", "ema_fast", "ema_slow", "_avg_gain", "_avg_loss",
+        "_returns", "_ret_sum", "_ret_sumsq", "_pv", "_pv_sum", "_vol_sum",
+    )
+
+    def __init__(self, window: int = 20):
+        self.window = max(2, window)
+        self.bars = 0
+        self.last_ts: Optional[int] = None
+        self.close: Optional[float] = None
+        self.ema_fast: Optional[float] = None
+        self.ema_slow: Optional[float] = None
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._returns: deque = deque()
+        self._ret_sum = 0.0
+        self._ret_sumsq = 0.0
+        self._pv: deque = deque()
+        self._pv_sum = 0.0
+        self._vol_sum = 0.0
+
+    @staticmethod
+    def _ema(previous: Optional[float], value: float, period: int) -> float:
+        if previous is None:
+            return value
+        alpha = 2.0 / (period + 1)
+        return previous + alpha * (value - previous)
+
+    def update(self, ts: int, close: float, high: Optional[float] = None, low: Optional[float] = None,
+               volume: float = 0.0) -> None:
+        """Fold in one closed bar; bars at or before the last one seen are ignored"""
+        if self.last_ts is not None and ts <= self.last_ts:
+            return
+        previous = self.close
+        self.last_ts = ts
+        self.close = close
+        self.bars += 1
+        self.ema_fast = self._ema(self.ema_fast, close, EMA_FAST)
+        self.ema_slow = self._ema(self.ema_slow, close, EMA_SLOW)
+
+        if previous is not None:
+            change = close - previous
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            changes = self.bars - 1
+            if changes <= RSI_PERIOD:
+                # Simple average over the first period, then Wilder's smoothing
+                self._avg_gain += (gain - self._avg_gain) / changes
+                self._avg_loss += (loss - self._avg_loss) / changes
+            else:
+                self._avg_gain += (gain - self._avg_gain) / RSI_PERIOD
+                self._avg_loss += (loss - self._avg_loss) / RSI_PERIOD
+
+            ret = change / previous if previous else 0.0
+            self._returns.append(ret)
+            self._ret_sum += ret
+            self._ret_sumsq += ret * ret
+            if len(self._returns) > self.window:
+                old = self._returns.popleft()
+                self._ret_sum -= old
+                self._ret_sumsq -= old * old
+
+        typical = (close + (high if high is not None else close) + (low if low is not None else close)) / 3.0
+        volume = volume if volume and volume > 0 else 0.0
+        self._pv.append((typical * volume, volume))
+        self._pv_sum += typical * volume
+        self._vol_sum += volume
+        if len(self._pv) > self.window:
+            old_pv, old_volume = self._pv.popleft()
+            self._pv_sum -= old_pv
+            self._vol_sum -= old_volume
+
+    @property
+    def rsi(self) -> Optional[float]:
+        if self.bars <= RSI_PERIOD:
+            return None
+        if self._avg_loss <= 0:
+            return 100.0 if self._avg_gain > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + self._avg_gain / self._avg_loss)
+
+    @property
+    def volatility_pct(self) -> Optional[float]:
+        """Sample standard deviation of the last `window` bar returns, in percent"""
+        n = len(self._returns)
+        if n < self.window:
+            return None
+        variance = (self._ret_sumsq - self._ret_sum * self._ret_sum / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0)) * 100
+
+    @property
+    def vwap(self) -> Optional[float]:
+        """Volume-weighted typical price over the last `window` bars (None without volume)"""
+        if self._vol_sum <= 0:
+            return None
+        return self._pv_sum / self._vol_sum
+
+    def ready(self) -> bool:
+        # Long enough for the slow EMA and the volatility window to mean something
+        return self.bars >= max(EMA_SLOW, RSI_PERIOD + 1, self.window + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        def rounded(value: Optional[float], digits: int = 4) -> Optional[float]:
+            return round(value, digits) if value is not None else None
+
+        return {
+            "bars": self.bars,
+            "last_ts": self.last_ts,
+            "close": self.close,
+            "ema_fast": rounded(self.ema_fast),
+            "ema_slow": rounded(self.ema_slow),
+            "rsi": rounded(self.rsi, 2),
+            "volatility_pct": rounded(self.volatility_pct, 3),
+            "vwap": rounded(self.vwap),
+            "ready": self.ready(),
+        }
+
+
+def conditions(state: IndicatorState, rsi_high: float, rsi_low: float, volatility_pct: float,
+               vwap_deviation_pct: float) -> Set[str]:
+    """Threshold conditions currently true for a symbol; signals fire when one becomes true"""
+    if not state.ready():
+        return set()
+    active = set()
+    rsi = state.rsi
+    if rsi is not None and rsi >= rsi_high:
+        active.add("rsi_overbought")
+    if rsi is not None and rsi <= rsi_low:
+        active.add("rsi_oversold")
+    # Exactly one of these holds at a time, so a crossover shows up as the other one turning on
+    if state.ema_fast > state.ema_slow:
+        active.add("ema_bullish")
+    elif state.ema_fast < state.ema_slow:
+        active.add("ema_bearish")
+    volatility = state.volatility_pct
+    if volatility is not None and volatility >= volatility_pct:
+        active.add("volatility_spike")
+    vwap = state.vwap
+    if vwap and abs(state.close / vwap - 1.0) * 100 >= vwap_deviation_pct:
+        active.add("vwap_breakout" if state.close > vwap else "vwap_breakdown")
+    return active
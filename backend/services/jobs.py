@@ -0,0 +1,267 @@
+# Asynchronous analysis jobs persisted in MongoDB
+# POST /jobs stores a queued job and returns its ID at once; clients then long-poll GET /jobs/{id}
+# instead of holding one connection open for the whole pipeline (load balancer idle timeouts cut
+# those off and the work was lost). Every worker runs a small pool of job runners that claim
+# queued jobs atomically from Mongo, so a job is run once no matter which worker accepted it,
+# and the result is stored whether or not the client is still around. Runners heartbeat while a
+# job runs; a job whose runner died (stale heartbeat) is claimed again, up to JOBS_MAX_ATTEMPTS.
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from uuid import uuid4
+import anyio
+from backend.config import settings
+from backend.services import admission
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE = (QUEUED, RUNNING)
+HEARTBEAT_SECONDS = 10
+POLL_INTERVAL = 1.0  # long-poll re-check for jobs finishing in another worker
+
+
+def _public(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Job document as returned by the API"""
+    job = {
+        "job_id": doc["_id"],
+        "status": doc["status"],
+        "ticker": doc["ticker"],
+        "depth": doc.get("depth", "deep"),
+        "attempts": doc.get("attempts", 0),
+    }
+    for field in ("created_at", "started_at", "finished_at"):
+        job[field] = doc[field].isoformat() if doc.get(field) else None
+    if doc["status"] == DONE:
+        job["result"] = doc.get("result")
+    if doc.get("error"):
+        job["error"] = doc["error"]
+    return job
+
+
+class JobQueue:
+    """Mongo-backed job queue with a pool of runners per worker"""
+
+    def __init__(self, collection: Callable[[], Any], run: Callable[[str, str], Awaitable[Dict[str, Any]]]):
+        # `collection` is a getter so the queue always sees the app's current Mongo handle
+        self._collection = collection
+        self._run = run
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished_signal = asyncio.Event()  # set (and replaced) whenever this worker finishes a job
+        self._running: Set[str] = set()
+        self._indexed = False
+        self._stopping = False
+        self._completed_total = 0
+        self._failed_total = 0
+
+    # --- Storage (blocking pymongo calls, run in threads) ---
+
+    def _create(self, ticker: str, depth: str) -> Dict[str, Any]:
+        from pymongo.errors import DuplicateKeyError
+        if not self._indexed:
+            self.ensure_indexes()
+        collection = self._collection()
+        now = datetime.utcnow()
+        doc = {
+            "_id": uuid4().hex,
+            "ticker": ticker,
+            "depth": depth,
+            "status": QUEUED,
+            "active": True,  # cleared when the job finishes; unique per (ticker, depth) while set
+            "attempts": 0,
+            "created_at": now,
+            "expires_at": now + timedelta(days=settings.JOBS_RETENTION_DAYS),
+        }
+        for _ in range(3):
+            try:
+                collection.insert_one(doc)
+                return doc
+            except DuplicateKeyError:
+                # A job already queued or running for the same analysis is shared instead of duplicated
+                existing = collection.find_one({"ticker": ticker, "depth": depth, "active": True})
+                if existing is not None:
+                    return existing
+                # It finished between the insert and the lookup; try again
+        raise RuntimeError(f"could not queue a job for {ticker} ({depth})")
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest queued job, or one whose runner stopped heartbeating"""
+        from pymongo import ReturnDocument
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=settings.JOBS_STALE_SECONDS)
+        return self._collection().find_one_and_update(
+            {"$or": [{"status": QUEUED}, {"status": RUNNING, "heartbeat_at": {"$lt": stale}}],
+             "attempts": {"$lt": settings.JOBS_MAX_ATTEMPTS}},
+            {"$set": {"status": RUNNING, "worker": self._worker_id, "started_at": now, "heartbeat_at": now},
+             "$inc": {"attempts": 1}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _heartbeat(self, job_id: str) -> None:
+        self._collection().update_one({"_id": job_id, "worker": self._worker_id},
+                                      {"$set": {"heartbeat_at": datetime.utcnow()}})
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None) -> None:
+        update: Dict[str, Any] = {"status": status, "finished_at": datetime.utcnow()}
+        if result is not None:
+            # Plain JSON types only (timestamps and NumPy scalars become strings or floats)
+            update["result"] = json.loads(json.dumps(result, default=str))
+        if error is not None:
+            update["error"] = error
+        self._collection().update_one({"_id": job_id, "worker": self._worker_id},
+                                      {"$set": update, "$unset": {"active": ""}})
+
+    def _requeue(self, job_ids: List[str]) -> None:
+        # Jobs interrupted by a shutdown go back to the queue without spending an attempt
+        self._collection().update_many({"_id": {"$in": job_ids}, "worker": self._worker_id, "status": RUNNING},
+                                       {"$set": {"status": QUEUED}, "$inc": {"attempts": -1}})
+
+    def _fail_exhausted(self) -> None:
+        # Jobs whose runners kept dying are given up on, so clients stop polling them
+        stale = datetime.utcnow() - timedelta(seconds=settings.JOBS_STALE_SECONDS)
+        self._collection().update_many(
+            {"status": RUNNING, "heartbeat_at": {"$lt": stale}, "attempts": {"$gte": settings.JOBS_MAX_ATTEMPTS}},
+            {"$set": {"status": FAILED, "error": "job was interrupted too many times", "finished_at": datetime.utcnow()},
+             "$unset": {"active": ""}},
+        )
+
+    def ensure_indexes(self) -> None:
+        collection = self._collection()
+        collection.create_index([("status", 1), ("created_at", 1)])
+        # At most one active job per analysis, enforced by Mongo so concurrent submits can't both insert
+        collection.create_index([("ticker", 1), ("depth", 1)], unique=True,
+                                partialFilterExpression={"active": True}, name="one_active_job")
+        collection.create_index("expires_at", expireAfterSeconds=0)
+        self._indexed = True
+
+    # --- API ---
+
+    async def submit(self, ticker: str, depth: str = "deep") -> Dict[str, Any]:
+        doc = await anyio.to_thread.run_sync(self._create, ticker, depth)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return _public(doc)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        doc = await anyio.to_thread.run_sync(self._collection().find_one, {"_id": job_id})
+        return _public(doc) if doc else None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The job once it has finished, or as it stands after `timeout` seconds (long-poll)"""
+        loop = asyncio.get_running_loop()
+        wait_until = loop.time() + max(0.0, min(timeout, settings.JOBS_MAX_WAIT))
+        while True:
+            job = await self.get(job_id)
+            remaining = wait_until - loop.time()
+            if job is None or job["status"] not in ACTIVE or remaining <= 0:
+                return job
+            # Jobs finished by this worker wake the poll at once; others are re-read every POLL_INTERVAL
+            try:
+                await asyncio.wait_for(self._finished_signal.wait(), min(remaining, POLL_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+
+    # --- Runners ---
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._runner(i), name=f"job-runner-{i}")
+                           for i in range(settings.JOBS_WORKERS)]
+            logger.info(f"[Jobs] {settings.JOBS_WORKERS} runners started")
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        # Also checked by the runners: wait_for can swallow a cancel that races with a wakeup
+        self._stopping = True
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._running:
+            try:
+                await anyio.to_thread.run_sync(self._requeue, list(self._running))
+            except Exception as e:
+                logger.error(f"[Jobs] Could not requeue interrupted jobs: {e}")
+
+    async def _runner(self, index: int) -> None:
+        if index == 0:
+            try:
+                await anyio.to_thread.run_sync(self.ensure_indexes)
+            except Exception as e:
+                logger.warning(f"[Jobs] Could not create indexes: {e}")
+        while not self._stopping:
+            try:
+                if index == 0:
+                    await anyio.to_thread.run_sync(self._fail_exhausted)
+                doc = await anyio.to_thread.run_sync(self._claim)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Jobs] Could not claim a job: {e}")
+                doc = None
+            if doc is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.JOBS_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(doc)
+
+    async def _execute(self, doc: Dict[str, Any]) -> None:
+        job_id = doc["_id"]
+        self._running.add(job_id)
+        heartbeat = asyncio.create_task(self._heartbeats(job_id))
+        logger.info(f"[Jobs] Running {job_id} ({doc['ticker']}, {doc.get('depth', 'deep')}, attempt {doc['attempts']})")
+        try:
+            while True:
+                try:
+                    result = await self._run(doc["ticker"], doc.get("depth", "deep"))
+                    break
+                except admission.Overloaded as e:
+                    # Jobs wait their turn instead of being shed; the client is long-polling anyway
+                    await asyncio.sleep(e.retry_after)
+            await anyio.to_thread.run_sync(self._finish, job_id, DONE, result)
+            self._completed_total += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Jobs] {job_id} failed: {e}")
+            self._failed_total += 1
+            try:
+                await anyio.to_thread.run_sync(self._finish, job_id, FAILED, None, str(e))
+            except Exception as store_error:
+                logger.error(f"[Jobs] Could not store the failure of {job_id}: {store_error}")
+        finally:
+            heartbeat.cancel()
+        # Cancelled jobs stay in _running so stop() can requeue them
+        self._running.discard(job_id)
+        signal, self._finished_signal = self._finished_signal, asyncio.Event()
+        signal.set()
+
+    async def _heartbeats(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                await anyio.to_thread.run_sync(self._heartbeat, job_id)
+            except Exception as e:
+                logger.warning(f"[Jobs] Heartbeat failed for {job_id}: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "worker": self._worker_id,
+            "runners": len(self._tasks),
+            "running": sorted(self._running),
+            "completed_total": self._completed_total,
+            "failed_total": self._failed_total,
+        }
@@ -0,0 +1,375 @@
+# Single gateway for every OpenAI chat call
+# Agents describe what they want (messages, token budget, how to parse the answer) and the
+# gateway owns the rest: API configuration, the retry / fallback-model policy, breakers, rate
+# limiting, a concurrency cap per model, hedging (via the model router) and JSON parsing.
+# Two extra lanes serve offline work:
+#   - bulk: a small queued worker pool running at "batch" priority, so batch jobs can hand over
+#     many requests without taking the slots interactive requests need
+#   - micro-batching: small classification prompts (e.g. sentiment for many tickers during a
+#     batch or pre-warm run) that arrive close together are answered by one request
+
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import openai
+from openai import OpenAIError
+from backend.config import settings
+from backend.services import circuit_breaker, deadline, model_router, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+openai.api_key = settings.OPENAI_API_KEY
+openai.api_base = settings.OPENAI_API_BASE
+PRIMARY_MODEL = getattr(settings, "OPENAI_MODEL", "gpt-4")
+FALLBACK_MODEL = "gpt-3.5-turbo"
+BULK_TIMEOUT = 60.0  # per call in the bulk lane, which has no request deadline
+
+
+class LLMUnavailable(Exception):
+    """No usable answer: time budget, open circuits, rate limits or every attempt failed"""
+
+
+class GatewayBusy(OpenAIError):
+    """Every concurrency slot for a model stayed taken for the whole wait"""
+
+
+# --- Structured output ---
+
+def parse_json(text: str, required: Sequence[str] = ()) -> Dict[str, Any]:
+    """The JSON object in a model answer (prose or code fences around it are ignored)"""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        raise ValueError("No JSON found in model response")
+    data = json.loads(match.group())
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+    missing = [field for field in required if field not in data]
+    if missing:
+        raise ValueError(f"Missing required fields in response: {missing}")
+    return data
+
+
+def json_parser(required: Sequence[str] = ()) -> Callable[[str], Dict[str, Any]]:
+    return lambda text: parse_json(text, required)
+
+
+# --- Per-model concurrency ---
+
+_slots: Dict[str, threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_in_flight: Dict[str, int] = {}
+_counters = {"calls": 0, "failures": 0, "slot_timeouts": 0, "slot_wait_seconds": 0.0,
+             "bulk_submitted": 0, "bulk_completed": 0, "batches": 0, "batched_items": 0, "batch_failures": 0}
+
+
+def _count(name: str, amount: float = 1) -> None:
+    with _stats_lock:
+        _counters[name] += amount
+
+
+def slot(model: str) -> threading.BoundedSemaphore:
+    with _slots_lock:
+        semaphore = _slots.get(model)
+        if semaphore is None:
+            semaphore = _slots[model] = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY_PER_MODEL)
+        return semaphore
+
+
+def _track(model: str, delta: int) -> None:
+    with _stats_lock:
+        _in_flight[model] = _in_flight.get(model, 0) + delta
+
+
+def chat(model: str, messages: List[Dict[str, str]], timeout: float, priority: str = "default",
+         hedge_to: Optional[str] = None, **params: Any) -> str:
+    """One chat completion (possibly hedged) under the model's concurrency cap; the answer text"""
+    started = time.monotonic()
+    semaphore = slot(model)
+    if not semaphore.acquire(timeout=timeout):
+        _count("slot_timeouts")
+        raise GatewayBusy(f"No free {model} slot within {timeout:.1f}s")
+    waited = time.monotonic() - started
+    _count("slot_wait_seconds", waited)
+    _track(model, 1)
+    try:
+        response = model_router.get_router().complete(
+            model, messages, max(deadline.MIN_CALL_SECONDS, timeout - waited), hedge_to=hedge_to,
+            priority=priority, slots=slot, **params
+        )
+    except Exception:
+        _count("failures")
+        raise
+    finally:
+        _track(model, -1)
+        semaphore.release()
+    _count("calls")
+    return response.choices[0].message.content.strip()
+
+
+# --- Retry / fallback policy for pipeline steps ---
+
+def run(state: Any, messages: List[Dict[str, str]], max_tokens: int, temperature: float, request_timeout: float,
+        reserve: float = 0.0, parse: Optional[Callable[[str], Any]] = None, attempts: int = 2,
+        backoff: float = 0.0) -> Any:
+    """Ask the primary model (hedged with the fallback), switching to the fallback model after a
+    failure or while the primary's circuit is open. Returns parse(answer), or the answer text.
+    Raises LLMUnavailable when the run's budget, the breakers or the rate limiter rule out
+    another attempt, or when every attempt failed."""
+    model = PRIMARY_MODEL
+    for attempt in range(1, attempts + 1):
+        timeout = deadline.timeout_for(state, request_timeout, reserve)
+        if timeout < deadline.MIN_CALL_SECONDS:
+            raise LLMUnavailable("time budget exhausted")
+        breaker = circuit_breaker.get_breaker(f"openai:{model}")
+        if not breaker.ready():
+            # Fail fast while the model is down instead of waiting out its timeout
+            if model != FALLBACK_MODEL:
+                logger.warning(f"[LLM] Circuit open for {model}, falling back to {FALLBACK_MODEL}")
+                model = FALLBACK_MODEL
+                continue
+            raise LLMUnavailable(f"circuit open for {model}")
+        tokens = rate_limiter.estimate_tokens(messages, max_tokens)
+        if not rate_limiter.acquire_for(state, "openai", tokens, reserve):
+            raise LLMUnavailable("rate limit wait exceeded the time budget")
+        if not rate_limiter.allow_or_refund(breaker, "openai", tokens):
+            if model != FALLBACK_MODEL:
+                model = FALLBACK_MODEL
+                continue
+            raise LLMUnavailable(f"circuit open for {model}")
+        # Queueing may have used part of the budget
+        timeout = deadline.timeout_for(state, request_timeout, reserve)
+        try:
+            text = chat(model, messages, timeout, rate_limiter.priority_of(state), hedge_to=FALLBACK_MODEL,
+                        temperature=temperature, max_tokens=max_tokens)
+            logger.info(f"[LLM] {model} answered ({len(text)} chars)")
+            return parse(text) if parse else text
+        except (OpenAIError, json.JSONDecodeError, ValueError) as e:
+            logger.error(f"[LLM] Attempt {attempt} failed with model {model}: {e}")
+            if attempt == attempts:
+                raise LLMUnavailable(f"all {attempts} attempts failed") from e
+            if backoff and not deadline.sleep_within(state, backoff, reserve + deadline.MIN_CALL_SECONDS):
+                raise LLMUnavailable("no time budget left to retry") from e
+            backoff *= 2
+            if model != FALLBACK_MODEL:
+                logger.info(f"[LLM] Falling back to {FALLBACK_MODEL}")
+                model = FALLBACK_MODEL
+    raise LLMUnavailable("no attempt could be made")
+
+
+# --- Bulk lane ---
+
+_bulk: Optional[ThreadPoolExecutor] = None
+_bulk_lock = threading.Lock()
+_closed = False  # set by shutdown(); late batch timers must not start a new pool
+
+
+def _bulk_pool() -> ThreadPoolExecutor:
+    global _bulk
+    with _bulk_lock:
+        if _closed:
+            raise LLMUnavailable("the LLM gateway is shut down")
+        if _bulk is None:
+            _bulk = ThreadPoolExecutor(settings.LLM_BULK_CONCURRENCY, thread_name_prefix="llm-bulk")
+        return _bulk
+
+
+def _available_model() -> str:
+    """Primary model unless its circuit is open"""
+    return PRIMARY_MODEL if circuit_breaker.get_breaker(f"openai:{PRIMARY_MODEL}").ready() else FALLBACK_MODEL
+
+
+def _bulk_call(messages: List[Dict[str, str]], model: str, request_timeout: float, params: Dict[str, Any],
+               deadline_at: Optional[float] = None) -> str:
+    """One bulk-lane request. With `deadline_at` (time.monotonic()) the rate-limit wait and the
+    request itself end by then, so nobody is billed for an answer its caller no longer waits for."""
+    tokens = rate_limiter.estimate_tokens(messages, params.get("max_tokens", 256))
+    max_wait = settings.LLM_BULK_MAX_WAIT
+    if deadline_at is not None:
+        max_wait = min(max_wait, deadline_at - time.monotonic() - deadline.MIN_CALL_SECONDS)
+        if max_wait < 0:
+            raise LLMUnavailable("no time left before the caller's deadline")
+    # Bulk work waits its turn behind interactive and default traffic instead of giving up quickly
+    if not rate_limiter.acquire("openai", tokens, "batch", timeout=max_wait):
+        raise LLMUnavailable("rate limit wait exceeded the bulk lane's limit")
+    if not rate_limiter.allow_or_refund(circuit_breaker.get_breaker(f"openai:{model}"), "openai", tokens):
+        raise LLMUnavailable(f"circuit open for {model}")
+    if deadline_at is not None:
+        request_timeout = min(request_timeout, deadline_at - time.monotonic())
+        if request_timeout < deadline.MIN_CALL_SECONDS:
+            raise LLMUnavailable("no time left before the caller's deadline")
+    return chat(model, messages, request_timeout, "batch", **params)
+
+
+def submit_bulk(messages: List[Dict[str, str]], model: Optional[str] = None, request_timeout: float = BULK_TIMEOUT,
+                **params: Any) -> "Future[str]":
+    """Queue a chat call for offline work; the future resolves to the answer text.
+    Without a model, the primary is used (or the fallback while its circuit is open)."""
+    def job() -> str:
+        try:
+            return _bulk_call(messages, model or _available_model(), request_timeout, params)
+        finally:
+            _count("bulk_completed")
+
+    _count("bulk_submitted")
+    return _bulk_pool().submit(job)
+
+
+# --- Micro-batching ---
+
+class _Pending:
+    __slots__ = ("items", "timer")
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.timer: Optional[threading.Timer] = None
+
+
+class MicroBatcher:
+    """Collects small prompts that share an instruction and answers them with one request"""
+
+    def __init__(self):
+        self._pending: Dict[Any, _Pending] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def submit(self, instruction: str, prompt: str, max_tokens: int, temperature: float = 0.0,
+               deadline_at: Optional[float] = None) -> "Future[Dict[str, Any]]":
+        """Queue a prompt; `deadline_at` (time.monotonic()) is when its caller stops waiting"""
+        future: "Future[Dict[str, Any]]" = Future()
+        key = (instruction, max_tokens, temperature)
+        flush = None
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _Pending()
+                pending.timer = threading.Timer(settings.LLM_BATCH_WINDOW_MS / 1000.0, self._flush_key, (key,))
+                pending.timer.daemon = True
+                pending.timer.start()
+            pending.items.append((f"item{next(self._ids)}", prompt, future, deadline_at))
+            if len(pending.items) >= settings.LLM_BATCH_MAX_ITEMS:
+                pending.timer.cancel()
+                flush = self._pending.pop(key)
+        if flush is not None:
+            self._dispatch(key, flush.items)
+        return future
+
+    def _flush_key(self, key: Any) -> None:
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is not None:
+            self._dispatch(key, pending.items)
+
+    def _dispatch(self, key: Any, items: List[Any]) -> None:
+        try:
+            _bulk_pool().submit(self._answer, key, items)
+        except (LLMUnavailable, RuntimeError) as e:
+            # Shut down while the batch window was open
+            for _, _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _answer(self, key: Any, items: List[Any]) -> None:
+        instruction, max_tokens, temperature = key
+        # Callers that already gave up are not sent; the rest must be answered before the earliest deadline
+        now = time.monotonic()
+        expired = [item for item in items if item[3] is not None and item[3] <= now]
+        for _, _, future, _ in expired:
+            future.set_exception(LLMUnavailable("the caller stopped waiting before the batch was sent"))
+        items = [item for item in items if item not in expired]
+        if not items:
+            return
+        deadlines = [item[3] for item in items if item[3] is not None]
+        deadline_at = min(deadlines) if deadlines else None
+        try:
+            if len(items) == 1:
+                _, prompt, future, _ = items[0]
+                messages = [{"role": "system", "content": instruction}, {"role": "user", "content": prompt}]
+                future.set_result(parse_json(_bulk_call(messages, _available_model(), BULK_TIMEOUT,
+                                                        {"max_tokens": max_tokens, "temperature": temperature},
+                                                        deadline_at)))
+                return
+            _count("batches")
+            _count("batched_items", len(items))
+            body = "\n\n".join(f"### {item_id}\n{prompt}" for item_id, prompt, _, _ in items)
+            messages = [
+                {"role": "system", "content": (
+                    f"{instruction}\nYou will receive {len(items)} independent items, each introduced by "
+                    "'### <id>'. Answer each one on its own, exactly as it asks, and respond ONLY with one JSON "
+                    "object mapping every id to its JSON answer."
+                )},
+                {"role": "user", "content": body},
+            ]
+            answers = parse_json(_bulk_call(messages, _available_model(), BULK_TIMEOUT,
+                                            {"max_tokens": max_tokens * len(items) + 20, "temperature": temperature},
+                                            deadline_at))
+            for item_id, _, future, _ in items:
+                answer = answers.get(item_id)
+                if isinstance(answer, dict):
+                    future.set_result(answer)
+                else:
+                    future.set_exception(ValueError(f"No answer for {item_id} in the batched response"))
+        except Exception as e:
+            _count("batch_failures")
+            for _, _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+
+    def queued(self) -> int:
+        with self._lock:
+            return sum(len(p.items) for p in self._pending.values())
+
+
+_batcher = MicroBatcher()
+
+
+def classify(state: Any, instruction: str, prompts: Sequence[str], max_tokens: int, request_timeout: float,
+             reserve: float = 0.0, temperature: float = 0.0) -> List[Optional[Dict[str, Any]]]:
+    """Answer small JSON classification prompts through the micro-batcher, where they can share
+    requests with prompts from other runs. Prompts without an answer within the run's budget
+    come back as None."""
+    wait_until = time.monotonic() + max(
+        deadline.timeout_for(state, request_timeout + settings.LLM_BATCH_WINDOW_MS / 1000.0, reserve),
+        deadline.MIN_CALL_SECONDS,
+    )
+    # The batch is bounded by the same deadline, so a prompt that times out here is never answered (or billed) later
+    futures = [_batcher.submit(instruction, prompt, max_tokens, temperature, wait_until) for prompt in prompts]
+    answers: List[Optional[Dict[str, Any]]] = []
+    for future in futures:
+        try:
+            answers.append(future.result(timeout=max(0.0, wait_until - time.monotonic())))
+        except Exception as e:
+            logger.warning(f"[LLM] Batched classification failed: {e}")
+            answers.append(None)
+    return answers
+
+
+def shutdown() -> None:
+    global _bulk, _closed
+    with _bulk_lock:
+        _closed = True
+        if _bulk is not None:
+            _bulk.shutdown(wait=False, cancel_futures=True)
+            _bulk = None
+    model_router.get_router().shutdown()
+
+
+def gateway_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        counters = dict(_counters)
+        in_flight = dict(_in_flight)
+    counters["slot_wait_seconds"] = round(counters["slot_wait_seconds"], 3)
+    return {
+        "primary_model": PRIMARY_MODEL,
+        "fallback_model": FALLBACK_MODEL,
+        "max_concurrency_per_model": settings.LLM_MAX_CONCURRENCY_PER_MODEL,
+        "in_flight": in_flight,
+        "bulk_queued": counters["bulk_submitted"] - counters["bulk_completed"],
+        "batch_pending": _batcher.queued(),
+        **counters,
+    }
@@ -0,0 +1,245 @@
+# Latency-aware LLM routing with hedged requests
+# Tracks the recent latency distribution of every OpenAI model. When a call to the primary model
+# has been running longer than that model's observed p95, a second request goes to the fallback
+# model; whichever answers first is used and the other request is cancelled (its HTTP connection
+# is closed). A slow primary therefore costs roughly p95 plus the fallback's latency instead of a
+# full timeout. Breaker bookkeeping for every call made here is done here as well.
+# The races run on one long-lived event loop in a daemon thread; worker threads submit to it and
+# block on the result, so no call pays for creating and tearing down a loop.
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+import openai
+from backend.config import settings
+from backend.services import circuit_breaker, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Sliding window of call latencies for one model"""
+
+    def __init__(self, window: int):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.cancelled = 0
+
+    def record(self, seconds: float, completed: bool = True) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            if completed:
+                self.calls += 1
+            else:
+                self.cancelled += 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+    def samples(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+class ModelRouter:
+    """Runs chat completions, hedging slow primary calls with a fallback model"""
+
+    def __init__(self):
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+        self._hedged = 0
+        self._hedge_wins = 0
+        self._primary_wins = 0
+        self._hedge_skipped = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=self._run_loop, args=(loop,), name="model-router", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+            # Cancel whatever was still racing, so the threads waiting on it get an error instead of hanging
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        finally:
+            loop.close()
+
+    def shutdown(self) -> None:
+        """Stop the event loop; calls still racing on it are abandoned"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+
+    def tracker(self, model: str) -> LatencyTracker:
+        with self._lock:
+            tracker = self._trackers.get(model)
+            if tracker is None:
+                tracker = self._trackers[model] = LatencyTracker(settings.LLM_LATENCY_WINDOW)
+            return tracker
+
+    def hedge_delay(self, model: str, timeout: float) -> Optional[float]:
+        """Seconds to wait on `model` before hedging, or None while there is too little data"""
+        tracker = self.tracker(model)
+        if tracker.samples() < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        p = tracker.percentile(settings.LLM_HEDGE_PERCENTILE)
+        delay = max(settings.LLM_HEDGE_MIN_DELAY, p)
+        # No point hedging if the fallback would barely get started before the deadline
+        return delay if delay < timeout * 0.8 else None
+
+    async def _call(self, model: str, messages: List[Dict[str, str]], timeout: float, **params: Any) -> Any:
+        started = time.monotonic()
+        breaker = circuit_breaker.get_breaker(f"openai:{model}")
+        try:
+            response = await openai.ChatCompletion.acreate(
+                model=model, messages=messages, request_timeout=timeout, **params
+            )
+        except asyncio.CancelledError:
+            # The other request won. Its elapsed time is a lower bound on this call's latency and
+            # keeps the percentile from drifting down when a slow model mostly loses races.
+            self.tracker(model).record(time.monotonic() - started, completed=False)
+            raise
+        except Exception as e:
+            self.tracker(model).record_failure()
+            if circuit_breaker.is_provider_failure(e):
+                breaker.record_failure()
+            raise
+        breaker.record_success()
+        self.tracker(model).record(time.monotonic() - started)
+        return response
+
+    def _may_hedge(self, model: str, tokens: int, priority: str, slot: Optional[threading.Semaphore]) -> bool:
+        if not circuit_breaker.get_breaker(f"openai:{model}").ready():
+            return False
+        # Only hedge with spare capacity; a hedge must never queue behind real traffic
+        if slot is not None and not slot.acquire(blocking=False):
+            return False
+        if not rate_limiter.acquire("openai", tokens, priority, timeout=0):
+            if slot is not None:
+                slot.release()
+            return False
+        # The breaker is asked last: in half-open state allow() hands out the single probe, which must
+        # go to a request that is actually sent
+        if circuit_breaker.get_breaker(f"openai:{model}").allow():
+            return True
+        rate_limiter.refund("openai", tokens)
+        if slot is not None:
+            slot.release()
+        return False
+
+    async def _race(self, model: str, hedge_to: Optional[str], messages: List[Dict[str, str]], timeout: float,
+                    tokens: int, priority: str, params: Dict[str, Any],
+                    slots: Optional[Callable[[str], threading.Semaphore]]) -> Any:
+        primary = asyncio.ensure_future(self._call(model, messages, timeout, **params))
+        delay = self.hedge_delay(model, timeout) if hedge_to and hedge_to != model and settings.LLM_HEDGE_ENABLED else None
+        if delay is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        hedge_slot = slots(hedge_to) if slots else None
+        if not self._may_hedge(hedge_to, tokens, priority, hedge_slot):
+            with self._lock:
+                self._hedge_skipped += 1
+            return await primary
+        with self._lock:
+            self._hedged += 1
+        logger.info(f"[Router] {model} slower than {delay:.1f}s, hedging with {hedge_to}")
+        hedge = asyncio.ensure_future(self._call(hedge_to, messages, max(1.0, timeout - delay), **params))
+        if hedge_slot is not None:
+            hedge.add_done_callback(lambda _: hedge_slot.release())
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    with self._lock:
+                        if task is hedge:
+                            self._hedge_wins += 1
+                        else:
+                            self._primary_wins += 1
+                    return task.result()
+                # One side failed; keep waiting for the other
+                error = error or task.exception()
+        raise error
+
+    def complete(self, model: str, messages: List[Dict[str, str]], timeout: float, hedge_to: Optional[str] = None,
+                 priority: str = "default", slots: Optional[Callable[[str], threading.Semaphore]] = None,
+                 **params: Any) -> Any:
+        """Blocking chat completion on `model`, hedged with `hedge_to` once it runs past its p95.
+        `slots` maps a model to its concurrency semaphore; a hedge only starts if it gets a slot
+        without waiting. Called from worker threads; the race runs on the router's event loop."""
+        tokens = rate_limiter.estimate_tokens(messages, params.get("max_tokens", 256))
+        race = self._race(model, hedge_to, messages, timeout, tokens, priority, params, slots)
+        return asyncio.run_coroutine_threadsafe(race, self._event_loop()).result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            trackers = dict(self._trackers)
+            hedged, hedge_wins, primary_wins, skipped = self._hedged, self._hedge_wins, self._primary_wins, self._hedge_skipped
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "hedging_enabled": settings.LLM_HEDGE_ENABLED,
+            "hedge_percentile": settings.LLM_HEDGE_PERCENTILE,
+            "hedged_total": hedged,
+            "hedge_wins": hedge_wins,
+            "primary_wins_after_hedge": primary_wins,
+            "hedge_win_rate": round(hedge_wins / hedged, 3) if hedged else None,
+            "hedges_skipped_no_capacity": skipped,
+            "models": {
+                model: {
+                    "calls": t.calls,
+                    "failures": t.failures,
+                    "cancelled": t.cancelled,
+                    "samples": t.samples(),
+                    "p50_ms": ms(t.percentile(50)),
+                    "p95_ms": ms(t.percentile(95)),
+                    "p99_ms": ms(t.percentile(99)),
+                    "hedge_after_ms": ms(self.hedge_delay(model, float("inf"))),
+                }
+                for model, t in trackers.items()
+            },
+        }
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
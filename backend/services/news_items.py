@@ -0,0 +1,87 @@
+# Compact news records for the graph state
+# News items used to be plain dicts carrying the full crawled page (raw_content). NewsItem keeps
+# the handful of fields the agents read in __slots__, with the body behind a blob arena
+# reference, and still supports the dict-style access (item.get("url"), item["title"]) the
+# agents and prompts already use. Extracted articles keep their dict shape, with the full text
+# moved to the arena under "content_ref".
+
+from typing import Any, Dict, Iterable, List, Optional
+from backend.services import blob_arena
+
+
+class NewsItem:
+    __slots__ = ("title", "url", "snippet", "score", "source", "overall_score", "raw_ref")
+    FIELDS = ("title", "url", "snippet", "score", "source", "overall_score")
+
+    def __init__(self, title: str = "", url: str = "", snippet: str = "", score: float = 0.0, source: str = "",
+                 overall_score: float = 0.0, raw_ref: Optional[str] = None):
+        self.title = title
+        self.url = url
+        self.snippet = snippet
+        self.score = score
+        self.source = source
+        self.overall_score = overall_score
+        self.raw_ref = raw_ref
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], state: Any = None) -> "NewsItem":
+        """Record from a Tavily result dict; the raw page content goes to the run's arena"""
+        return cls(
+            title=data.get("title", ""), url=data.get("url", ""), snippet=data.get("snippet", ""),
+            score=data.get("score", 0) or 0, source=data.get("source", ""),
+            overall_score=data.get("overall_score", 0) or 0,
+            raw_ref=blob_arena.store(state, data.get("raw_content")) or None,
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __repr__(self) -> str:
+        return f"NewsItem(url={self.url!r}, title={self.title!r})"
+
+
+def as_record(item: Any, state: Any = None) -> NewsItem:
+    return item if isinstance(item, NewsItem) else NewsItem.from_dict(item, state)
+
+
+def news_dicts(items: Iterable[Any]) -> List[Dict[str, Any]]:
+    """Plain dicts for storage and API responses (records from older states pass through)"""
+    return [item.to_dict() if isinstance(item, NewsItem) else item for item in items or []]
+
+
+def stash_extracted(state: Any, extracted: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Extracted articles with the full text moved to the run's arena"""
+    stashed = []
+    for article in extracted:
+        article = dict(article)
+        article["content_ref"] = blob_arena.store(state, article.pop("content", ""))
+        stashed.append(article)
+    return stashed
+
+
+def extracted_text(state: Any, article: Dict[str, Any]) -> str:
+    if "content" in article:
+        return article["content"] or ""
+    return blob_arena.load(state, article.get("content_ref"), "") or ""
+
+
+def extracted_dicts(state: Any, extracted: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Extracted articles with their full text back in "content", for storage and API responses"""
+    resolved = []
+    for article in extracted or []:
+        text = extracted_text(state, article)
+        article = {k: v for k, v in article.items() if k != "content_ref"}
+        article["content"] = text
+        resolved.append(article)
+    return resolved
@@ -0,0 +1,270 @@
+# PDF report rendering off the event loop
+# Building a report with FPDF is pure CPU work, so it runs in a small process pool instead of the
+# request handler. Rendered files are kept in an in-memory LRU bounded by total bytes and keyed
+# by the analysis run (or a hash of the report inputs), and concurrent requests for the same
+# report share one render.
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import anyio
+from fpdf import FPDF
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHART_HEIGHT = 55  # mm
+REPORT_NEWS_ITEMS = 5
+
+
+def safe_text(text: Any, limit: int = 200) -> str:
+    clean = re.sub(r'[^\x20-\x7E]+', ' ', str(text))  # core PDF fonts are Latin-1 only
+    clean = clean.replace("\n", " ").replace("\r", " ")
+    return clean[:limit]
+
+
+def _price_points(prices: Dict[str, Any]) -> List[Tuple[str, float]]:
+    points = []
+    for date, price in sorted(prices.items()):
+        try:
+            points.append((date, float(price)))
+        except (TypeError, ValueError):
+            continue
+    return points
+
+
+def _draw_price_chart(pdf: FPDF, prices: Dict[str, Any]) -> None:
+    """Line chart of closing prices with min/max and first/last date labels"""
+    points = _price_points(prices)
+    if len(points) < 2:
+        return
+    if pdf.get_y() + CHART_HEIGHT + 12 > pdf.page_break_trigger:
+        pdf.add_page()
+    x0, y0 = pdf.l_margin, pdf.get_y()
+    width = pdf.w - pdf.l_margin - pdf.r_margin
+    pad = 4
+    values = [v for _, v in points]
+    low, high = min(values), max(values)
+    span = (high - low) or 1.0
+    step = (width - 2 * pad) / (len(points) - 1)
+    coords = [
+        (x0 + pad + i * step, y0 + CHART_HEIGHT - pad - (v - low) / span * (CHART_HEIGHT - 2 * pad))
+        for i, v in enumerate(values)
+    ]
+
+    pdf.set_draw_color(200, 200, 200)
+    pdf.set_line_width(0.2)
+    pdf.rect(x0, y0, width, CHART_HEIGHT)
+    if values[-1] >= values[0]:
+        pdf.set_draw_color(22, 163, 74)
+    else:
+        pdf.set_draw_color(220, 38, 38)
+    pdf.set_line_width(0.5)
+    for (xa, ya), (xb, yb) in zip(coords, coords[1:]):
+        pdf.line(xa, ya, xb, yb)
+
+    pdf.set_font("Arial", size=7)
+    pdf.set_xy(x0 + 1, y0 + 1)
+    pdf.cell(30, 3, f"${high:,.2f}")
+    pdf.set_xy(x0 + 1, y0 + CHART_HEIGHT - 4)
+    pdf.cell(30, 3, f"${low:,.2f}")
+    pdf.set_xy(x0, y0 + CHART_HEIGHT + 1)
+    pdf.cell(width / 2, 4, safe_text(points[0][0], 20))
+    pdf.cell(width / 2, 4, safe_text(points[-1][0], 20), align="R")
+    pdf.set_draw_color(0, 0, 0)
+    pdf.set_line_width(0.2)
+    pdf.set_y(y0 + CHART_HEIGHT + 7)
+
+
+def render_report(ticker: str, report: Dict[str, Any]) -> bytes:
+    """Build the analysis PDF; runs in a worker process, so it only takes plain data"""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+
+    # Header
+    pdf.cell(0, 10, f"EchoMarket Analysis Report - {safe_text(ticker, 20)}", ln=True)
+    pdf.set_font("Arial", size=8)
+    pdf.cell(0, 5, f"Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC", ln=True)
+    pdf.ln(3)
+
+    # Key metrics
+    pdf.set_font("Arial", size=12)
+    sentiment = safe_text(report.get("sentiment", "N/A"))
+    confidence = safe_text(report.get("confidence", "N/A"))
+    recommendation = safe_text(report.get("recommendation", "N/A"))
+    pdf.cell(0, 8, f"Sentiment: {sentiment} (Confidence: {confidence})", ln=True)
+    pdf.cell(0, 8, f"Recommendation: {recommendation}", ln=True)
+    pdf.ln(3)
+
+    # Insight
+    insight = safe_text(report.get("insight") or "No insight available", 1000)
+    pdf.multi_cell(0, 8, f"Key Insight: {insight}")
+    pdf.ln(3)
+
+    # Summary
+    pdf.set_font("Arial", style="B", size=11)
+    pdf.cell(0, 8, "Executive Summary:", ln=True)
+    pdf.set_font("Arial", size=10)
+    pdf.multi_cell(0, 6, safe_text(report.get("summary") or "No summary available", 4000))
+    pdf.ln(3)
+
+    # Price chart
+    prices = report.get("prices") or {}
+    pdf.set_font("Arial", style="B", size=11)
+    pdf.cell(0, 8, "Price History:", ln=True)
+    _draw_price_chart(pdf, prices)
+
+    # News headlines
+    pdf.set_font("Arial", style="B", size=11)
+    pdf.cell(0, 8, "Top News Headlines:", ln=True)
+    pdf.set_font("Arial", size=10)
+    for idx, title in enumerate(report.get("headlines", []), start=1):
+        pdf.multi_cell(0, 6, f"{idx}. {safe_text(title)}")
+        pdf.ln(1)
+
+    # Price data
+    pdf.ln(3)
+    pdf.set_font("Arial", style="B", size=11)
+    pdf.cell(0, 8, "Recent Price Data:", ln=True)
+    pdf.set_font("Arial", size=10)
+    points = _price_points(prices)
+    if points:
+        for date, price in points[-5:]:  # Last 5 sessions
+            pdf.cell(0, 6, f"{safe_text(date, 20)}: ${price:,.2f}", ln=True)
+    else:
+        pdf.cell(0, 6, "No price data available", ln=True)
+
+    return bytes(pdf.output())
+
+
+def report_inputs(result: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of an analysis the report uses, as plain data small enough to send to a worker"""
+    news = result.get("news") or []
+    return {
+        "sentiment": result.get("sentiment", "N/A"),
+        "confidence": result.get("confidence", "N/A"),
+        "recommendation": result.get("recommendation", "N/A"),
+        "insight": result.get("insight"),
+        "summary": result.get("summary"),
+        "prices": dict(result.get("prices") or {}),
+        "headlines": [item.get("title", "News item") for item in news[:REPORT_NEWS_ITEMS] if isinstance(item, dict)],
+    }
+
+
+class RenderedCache:
+    """LRU of rendered files, bounded by the total size of the cached bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._items.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+                self._evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+_cache = RenderedCache(settings.PDF_CACHE_MAX_BYTES)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_inflight: Dict[str, "asyncio.Task[bytes]"] = {}
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if settings.PDF_RENDER_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs an event loop and worker threads is unsafe
+            _pool = ProcessPoolExecutor(settings.PDF_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def _render(ticker: str, report: Dict[str, Any]) -> bytes:
+    global _pool
+    pool = _get_pool()
+    if pool is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, render_report, ticker, report)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool next time and render here for now
+            logger.error("[PDF] Render pool broke, rendering in a thread")
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+    return await anyio.to_thread.run_sync(render_report, ticker, report)
+
+
+async def render_pdf(ticker: str, result: Dict[str, Any], key: Optional[str] = None) -> bytes:
+    """Rendered report for an analysis, from the cache when the same run was rendered before"""
+    report = report_inputs(result)
+    if key is None:
+        key = hashlib.sha256(json.dumps([ticker, report], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.ensure_future(_render(ticker, report))
+        task.add_done_callback(lambda t: _inflight.pop(key, None))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception() or _cache.put(key, t.result()))
+    # shield: one client disconnecting must not cancel a render others are waiting on
+    return await asyncio.shield(task)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {**_cache.stats(), "rendering": len(_inflight), "workers": settings.PDF_RENDER_WORKERS}
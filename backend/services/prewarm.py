@@ -0,0 +1,185 @@
+# Background pre-warming of popular tickers
+# Most traffic hits a small set of tickers, so instead of making the first user of the day wait
+# for the full pipeline, this scheduler periodically refreshes the hottest tickers into the shared
+# cache. Popularity comes from the analyses stored in MongoDB plus this worker's own request
+# counts. Extra runs happen shortly before the US market opens. Refreshes run at background
+# priority and only start when the rate limiters have spare capacity, so they never crowd out
+# interactive requests.
+
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+import anyio
+from backend.config import settings
+from backend.services import rate_limiter, shared_cache
+
+logger = logging.getLogger(__name__)
+
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN = (9, 30)
+
+# Upstream credits one full pipeline run needs (price + history, search/extract/crawl/map)
+PIPELINE_CREDITS = {"twelvedata": 2, "tavily": 6}
+
+
+class PrewarmScheduler:
+    """Refreshes the most requested tickers on a fixed cadence and before market open"""
+
+    def __init__(self, collection: Callable[[], Any], refresh: Callable[[str], Awaitable[Any]]):
+        # `collection` is a getter so the scheduler always sees the app's current Mongo handle
+        self._collection = collection
+        self._refresh = refresh
+        self._local_counts: Counter = Counter()
+        self._counts_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._last_run: Optional[datetime] = None
+        self._last_tickers: List[str] = []
+        self._refreshed_total = 0
+        self._failed_total = 0
+
+    def record_request(self, ticker: str) -> None:
+        with self._counts_lock:
+            self._local_counts[ticker.upper()] += 1
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="prewarm-scheduler")
+            logger.info(f"[Prewarm] Scheduler started (top {settings.PREWARM_TOP_N} every {settings.PREWARM_INTERVAL_SECONDS}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def hot_tickers(self, limit: Optional[int] = None) -> List[str]:
+        """Most analysed tickers over the lookback window, hottest first"""
+        limit = limit or settings.PREWARM_TOP_N
+        since = datetime.utcnow() - timedelta(hours=settings.PREWARM_LOOKBACK_HOURS)
+        with self._counts_lock:
+            counts = Counter(self._local_counts)
+        collection = self._collection()
+        if collection is not None:
+            try:
+                # Counted in the database; the logger agent stores datetimes, /query stores ISO strings
+                pipeline = [
+                    {"$match": {"ticker": {"$nin": [None, ""]},
+                                "$or": [{"timestamp": {"$gte": since}}, {"timestamp": {"$gte": since.isoformat()}}]}},
+                    {"$group": {"_id": {"$toUpper": "$ticker"}, "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}},
+                    {"$limit": limit},
+                ]
+                for doc in collection.aggregate(pipeline):
+                    counts[doc["_id"]] += doc["count"]
+            except Exception as e:
+                logger.error(f"[Prewarm] Could not read analysis history: {e}")
+        return [ticker for ticker, _ in counts.most_common(limit)]
+
+    def _next_preopen(self, now: datetime) -> Optional[datetime]:
+        """Next pre-open slot (UTC), e.g. 30 and 5 minutes before 09:30 ET on weekdays"""
+        offsets = [int(m) for m in settings.PREWARM_PREOPEN_MINUTES.split(",") if m.strip()]
+        if not offsets:
+            return None
+        local_now = now.replace(tzinfo=ZoneInfo("UTC")).astimezone(MARKET_TZ)
+        for day in range(8):
+            date = (local_now + timedelta(days=day)).date()
+            if date.weekday() >= 5:
+                continue
+            market_open = datetime(date.year, date.month, date.day, *MARKET_OPEN, tzinfo=MARKET_TZ)
+            for minutes in sorted(offsets, reverse=True):
+                slot = market_open - timedelta(minutes=minutes)
+                if slot > local_now:
+                    return slot.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+        return None
+
+    def _seconds_until_next_run(self, now: datetime) -> float:
+        interval = settings.PREWARM_INTERVAL_SECONDS
+        next_regular = (self._last_run + timedelta(seconds=interval)) if self._last_run else now
+        candidates = [next_regular]
+        preopen = self._next_preopen(now)
+        if preopen:
+            candidates.append(preopen)
+        return max(0.0, (min(candidates) - now).total_seconds())
+
+    async def _loop(self) -> None:
+        # Give the app a moment to finish starting before the first cycle
+        await asyncio.sleep(settings.PREWARM_STARTUP_DELAY)
+        while True:
+            await asyncio.sleep(self._seconds_until_next_run(datetime.utcnow()))
+            try:
+                await self.run_cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Prewarm] Cycle failed: {e}")
+            self._last_run = datetime.utcnow()
+            # Local counts only bias the next cycle; older popularity comes from stored analyses
+            with self._counts_lock:
+                self._local_counts.clear()
+
+    async def _wait_for_capacity(self, give_up_at: float) -> bool:
+        loop = asyncio.get_running_loop()
+        while loop.time() < give_up_at:
+            if all(rate_limiter.has_capacity(p, c) for p, c in PIPELINE_CREDITS.items()):
+                return True
+            await asyncio.sleep(1.0)
+        return False
+
+    async def run_cycle(self) -> None:
+        """Refresh the hottest tickers once; only one worker per cycle does the work"""
+        cache = shared_cache.get_cache()
+        lease_ttl = max(60, settings.PREWARM_INTERVAL_SECONDS - 5)
+        # The lease is left to expire rather than released, so other workers skip this cycle
+        token = await anyio.to_thread.run_sync(cache.acquire_lease, "prewarm:cycle", lease_ttl)
+        if not token:
+            logger.info("[Prewarm] Another worker is running this cycle, skipping")
+            return
+        tickers = await anyio.to_thread.run_sync(self.hot_tickers)
+        self._last_tickers = tickers
+        logger.info(f"[Prewarm] Refreshing {len(tickers)} hot tickers")
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + lease_ttl
+        semaphore = asyncio.Semaphore(settings.PREWARM_CONCURRENCY)
+
+        async def refresh_one(ticker: str) -> None:
+            try:
+                await self._refresh(ticker)
+                self._refreshed_total += 1
+            except Exception as e:
+                self._failed_total += 1
+                logger.error(f"[Prewarm] Refresh failed for {ticker}: {e}")
+            finally:
+                semaphore.release()
+
+        tasks = []
+        for ticker in tickers:
+            await semaphore.acquire()
+            # Start each refresh only when the providers have spare credits
+            if not await self._wait_for_capacity(give_up_at):
+                semaphore.release()
+                logger.warning("[Prewarm] Rate limits stayed saturated, ending cycle early")
+                break
+            tasks.append(asyncio.create_task(refresh_one(ticker)))
+            # Let the refresh take its credits before checking capacity for the next one
+            await asyncio.sleep(0.5)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def status(self) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        return {
+            "enabled": settings.PREWARM_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "last_run": self._last_run.isoformat() if self._last_run else None,
+            "next_run_in_seconds": round(self._seconds_until_next_run(now), 1),
+            "last_tickers": self._last_tickers,
+            "refreshed_total": self._refreshed_total,
+            "failed_total": self._failed_total,
+        }
@@ -0,0 +1,229 @@
+# Array-backed OHLCV price history
+# Price history is kept as parallel NumPy columns (epoch seconds plus open/high/low/close/volume)
+# instead of a dict keyed by date strings, so multi-year or intraday windows stay compact and
+# statistics and resampling are vectorized. The old {"YYYY-MM-DD": close} shape is only built at
+# the API/storage edge with to_dict().
+
+import hashlib
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+WEEK = 7 * DAY
+# Unix epoch (1970-01-01) was a Thursday; weeks are bucketed from Monday
+_WEEK_SHIFT = 3 * DAY
+
+# Intervals TwelveData serves natively, in seconds (1month is calendar-based)
+INTERVAL_SECONDS = {
+    "1min": 60, "5min": 300, "15min": 900, "30min": 1800, "45min": 2700,
+    "1h": 3600, "2h": 7200, "4h": 14400, "1day": DAY, "1week": WEEK, "1month": 30 * DAY,
+}
+MAX_OUTPUTSIZE = 5000  # TwelveData's per-request cap
+TRADING_SECONDS_PER_DAY = 6.5 * 3600
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class PriceSeries:
+    """Ascending OHLCV bars for one interval, stored as NumPy columns"""
+
+    __slots__ = ("interval", "timestamps", "open", "high", "low", "close", "volume")
+
+    def __init__(self, interval: str, timestamps: np.ndarray, open_: np.ndarray, high: np.ndarray,
+                 low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.interval = interval
+        self.timestamps = timestamps
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def empty(cls, interval: str = "1day") -> "PriceSeries":
+        f = np.empty(0, dtype=np.float64)
+        return cls(interval, np.empty(0, dtype=np.int64), f, f, f, f, f)
+
+    @classmethod
+    def from_twelvedata(cls, values: Iterable[Dict[str, Any]], interval: str) -> "PriceSeries":
+        """Build from a /time_series `values` list (newest first, strings for every field)"""
+        rows = [v for v in values if v.get("datetime")]
+        if not rows:
+            return cls.empty(interval)
+        try:
+            stamps = np.array([v["datetime"] for v in rows], dtype="datetime64[s]")
+        except ValueError:
+            # A malformed row: parse one by one and drop it
+            parsed = []
+            for v in rows:
+                try:
+                    parsed.append(np.datetime64(v["datetime"], "s"))
+                except ValueError:
+                    parsed.append(np.datetime64("NaT"))
+            stamps = np.array(parsed, dtype="datetime64[s]")
+        columns = {
+            key: np.fromiter((_to_float(v.get(key)) for v in rows), dtype=np.float64, count=len(rows))
+            for key in ("open", "high", "low", "close", "volume")
+        }
+        keep = ~np.isnat(stamps) & ~np.isnan(columns["close"])
+        order = np.argsort(stamps[keep], kind="stable")
+        ts = stamps[keep][order].astype(np.int64)
+        close = columns["close"][keep][order]
+
+        def col(key: str, fill: np.ndarray) -> np.ndarray:
+            values = columns[key][keep][order]
+            return np.where(np.isnan(values), fill, values)
+
+        return cls(interval, ts, col("open", close), col("high", close), col("low", close), close,
+                   col("volume", np.zeros_like(close)))
+
+    @classmethod
+    def from_dict(cls, prices: Dict[str, Any], interval: str = "1day") -> "PriceSeries":
+        """Close-only series from the legacy {"date": close} shape"""
+        return cls.from_twelvedata(({"datetime": d, "close": c} for d, c in prices.items()), interval)
+
+    # --- Views ---
+
+    def last_close(self) -> Optional[float]:
+        return float(self.close[-1]) if len(self) else None
+
+    def head(self, n: int) -> "PriceSeries":
+        return self._take(slice(0, max(0, n)))
+
+    def tail(self, n: int) -> "PriceSeries":
+        return self._take(slice(max(0, len(self) - n), None))
+
+    def _take(self, index: Any) -> "PriceSeries":
+        return PriceSeries(self.interval, self.timestamps[index], self.open[index], self.high[index],
+                           self.low[index], self.close[index], self.volume[index])
+
+    def labels(self) -> List[str]:
+        """Bar timestamps as TwelveData formats them: dates for daily+ bars, datetimes intraday"""
+        stamps = self.timestamps.astype("datetime64[s]")
+        if INTERVAL_SECONDS.get(self.interval, DAY) >= DAY:
+            return np.datetime_as_string(stamps, unit="D").tolist()
+        return [s.replace("T", " ") for s in np.datetime_as_string(stamps, unit="s").tolist()]
+
+    def to_dict(self) -> Dict[str, float]:
+        """The legacy {"date": close} shape used by the API, exports and stored analyses"""
+        return dict(zip(self.labels(), self.close.tolist()))
+
+    def fingerprint(self) -> str:
+        """Cheap content hash, e.g. for stage-cache inputs"""
+        digest = hashlib.sha256(self.interval.encode("utf-8"))
+        digest.update(self.timestamps.tobytes())
+        digest.update(self.close.tobytes())
+        return digest.hexdigest()
+
+    def stats(self) -> Dict[str, float]:
+        """Vectorized summary of the window: change, range, volatility and max drawdown"""
+        if len(self) < 2:
+            return {}
+        close = self.close
+        prev = close[:-1]
+        returns = np.divide(np.diff(close), prev, out=np.zeros(len(prev)), where=prev != 0)
+        peak = np.maximum.accumulate(close)
+        drawdown = np.divide(close, peak, out=np.ones(len(close)), where=peak != 0) - 1.0
+        return {
+            "first": float(close[0]),
+            "last": float(close[-1]),
+            "change_pct": float((close[-1] / close[0] - 1.0) * 100) if close[0] else 0.0,
+            "high": float(self.high.max()),
+            "low": float(self.low.min()),
+            "volatility_pct": float(returns.std(ddof=1) * 100) if len(returns) > 1 else 0.0,
+            "max_drawdown_pct": float(drawdown.min() * 100),
+            "bars": len(self),
+        }
+
+    # --- Resampling ---
+
+    def _buckets(self, interval: str) -> np.ndarray:
+        ts = self.timestamps
+        if interval == "1month":
+            months = ts.astype("datetime64[s]").astype("datetime64[M]")
+            return months.astype("datetime64[s]").astype(np.int64)
+        if interval == "1week":
+            return (ts + _WEEK_SHIFT) // WEEK * WEEK - _WEEK_SHIFT
+        seconds = INTERVAL_SECONDS[interval]
+        return ts // seconds * seconds
+
+    def resample(self, interval: str) -> "PriceSeries":
+        """Aggregate into coarser bars (open=first, high=max, low=min, close=last, volume=sum)"""
+        if interval not in INTERVAL_SECONDS:
+            raise ValueError(f"Unsupported interval: {interval}")
+        if interval == self.interval or not len(self):
+            return PriceSeries(interval, self.timestamps, self.open, self.high, self.low, self.close, self.volume)
+        buckets = self._buckets(interval)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(buckets)] - 1
+        return PriceSeries(
+            interval,
+            buckets[starts],
+            self.open[starts],
+            np.maximum.reduceat(self.high, starts),
+            np.minimum.reduceat(self.low, starts),
+            self.close[ends],
+            np.add.reduceat(self.volume, starts),
+        )
+
+    def downsample(self, max_bars: int) -> "PriceSeries":
+        """Resample to the finest standard interval that fits in max_bars (for prompts and charts)"""
+        if len(self) <= max_bars:
+            return self
+        span = int(self.timestamps[-1] - self.timestamps[0])
+        current = INTERVAL_SECONDS.get(self.interval, 0)
+        for interval, seconds in sorted(INTERVAL_SECONDS.items(), key=lambda item: item[1]):
+            if seconds > current and span // seconds + 1 <= max_bars:
+                return self.resample(interval)
+        return self.resample("1month").tail(max_bars)
+
+
+def normalize_interval(interval: Optional[str]) -> str:
+    interval = (interval or "1day").strip().lower()
+    if interval not in INTERVAL_SECONDS:
+        logger.warning(f"[Prices] Unsupported interval {interval!r}, using 1day")
+        return "1day"
+    return interval
+
+
+def fetch_plan(interval: str, lookback_days: float, now: Optional[datetime] = None) -> Tuple[str, Dict[str, Any]]:
+    """TwelveData interval and query params covering `lookback_days` of `interval` bars.
+    Weekly and monthly views are fetched as daily bars and resampled locally, so changing the
+    view doesn't need a new request shape. Intraday windows longer than MAX_OUTPUTSIZE bars are
+    cut to the most recent ones."""
+    now = now or datetime.utcnow()
+    fetch_interval = interval if INTERVAL_SECONDS[interval] < DAY else "1day"
+    if fetch_interval == "1day":
+        expected = math.ceil(lookback_days * 5 / 7) + 3
+    else:
+        expected = math.ceil(lookback_days * 5 / 7 * TRADING_SECONDS_PER_DAY / INTERVAL_SECONDS[fetch_interval]) + 1
+    if expected > MAX_OUTPUTSIZE:
+        logger.warning(f"[Prices] {lookback_days} days of {fetch_interval} bars exceeds {MAX_OUTPUTSIZE}, keeping the most recent")
+    start = now - timedelta(days=lookback_days)
+    return fetch_interval, {
+        "interval": fetch_interval,
+        "start_date": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "outputsize": min(expected, MAX_OUTPUTSIZE),
+    }
+
+
+def series_of(state: Any) -> PriceSeries:
+    """The run's price series, falling back to a legacy `prices` dict (e.g. a stored analysis)"""
+    series = getattr(state, "price_series", None)
+    if isinstance(series, PriceSeries):
+        return series
+    prices = getattr(state, "prices", None) or {}
+    return PriceSeries.from_dict(prices) if prices else PriceSeries.empty()
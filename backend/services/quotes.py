@@ -0,0 +1,204 @@
+# Live quote fan-out for /ws/quotes
+# Each subscribed symbol has exactly one background poller per worker, however many WebSocket
+# clients follow it; every update is pushed to all of their queues. Across workers the pollers
+# go through the shared cache: whoever takes the symbol's lease calls TwelveData, the rest reuse
+# its quote, so upstream load scales with distinct symbols rather than with connected users.
+# The poll interval is budgeted the same way: every worker adds its symbols to a shared map, and
+# the interval is derived from the number of distinct symbols polled by any worker.
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+import anyio
+import requests
+from backend.config import settings
+from backend.services import circuit_breaker, rate_limiter, shared_cache
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = 10
+QUEUE_SIZE = 100  # per connection; the oldest update is dropped for clients that fall behind
+SYMBOL_PATTERN = re.compile(r"^[A-Z][A-Z0-9.\-]{0,9}$")
+MIN_POLL_SECONDS = 15.0
+LIVE_SYMBOLS_KEY = "quote_symbols"  # symbol -> last time any worker polled it
+LIVE_SYMBOLS_EXPIRY = 3  # poll intervals after which a symbol no worker polls stops counting
+
+
+def poll_interval(symbols: int = 1) -> float:
+    """Seconds between polls of each symbol. QUOTE_POLL_SECONDS when set; otherwise derived so that
+    `symbols` live feeds use at most QUOTE_CREDIT_SHARE of the TwelveData credits per minute."""
+    if settings.QUOTE_POLL_SECONDS > 0:
+        return settings.QUOTE_POLL_SECONDS
+    credits_per_minute = settings.TWELVE_DATA_CREDITS_PER_MINUTE * settings.QUOTE_CREDIT_SHARE
+    if credits_per_minute <= 0:
+        return MIN_POLL_SECONDS
+    return max(MIN_POLL_SECONDS, max(1, symbols) * 60.0 / credits_per_minute)
+
+
+def shared_interval(local: Iterable[str]) -> float:
+    """poll_interval() for the distinct symbols polled across all workers, after adding this worker's"""
+    local = set(local)
+    if settings.QUOTE_POLL_SECONDS > 0:
+        return settings.QUOTE_POLL_SECONDS
+    cache = shared_cache.get_cache()
+    now = time.time()
+    seen = cache.get(LIVE_SYMBOLS_KEY) or {}
+    expiry = LIVE_SYMBOLS_EXPIRY * poll_interval(len(local | set(seen)))
+    live = {symbol: ts for symbol, ts in seen.items() if now - ts < expiry}
+    # If another worker is updating the map, this worker's symbols are still counted locally
+    token = cache.acquire_lease(LIVE_SYMBOLS_KEY, 5)
+    if token:
+        try:
+            live = {symbol: ts for symbol, ts in (cache.get(LIVE_SYMBOLS_KEY) or {}).items() if now - ts < expiry}
+            live.update({symbol: now for symbol in local})
+            cache.set(LIVE_SYMBOLS_KEY, live, expiry)
+        finally:
+            cache.release_lease(LIVE_SYMBOLS_KEY, token)
+    return poll_interval(len(local | set(live)))
+
+
+def fetch_quote(symbol: str, interval: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """One TwelveData /price call, guarded by the breaker and rate limiter; None if skipped or failed"""
+    breaker = circuit_breaker.get_breaker("twelvedata")
+    if not settings.TWELVE_DATA_API_KEY or not breaker.ready():
+        return None
+    # Quotes are refreshed again shortly, so they queue behind analysis traffic and don't wait long
+    if not rate_limiter.acquire("twelvedata", 1, "background", timeout=min(5.0, interval or poll_interval())):
+        return None
+    if not rate_limiter.allow_or_refund(breaker, "twelvedata"):
+        return None
+    try:
+        resp = requests.get(
+            f"{settings.TWELVE_DATA_BASE_URL}/price",
+            params={"symbol": symbol, "apikey": settings.TWELVE_DATA_API_KEY},
+            timeout=REQUEST_TIMEOUT,
+        )
+        resp.raise_for_status()
+        breaker.record_success()
+        price = float(resp.json().get("price"))
+    except Exception as e:
+        if circuit_breaker.is_provider_failure(e):
+            breaker.record_failure()
+        logger.warning(f"[Quotes] Quote fetch failed for {symbol}: {e}")
+        return None
+    return {"type": "quote", "symbol": symbol, "price": price, "ts": time.time()}
+
+
+def shared_quote(symbol: str, interval: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Latest quote for a symbol, fetching it only if no worker has done so this poll interval"""
+    cache = shared_cache.get_cache()
+    key = f"quote:{symbol}"
+    interval = interval or poll_interval()
+    cached = cache.get(key)
+    if cached and time.time() - cached.get("ts", 0) < interval:
+        return cached
+    # The lease is left to expire, which limits the symbol to one upstream call per interval
+    if not cache.acquire_lease(key, interval):
+        return cached
+    quote = fetch_quote(symbol, interval)
+    if quote:
+        cache.set(key, quote, interval * 4)
+    return quote or cached
+
+
+class _Feed:
+    __slots__ = ("symbol", "subscribers", "task", "last", "polls")
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.last: Optional[Dict[str, Any]] = None
+        self.polls = 0
+
+
+def offer(queue: asyncio.Queue, message: Dict[str, Any]) -> None:
+    """Non-blocking put that drops the oldest message when the queue is full"""
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(message)
+
+
+class QuoteHub:
+    """Symbol -> single poller plus the queues of every connection subscribed to it"""
+
+    def __init__(self):
+        self._feeds: Dict[str, _Feed] = {}
+        self._interval = poll_interval()
+
+    @staticmethod
+    def new_queue() -> asyncio.Queue:
+        return asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def subscribe(self, symbol: str, queue: asyncio.Queue) -> None:
+        feed = self._feeds.get(symbol)
+        if feed is None:
+            feed = self._feeds[symbol] = _Feed(symbol)
+            feed.task = asyncio.create_task(self._poll(feed), name=f"quotes-{symbol}")
+            logger.info(f"[Quotes] Started poller for {symbol}")
+        feed.subscribers.add(queue)
+        if feed.last:
+            # New subscribers see the current price right away
+            offer(queue, feed.last)
+
+    def unsubscribe(self, symbol: str, queue: asyncio.Queue) -> None:
+        feed = self._feeds.get(symbol)
+        if feed is None:
+            return
+        feed.subscribers.discard(queue)
+        if not feed.subscribers:
+            feed.task.cancel()
+            del self._feeds[symbol]
+            logger.info(f"[Quotes] Stopped poller for {symbol}")
+
+    def unsubscribe_all(self, queue: asyncio.Queue) -> None:
+        for symbol in [s for s, feed in self._feeds.items() if queue in feed.subscribers]:
+            self.unsubscribe(symbol, queue)
+
+    async def _poll(self, feed: _Feed) -> None:
+        while True:
+            try:
+                self._interval = await anyio.to_thread.run_sync(shared_interval, list(self._feeds))
+                quote = await anyio.to_thread.run_sync(shared_quote, feed.symbol, self._interval)
+                feed.polls += 1
+                # Only changes are pushed; a repeated cached quote is not news
+                if quote and (feed.last is None or quote["ts"] != feed.last["ts"]):
+                    feed.last = quote
+                    for queue in list(feed.subscribers):
+                        offer(queue, quote)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Quotes] Poller for {feed.symbol} failed: {e}")
+            await asyncio.sleep(self._interval)
+
+    async def stop(self) -> None:
+        tasks = [feed.task for feed in self._feeds.values()]
+        self._feeds.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "symbols": len(self._feeds),
+            "poll_seconds": round(self._interval, 1),
+            "subscriptions": sum(len(feed.subscribers) for feed in self._feeds.values()),
+            "feeds": {
+                symbol: {"subscribers": len(feed.subscribers), "polls": feed.polls,
+                         "last_price": feed.last["price"] if feed.last else None}
+                for symbol, feed in self._feeds.items()
+            },
+        }
+
+
+def parse_symbols(value: Any) -> Set[str]:
+    """Valid, upper-cased symbols from a list or a comma-separated string"""
+    items = value.split(",") if isinstance(value, str) else (value or [])
+    symbols = {str(item).strip().upper() for item in items}
+    return {s for s in symbols if SYMBOL_PATTERN.match(s)}
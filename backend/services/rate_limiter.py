@@ -0,0 +1,160 @@
+# Provider-aware rate limiting with a priority wait queue
+# One token bucket per upstream (TwelveData credits, Tavily credits, OpenAI tokens), sized from
+# config and shared by every agent in the process. Callers that find the bucket empty queue up
+# by priority, so interactive UI traffic is served before batch or background work, and they
+# see a short queueing delay instead of a 429 from the provider.
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from backend.config import settings
+from backend.services import deadline
+
+# Lower number = served first
+PRIORITIES = {"interactive": 0, "default": 1, "batch": 2, "background": 3}
+
+
+class PriorityTokenBucket:
+    """Token bucket whose waiters are released in priority order (FIFO within a priority)"""
+
+    def __init__(self, name: str, per_minute: float, burst: Optional[float] = None):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        # Counters for monitoring
+        self._granted = 0
+        self._timed_out = 0
+        self._skipped = 0  # non-blocking tries (timeout=0) refused
+        self._waited_seconds = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cost: float = 1.0, priority: str = "default", timeout: Optional[float] = None) -> bool:
+        """Block until `cost` tokens are available and it is this caller's turn; False on timeout"""
+        cost = min(float(cost), self.capacity)
+        entry = (PRIORITIES.get(priority, PRIORITIES["default"]), next(self._seq))
+        started = time.monotonic()
+        give_up_at = started + timeout if timeout is not None else None
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == entry and self._tokens >= cost:
+                        self._tokens -= cost
+                        self._granted += 1
+                        self._waited_seconds += time.monotonic() - started
+                        return True
+                    wait = None
+                    if self._waiters[0] == entry and self.rate > 0:
+                        wait = (cost - self._tokens) / self.rate
+                    if give_up_at is not None:
+                        left = give_up_at - time.monotonic()
+                        if left <= 0:
+                            if timeout <= 0:
+                                self._skipped += 1
+                            else:
+                                self._timed_out += 1
+                            return False
+                        wait = left if wait is None else min(wait, left)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def refund(self, cost: float = 1.0) -> None:
+        """Give back tokens taken by acquire() for a call that was not sent after all"""
+        with self._cond:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + min(float(cost), self.capacity))
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill()
+            return {
+                "tokens_available": round(self._tokens, 1),
+                "capacity": self.capacity,
+                "per_minute": round(self.rate * 60, 1),
+                "queued": len(self._waiters),
+                "granted_total": self._granted,
+                "timed_out_total": self._timed_out,
+                "skipped_total": self._skipped,
+                "avg_wait_seconds": round(self._waited_seconds / self._granted, 3) if self._granted else 0.0,
+            }
+
+
+_buckets: Dict[str, PriorityTokenBucket] = {}
+_registry_lock = threading.Lock()
+
+
+def _limit_for(provider: str) -> float:
+    return {
+        "twelvedata": settings.TWELVE_DATA_CREDITS_PER_MINUTE,
+        "tavily": settings.TAVILY_CREDITS_PER_MINUTE,
+        "openai": settings.OPENAI_TOKENS_PER_MINUTE,
+    }[provider]
+
+
+def get_bucket(provider: str) -> PriorityTokenBucket:
+    with _registry_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            bucket = _buckets[provider] = PriorityTokenBucket(provider, _limit_for(provider))
+        return bucket
+
+
+def priority_of(state: Any) -> str:
+    return getattr(state, "priority", None) or "default"
+
+
+def acquire(provider: str, cost: float = 1.0, priority: str = "default", timeout: Optional[float] = None) -> bool:
+    return get_bucket(provider).acquire(cost, priority, timeout)
+
+
+def refund(provider: str, cost: float = 1.0) -> None:
+    get_bucket(provider).refund(cost)
+
+
+def allow_or_refund(breaker: Any, provider: str, cost: float = 1.0) -> bool:
+    """Ask a circuit breaker once the tokens are held, giving them back if it refuses. The breaker goes
+    last because in half-open state allow() hands out the single probe, which must go to a sent request."""
+    if breaker.allow():
+        return True
+    refund(provider, cost)
+    return False
+
+
+def acquire_for(state: Any, provider: str, cost: float = 1.0, reserve: float = 0.0) -> bool:
+    """Acquire on behalf of a pipeline run, using its priority and waiting no longer than its budget allows"""
+    timeout = deadline.timeout_for(state, settings.RATE_LIMIT_MAX_WAIT, reserve + deadline.MIN_CALL_SECONDS)
+    return acquire(provider, cost, priority_of(state), timeout)
+
+
+def has_capacity(provider: str, cost: float = 1.0) -> bool:
+    """True if `cost` tokens are free right now and nobody is queued (used by background work)"""
+    snapshot = get_bucket(provider).snapshot()
+    return snapshot["queued"] == 0 and snapshot["tokens_available"] >= cost
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Rough OpenAI token cost of a chat call (~4 characters per token plus the completion budget)"""
+    prompt_chars = sum(len(m.get("content", "")) for m in messages)
+    return prompt_chars // 4 + max_tokens
+
+
+def limiter_states() -> Dict[str, Dict[str, Any]]:
+    with _registry_lock:
+        buckets = list(_buckets.values())
+    return {b.name: b.snapshot() for b in buckets}
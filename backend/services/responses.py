@@ -0,0 +1,212 @@
+# Responses for the analysis and export routes
+# Analysis payloads carry news lists, article bodies and price history, so they are serialized
+# with orjson when it is installed (falling back to the standard library) and in a worker
+# thread rather than on the event loop. Clients can ask for a sparse fieldset with `fields=`
+# ("price,recommendation" or dotted paths such as "trend.direction") to skip the bulk entirely.
+# Bodies are compressed per Accept-Encoding (brotli when installed, else gzip) and carry an
+# ETag, so a dashboard revalidating an unchanged analysis gets an empty 304 back.
+
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from backend.config import settings
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # well below the max: the body is compressed on every uncached request
+
+# Headers shared by full and 304 responses: the browser may keep a copy but must revalidate it
+_CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(
+                content,
+                default=str,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+            )
+        return json.dumps(content, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    return [f.strip() for f in (fields or "").split(",") if f.strip()]
+
+
+def select_fields(payload: Dict[str, Any], fields: Optional[str]) -> Dict[str, Any]:
+    """Keep only the requested top-level keys / dotted paths; 400 for unknown top-level names"""
+    paths = parse_fields(fields)
+    if not paths:
+        return payload
+    unknown = sorted({p.split(".", 1)[0] for p in paths} - set(payload))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(sorted(payload))}",
+        )
+    selected: Dict[str, Any] = {}
+    for path in paths:
+        parts = path.split(".")
+        value: Any = payload
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = selected
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+                if not isinstance(target, dict):
+                    break
+            else:
+                target[parts[-1]] = value
+    return selected
+
+
+# --- Conditional GET ---
+
+def etag_for(*parts: Any) -> str:
+    """Strong ETag from raw bytes or from identifying values (query_id, analyzed_at, fields...)"""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def analysis_etag(result: Dict[str, Any], *parts: Any) -> Optional[str]:
+    """Weak ETag for a representation of one stored analysis run; None if the run isn't identifiable.
+    Weak because volatile extras (e.g. age_seconds) may differ while the analysis is the same."""
+    run_id = result.get("query_id") or result.get("analyzed_at")
+    if not run_id:
+        return None
+    return "W/" + etag_for(result.get("ticker"), run_id, *parts)
+
+
+def _opaque(tag: str) -> str:
+    # Weak comparison, ignoring the per-encoding suffix added to compressed variants
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in ("-br", "-gzip"):
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)]
+    return tag
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    wanted = _opaque(etag)
+    return if_none_match.strip() == "*" or any(_opaque(tag) == wanted for tag in if_none_match.split(","))
+
+
+def _not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **_CACHE_HEADERS})
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """A 304 response if the client's If-None-Match already covers `etag`, else None"""
+    if etag and _matches(request.headers.get("if-none-match"), etag):
+        return _not_modified_response(etag)
+    return None
+
+
+# --- Content negotiation ---
+
+def preferred_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported coding for an Accept-Encoding header (brotli over gzip on equal weight)"""
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    weights: Dict[str, float] = {}
+    for item in (accept_encoding or "").lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.strip()] = q
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def _encoded_response(accept_encoding: str, body: bytes, media_type: str, etag: Optional[str],
+                      headers: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    etag = etag or etag_for(body)
+    out_headers = {**(headers or {}), **_CACHE_HEADERS}
+    coding = preferred_encoding(accept_encoding) if len(body) >= settings.COMPRESSION_MIN_BYTES else None
+    if coding:
+        compressed = _compress(body, coding)
+        # Already-compressed formats (PDF streams) may not shrink; send those as they are
+        if len(compressed) < len(body):
+            body = compressed
+            out_headers["Content-Encoding"] = coding
+            # Each encoding is a different byte sequence, so it gets its own strong validator
+            etag = etag[:-1] + f'-{coding}"'
+    out_headers["ETag"] = etag
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=out_headers)
+
+
+async def negotiated_response(request: Request, body: bytes, media_type: str, etag: Optional[str] = None,
+                              headers: Optional[Dict[str, str]] = None) -> Response:
+    """Compressed (if accepted) response with an ETag, or a 304 if the client is up to date"""
+    etag = etag or etag_for(body)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    accept = request.headers.get("accept-encoding", "")
+    return await anyio.to_thread.run_sync(lambda: _encoded_response(accept, body, media_type, etag, headers))
+
+
+async def json_response(payload: Dict[str, Any], fields: Optional[str] = None,
+                        request: Optional[Request] = None, etag: Optional[str] = None) -> Response:
+    """Apply the sparse fieldset, then serialize (and compress) off the event loop.
+    Without an `etag` the validator is a hash of the rendered body."""
+    payload = select_fields(payload, fields)
+    if request is None:
+        return await anyio.to_thread.run_sync(lambda: FastJSONResponse(payload))
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    accept = request.headers.get("accept-encoding", "")
+    if_none_match = request.headers.get("if-none-match")
+
+    def build() -> Response:
+        body = FastJSONResponse(payload).body
+        tag = etag or etag_for(body)
+        if _matches(if_none_match, tag):
+            return _not_modified_response(tag)
+        return _encoded_response(accept, body, "application/json", tag)
+
+    return await anyio.to_thread.run_sync(build)
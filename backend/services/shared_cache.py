@@ -0,0 +1,236 @@
+# Shared cache and cross-worker coordination
+# Several uvicorn workers (and several hosts) serve the API, so per-process caches miss most of the
+# time. This module provides one interface with pluggable backends:
+#   - "sqlite": a WAL-mode SQLite file, shared by every worker on the same host
+#   - "mongo":  collections in the app's MongoDB, shared across hosts
+#   - "none":   caching disabled (every lookup misses, every lease is granted)
+# Besides TTL entries it offers leases, so that for a given key one worker computes while the
+# others wait for its result instead of calling the upstream APIs themselves.
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+from uuid import uuid4
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCache(ABC):
+    """Interface for TTL entries plus lease-based "one computes, others wait" locking"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def acquire_lease(self, key: str, ttl: float) -> Optional[str]:
+        """Try to take the lease on `key`; returns an owner token, or None if another worker holds it"""
+
+    @abstractmethod
+    def release_lease(self, key: str, token: str) -> None:
+        ...
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: float,
+                       lease_ttl: Optional[float] = None, wait_timeout: Optional[float] = None,
+                       poll_interval: float = 0.25, force: bool = False) -> Any:
+        """Return the cached value for `key`, computing it at most once across workers.
+        With force=True the cached value is ignored and recomputed (still under the lease)."""
+        value = None if force else self.get(key)
+        if value is not None:
+            return value
+        lease_ttl = lease_ttl or settings.ANALYSIS_TIMEOUT + 10
+        give_up_at = time.time() + (wait_timeout if wait_timeout is not None else lease_ttl)
+        while True:
+            token = self.acquire_lease(key, lease_ttl)
+            if token:
+                try:
+                    # Another worker may have finished between our miss and taking the lease
+                    value = None if force else self.get(key)
+                    if value is not None:
+                        return value
+                    value = compute()
+                    if value is not None:
+                        self.set(key, value, ttl)
+                    return value
+                finally:
+                    self.release_lease(key, token)
+            if force:
+                # Someone else is already refreshing this key
+                return None
+            time.sleep(poll_interval)
+            value = self.get(key)
+            if value is not None:
+                return value
+            if time.time() >= give_up_at:
+                # The lease holder is stuck or slow; don't make the caller wait forever
+                logger.warning(f"[Cache] Gave up waiting on lease for {key}, computing locally")
+                return compute()
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+
+class NullCache(SharedCache):
+    """Caching disabled"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def acquire_lease(self, key, ttl):
+        return uuid4().hex
+
+    def release_lease(self, key, token):
+        pass
+
+
+class SQLiteCache(SharedCache):
+    """Single-host backend: one SQLite file in WAL mode, opened per thread"""
+
+    PURGE_EVERY = 200  # writes between sweeps of expired rows
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if not row or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", (key, _dumps(value), now + ttl))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def acquire_lease(self, key, ttl):
+        conn = self._conn()
+        token = uuid4().hex
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+            if row and row[0] > now:
+                conn.execute("ROLLBACK")
+                return None
+            conn.execute("INSERT OR REPLACE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)", (key, token, now + ttl))
+            conn.execute("COMMIT")
+            return token
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release_lease(self, key, token):
+        self._conn().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, token))
+
+
+class MongoCache(SharedCache):
+    """Multi-host backend: cache and lease collections in MongoDB, expired by TTL indexes"""
+
+    def __init__(self, uri: str, db_name: str, prefix: str = "shared"):
+        from pymongo import MongoClient
+        db = MongoClient(uri)[db_name]
+        self.entries = db[f"{prefix}_cache"]
+        self.leases = db[f"{prefix}_leases"]
+        # Mongo removes expired documents in the background; reads still check expiry themselves
+        self.entries.create_index("expires_at", expireAfterSeconds=0)
+        self.leases.create_index("expires_at", expireAfterSeconds=0)
+
+    def get(self, key):
+        doc = self.entries.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        return json.loads(doc["value"]) if doc else None
+
+    def set(self, key, value, ttl):
+        self.entries.update_one(
+            {"_id": key},
+            {"$set": {"value": _dumps(value), "expires_at": datetime.utcnow() + timedelta(seconds=ttl)}},
+            upsert=True,
+        )
+
+    def delete(self, key):
+        self.entries.delete_one({"_id": key})
+
+    def acquire_lease(self, key, ttl):
+        from pymongo.errors import DuplicateKeyError
+        token = uuid4().hex
+        now = datetime.utcnow()
+        try:
+            # Matches only a missing or expired lease; a live one makes the upsert collide on _id
+            self.leases.update_one(
+                {"_id": key, "expires_at": {"$lte": now}},
+                {"$set": {"owner": token, "expires_at": now + timedelta(seconds=ttl)}},
+                upsert=True,
+            )
+            return token
+        except DuplicateKeyError:
+            return None
+
+    def release_lease(self, key, token):
+        self.leases.delete_one({"_id": key, "owner": token})
+
+
+_cache: Optional[SharedCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SharedCache:
+    """Process-wide cache instance for the configured backend"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            backend = settings.SHARED_CACHE_BACKEND.lower()
+            try:
+                if backend == "mongo":
+                    _cache = MongoCache(settings.MONGODB_URI, settings.MONGO_DB_NAME)
+                elif backend == "sqlite":
+                    path = settings.SHARED_CACHE_PATH or os.path.join(settings.DATA_DIR, "cache.sqlite3")
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    _cache = SQLiteCache(path)
+                else:
+                    _cache = NullCache()
+                logger.info(f"[Cache] Using {type(_cache).__name__}")
+            except Exception as e:
+                logger.error(f"[Cache] Failed to initialise {backend} cache, caching disabled: {e}")
+                _cache = NullCache()
+        return _cache
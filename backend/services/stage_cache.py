@@ -0,0 +1,48 @@
+# Input-fingerprinted reuse of pipeline stage results
+# Each LLM stage declares which parts of the graph state it actually reads. Those inputs are
+# hashed into a fingerprint; if a previous run with the same fingerprint stored its output in
+# the shared cache, the stage returns that output instead of calling OpenAI again. Since later
+# stages fingerprint the outputs of earlier ones, only stages downstream of a real change re-run.
+
+import hashlib
+import json
+import logging
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+from backend.config import settings
+from backend.services import shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(stage: str, inputs: Any) -> str:
+    """Stable hash of a stage name plus the inputs it reads"""
+    payload = json.dumps({"stage": stage, "inputs": inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def reuse_if_unchanged(stage: str, inputs: Callable[[Any], Any],
+                       cacheable: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Callable:
+    """Skip the stage when its inputs match a stored run.
+    `cacheable` can reject outputs (e.g. rule-based fallbacks) that should not be reused."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(state: Any) -> Dict[str, Any]:
+            if not settings.STAGE_REUSE_ENABLED:
+                return func(state)
+            try:
+                key = f"stage:{stage}:{fingerprint(stage, inputs(state))}"
+            except Exception as e:
+                logger.warning(f"[{stage}] Could not fingerprint inputs, running stage: {e}")
+                return func(state)
+            cache = shared_cache.get_cache()
+            stored = cache.get(key)
+            if stored is not None:
+                logger.info(f"[{stage}] Inputs unchanged, reusing stored result")
+                return stored
+            result = func(state)
+            if isinstance(result, dict) and (cacheable is None or cacheable(result)):
+                cache.set(key, result, settings.STAGE_RESULT_TTL)
+            return result
+        return wrapper
+    return decorator
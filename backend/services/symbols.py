@@ -0,0 +1,251 @@
+# Local symbol index for company-name -> ticker resolution
+# Loaded once from a listing file (symbol, name, exchange, aliases), it answers exact lookups from
+# a dict of normalised names and falls back to fuzzy matching over a small token-filtered candidate
+# set. Web-search fallbacks that resolve a miss are written back so the next lookup is local.
+# Autocomplete uses sorted arrays of tickers, names and name tokens: a prefix is a contiguous
+# slice found with two bisects, so each keystroke costs O(log n) plus the handful of results.
+
+import bisect
+import csv
+import difflib
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LISTING = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "symbols.csv")
+
+# Corporate suffixes and filler words that don't help tell companies apart
+_STOPWORDS = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "companies", "ltd", "limited",
+    "plc", "llc", "lp", "sa", "nv", "ag", "group", "holding", "holdings", "the", "and", "class",
+}
+_NON_ALNUM = re.compile(r"[^a-z0-9&]+")
+_CAPITALISED_RUN = re.compile(r"\b[A-Z][\w&'.-]*(?:[ \t]+(?:&[ \t]+)?[A-Z][\w&'.-]*)*")
+
+FUZZY_CUTOFF = 0.82
+
+# Suggestion kinds in ranking order: ticker prefix, then full-name prefix, then any name word
+SUGGEST_KINDS = ("ticker", "name", "token")
+SUGGEST_MAX_LIMIT = 25
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and corporate suffixes: "Apple Inc." -> "apple" """
+    tokens = [t for t in _NON_ALNUM.sub(" ", text.lower()).split() if t not in _STOPWORDS]
+    return " ".join(tokens)
+
+
+class SymbolRecord:
+    __slots__ = ("symbol", "name", "exchange", "aliases")
+
+    def __init__(self, symbol: str, name: str, exchange: str = "", aliases: Iterable[str] = ()):
+        self.symbol = symbol.upper()
+        self.name = name
+        self.exchange = exchange
+        self.aliases = [a for a in aliases if a]
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"ticker": self.symbol, "name": self.name, "exchange": self.exchange}
+
+
+class SymbolIndex:
+    """In-memory ticker / company-name index with exact and fuzzy lookup"""
+
+    def __init__(self):
+        self._records: Dict[str, SymbolRecord] = {}
+        self._by_name: Dict[str, str] = {}  # normalised name or alias -> symbol
+        self._by_token: Dict[str, Set[str]] = {}  # name token -> normalised names containing it
+        # Sorted (key, symbol) arrays per suggestion kind; rebuilt lazily after additions
+        self._prefix: Optional[Dict[str, Tuple[List[str], List[str]]]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def load_csv(self, path: str) -> int:
+        """Add every row of a listing file; returns the number of rows loaded"""
+        count = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                symbol = (row.get("symbol") or "").strip()
+                if not symbol:
+                    continue
+                aliases = [a.strip() for a in (row.get("aliases") or "").split("|")]
+                self.add(symbol, (row.get("name") or "").strip(), (row.get("exchange") or "").strip(), aliases)
+                count += 1
+        return count
+
+    def add(self, symbol: str, name: str, exchange: str = "", aliases: Iterable[str] = ()) -> SymbolRecord:
+        with self._lock:
+            record = self._records.get(symbol.upper())
+            if record is None:
+                record = self._records[symbol.upper()] = SymbolRecord(symbol, name or symbol, exchange, aliases)
+            else:
+                record.aliases.extend(a for a in aliases if a and a not in record.aliases)
+            for label in [record.name, *record.aliases]:
+                key = normalize(label)
+                if not key:
+                    continue
+                # Listing order wins: the first company to claim a name keeps it
+                self._by_name.setdefault(key, record.symbol)
+                for token in key.split():
+                    self._by_token.setdefault(token, set()).add(key)
+            self._prefix = None
+            return record
+
+    def get(self, symbol: str) -> Optional[SymbolRecord]:
+        return self._records.get(symbol.strip().upper())
+
+    def lookup(self, query: str) -> Optional[Dict[str, object]]:
+        """Resolve a ticker or company name; None if nothing matches closely enough"""
+        query = (query or "").strip()
+        if not query:
+            return None
+        # An exact ticker ("aapl", "BRK.B")
+        record = self._records.get(query.upper())
+        if record:
+            return {**record.to_dict(), "match": "ticker", "score": 1.0}
+        key = normalize(query)
+        if not key:
+            return None
+        symbol = self._by_name.get(key)
+        if symbol:
+            return {**self._records[symbol].to_dict(), "match": "exact", "score": 1.0}
+        return self._fuzzy(key)
+
+    def mentions(self, text: str, max_words: int = 4) -> Set[str]:
+        """Symbols whose company name or alias appears in `text`. Only runs of capitalised words are
+        matched, so "Apple" counts but "a price target" does not name Target."""
+        found: Set[str] = set()
+        for run in _CAPITALISED_RUN.findall(text or ""):
+            words = normalize(run).split()
+            for i in range(len(words)):
+                for j in range(i + 1, min(len(words), i + max_words) + 1):
+                    symbol = self._by_name.get(" ".join(words[i:j]))
+                    if symbol:
+                        found.add(symbol)
+        return found
+
+    def _fuzzy(self, key: str) -> Optional[Dict[str, object]]:
+        # Only score names sharing a token (or a token prefix) with the query
+        candidates: Set[str] = set()
+        for token in key.split():
+            candidates |= self._by_token.get(token, set())
+        if not candidates:
+            for token in key.split():
+                if len(token) >= 3:
+                    for indexed, names in self._by_token.items():
+                        if indexed.startswith(token[:3]):
+                            candidates |= names
+        if not candidates:
+            return None
+        best: Optional[str] = None
+        best_score = 0.0
+        matcher = difflib.SequenceMatcher(b=key)
+        for name in candidates:
+            matcher.set_seq1(name)
+            score = matcher.ratio()
+            if score > best_score:
+                best, best_score = name, score
+        if best is None or best_score < FUZZY_CUTOFF:
+            return None
+        return {**self._records[self._by_name[best]].to_dict(), "match": "fuzzy", "score": round(best_score, 3)}
+
+    def _build_prefix(self) -> Dict[str, Tuple[List[str], List[str]]]:
+        entries: Dict[str, Set[Tuple[str, str]]] = {kind: set() for kind in SUGGEST_KINDS}
+        for record in self._records.values():
+            entries["ticker"].add((record.symbol.lower(), record.symbol))
+            for label in [record.name, *record.aliases]:
+                key = normalize(label)
+                if not key:
+                    continue
+                entries["name"].add((key, record.symbol))
+                for token in key.split()[1:]:
+                    entries["token"].add((token, record.symbol))
+        prefix = {}
+        for kind, pairs in entries.items():
+            ordered = sorted(pairs)
+            prefix[kind] = ([k for k, _ in ordered], [sym for _, sym in ordered])
+        return prefix
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict[str, str]]:
+        """Ranked completions for a partial ticker or company name (one call per keystroke)"""
+        text = _NON_ALNUM.sub(" ", (query or "").lower()).split()
+        if not text:
+            return []
+        # Whole stopwords are dropped like in the index, but the word being typed is kept as is
+        words = [t for t in text[:-1] if t not in _STOPWORDS] + text[-1:]
+        # Word-level matches only make sense for a single word ("motors" -> General Motors)
+        keys = {"ticker": (query or "").strip().lower(), "name": " ".join(words),
+                "token": words[0] if len(words) == 1 else ""}
+        prefix = self._prefix
+        if prefix is None:
+            with self._lock:
+                if self._prefix is None:
+                    self._prefix = self._build_prefix()
+                prefix = self._prefix
+        limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+        results: List[Dict[str, str]] = []
+        seen: Set[str] = set()
+        for kind in SUGGEST_KINDS:
+            key = keys[kind]
+            if not key:
+                continue
+            names, syms = prefix[kind]
+            # Shorter keys sort first, so an exact match leads its slice
+            i = bisect.bisect_left(names, key)
+            while i < len(names) and names[i].startswith(key) and len(results) < limit:
+                if syms[i] not in seen:
+                    seen.add(syms[i])
+                    results.append({**self._records[syms[i]].to_dict(), "match": kind})
+                i += 1
+            if len(results) >= limit:
+                break
+        return results
+
+    def learn(self, query: str, symbol: str) -> None:
+        """Remember a resolution found elsewhere (e.g. web search), in memory and on disk"""
+        self.add(symbol, query, aliases=[query])
+        path = _learned_path()
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            new_file = not os.path.exists(path)
+            with open(path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(["symbol", "name", "exchange", "aliases"])
+                writer.writerow([symbol.upper(), query, "", query])
+        except OSError as e:
+            logger.warning(f"[Symbols] Could not persist learned symbol {symbol}: {e}")
+
+    def records(self) -> List[SymbolRecord]:
+        return list(self._records.values())
+
+
+def _learned_path() -> str:
+    return settings.SYMBOL_LEARNED_PATH or os.path.join(settings.DATA_DIR, "symbols_learned.csv")
+
+
+_index: Optional[SymbolIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> SymbolIndex:
+    """Process-wide index, loaded on first use from the listing plus previously learned symbols"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = SymbolIndex()
+            for path in (settings.SYMBOL_LISTING_PATH or DEFAULT_LISTING, _learned_path()):
+                if os.path.exists(path):
+                    try:
+                        logger.info(f"[Symbols] Loaded {index.load_csv(path)} symbols from {path}")
+                    except (OSError, csv.Error) as e:
+                        logger.error(f"[Symbols] Failed to load {path}: {e}")
+            _index = index
+        return _index
@@ -0,0 +1,299 @@
+# Watchlist engine: cheap indicator monitoring that triggers full analyses
+# Every watched symbol keeps an IndicatorState that is advanced once per new closed bar, so
+# monitoring costs one small TwelveData /time_series call per symbol and bar interval plus O(1)
+# arithmetic. The LLM pipeline only runs when a threshold is crossed (RSI leaving its band, an
+# EMA crossover, a volatility spike, price breaking away from VWAP), and at most once per symbol
+# per WATCH_COOLDOWN_SECONDS across all workers.
+# The watchlist is kept in the shared cache so every worker follows the same symbols; bar
+# fetches go through the shared cache as well, so the workers' states stay identical while each
+# bar is fetched once.
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+import anyio
+import requests
+from backend.config import settings
+from backend.services import admission, circuit_breaker, rate_limiter, shared_cache
+from backend.services.indicators import IndicatorState, conditions
+from backend.services.price_series import INTERVAL_SECONDS, PriceSeries, normalize_interval
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = 10
+POLL_OUTPUTSIZE = 5  # a few bars per poll, so a missed cycle doesn't leave a gap
+WATCHLIST_KEY = "watch:symbols"
+WATCHLIST_TTL = 365 * 86400
+EVENT_HISTORY = 200
+TRIGGER_ATTEMPTS = 3  # tries when admission sheds the background re-analysis
+
+
+def fetch_bars(symbol: str, interval: str, outputsize: int) -> Optional[List[Dict[str, Any]]]:
+    """Latest TwelveData bars (raw `values`, newest first) at background priority; None if skipped"""
+    breaker = circuit_breaker.get_breaker("twelvedata")
+    if not settings.TWELVE_DATA_API_KEY or not breaker.ready():
+        return None
+    # Never queue behind analysis traffic; the symbol is simply polled again next cycle
+    if not rate_limiter.acquire("twelvedata", 1, "background", timeout=1.0):
+        return None
+    if not rate_limiter.allow_or_refund(breaker, "twelvedata"):
+        return None
+    try:
+        resp = requests.get(
+            f"{settings.TWELVE_DATA_BASE_URL}/time_series",
+            params={"symbol": symbol, "interval": interval, "outputsize": outputsize,
+                    "apikey": settings.TWELVE_DATA_API_KEY},
+            timeout=REQUEST_TIMEOUT,
+        )
+        resp.raise_for_status()
+        breaker.record_success()
+        return resp.json().get("values") or []
+    except Exception as e:
+        if circuit_breaker.is_provider_failure(e):
+            breaker.record_failure()
+        logger.warning(f"[Watch] Bar fetch failed for {symbol}: {e}")
+        return None
+
+
+def shared_bars(symbol: str, interval: str, outputsize: int, max_age: float) -> Optional[List[Dict[str, Any]]]:
+    """Recent bars for a symbol, fetched by at most one worker per `max_age` seconds"""
+    cache = shared_cache.get_cache()
+    key = f"bars:{interval}:{symbol}:{outputsize}"
+    cached = cache.get(key)
+    if cached and time.time() - cached.get("fetched_at", 0) < max_age:
+        return cached["values"]
+    # As with quotes, the lease is left to expire so the symbol is fetched once per interval
+    if not cache.acquire_lease(key, max_age):
+        return cached["values"] if cached else None
+    values = fetch_bars(symbol, interval, outputsize)
+    if values is not None:
+        cache.set(key, {"values": values, "fetched_at": time.time()}, max_age * 4)
+        return values
+    return cached["values"] if cached else None
+
+
+def closed_bars(values: List[Dict[str, Any]], interval: str) -> PriceSeries:
+    """Bars as a series, minus the newest one, which TwelveData returns while it is still forming"""
+    series = PriceSeries.from_twelvedata(values, interval)
+    return series.head(len(series) - 1)
+
+
+class _Watch:
+    __slots__ = ("symbol", "state", "active", "seeded", "polled_at", "triggered_at", "last_signals")
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.state = IndicatorState(settings.WATCH_WINDOW)
+        self.active: Optional[Set[str]] = None  # None until the indicators are warmed up
+        self.seeded = False
+        self.polled_at = 0.0
+        self.triggered_at: Optional[float] = None
+        self.last_signals: List[str] = []
+
+
+class WatchEngine:
+    """Polls bars for the shared watchlist and starts a re-analysis when thresholds are crossed"""
+
+    def __init__(self, trigger: Callable[[str], Awaitable[Any]]):
+        self._trigger = trigger
+        self._watches: Dict[str, _Watch] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._events: deque = deque(maxlen=EVENT_HISTORY)
+        self._bars_total = 0
+        self._triggered_total = 0
+        self._suppressed_total = 0
+        self._failed_total = 0
+        self.interval = normalize_interval(settings.WATCH_INTERVAL)
+
+    # --- Watchlist ---
+
+    @staticmethod
+    def watchlist() -> List[str]:
+        stored = shared_cache.get_cache().get(WATCHLIST_KEY)
+        if stored is None:
+            stored = [s.strip().upper() for s in settings.WATCH_SYMBOLS.split(",") if s.strip()]
+        return list(stored)
+
+    def add(self, symbol: str) -> List[str]:
+        symbols = self.watchlist()
+        if symbol not in symbols:
+            if len(symbols) >= settings.WATCH_MAX_SYMBOLS:
+                raise ValueError(f"Watchlist is full ({settings.WATCH_MAX_SYMBOLS} symbols)")
+            symbols.append(symbol)
+            shared_cache.get_cache().set(WATCHLIST_KEY, symbols, WATCHLIST_TTL)
+        return symbols
+
+    def remove(self, symbol: str) -> List[str]:
+        symbols = [s for s in self.watchlist() if s != symbol]
+        shared_cache.get_cache().set(WATCHLIST_KEY, symbols, WATCHLIST_TTL)
+        self._watches.pop(symbol, None)
+        return symbols
+
+    # --- Bars and signals ---
+
+    def ingest(self, symbol: str, series: PriceSeries) -> List[str]:
+        """Advance a symbol's indicators over new closed bars; returns the signals that just fired"""
+        watch = self._watches.get(symbol)
+        if watch is None:
+            watch = self._watches[symbol] = _Watch(symbol)
+        fired: List[str] = []
+        state = watch.state
+        for i in range(len(series)):
+            ts = int(series.timestamps[i])
+            if state.last_ts is not None and ts <= state.last_ts:
+                continue
+            state.update(ts, float(series.close[i]), float(series.high[i]), float(series.low[i]), float(series.volume[i]))
+            self._bars_total += 1
+            active = conditions(state, settings.WATCH_RSI_HIGH, settings.WATCH_RSI_LOW,
+                                settings.WATCH_VOLATILITY_PCT, settings.WATCH_VWAP_DEVIATION_PCT)
+            if watch.active is None:
+                # The first warmed-up bar only sets the baseline
+                if state.ready():
+                    watch.active = active
+                continue
+            # Edge-triggered: a condition that stays true doesn't fire again
+            fired.extend(sorted(active - watch.active))
+            watch.active = active
+        return fired
+
+    def _seed(self, symbol: str) -> None:
+        # History to warm the indicators up; signals from these bars are not acted on
+        values = shared_bars(symbol, self.interval, settings.WATCH_WARMUP_BARS, self._poll_seconds())
+        if values is None:
+            return
+        self.ingest(symbol, closed_bars(values, self.interval))
+        watch = self._watches[symbol]
+        watch.seeded = True
+        watch.polled_at = time.time()
+
+    def _poll_symbol(self, symbol: str) -> List[str]:
+        watch = self._watches.get(symbol)
+        if watch is None or not watch.seeded:
+            self._seed(symbol)
+            return []
+        values = shared_bars(symbol, self.interval, POLL_OUTPUTSIZE, self._poll_seconds())
+        if values is None:
+            return []
+        watch.polled_at = time.time()
+        return self.ingest(symbol, closed_bars(values, self.interval))
+
+    def _poll_seconds(self) -> float:
+        return settings.WATCH_POLL_SECONDS or INTERVAL_SECONDS[self.interval]
+
+    # --- Triggering ---
+
+    async def _fire(self, symbol: str, signals: List[str]) -> None:
+        watch = self._watches[symbol]
+        watch.last_signals = signals
+        event = {"symbol": symbol, "signals": signals, "at": time.time(), "indicators": watch.state.snapshot()}
+        # One re-analysis per symbol per cooldown across all workers; after a successful run the lease is
+        # left to expire, after a failed one it is released so the next signal can try again
+        lease_key = f"watch:trigger:{symbol}"
+        token = await anyio.to_thread.run_sync(
+            shared_cache.get_cache().acquire_lease, lease_key, settings.WATCH_COOLDOWN_SECONDS
+        )
+        if not token:
+            self._suppressed_total += 1
+            event["analysis"] = "cooldown"
+            self._events.append(event)
+            return
+        self._triggered_total += 1
+        watch.triggered_at = event["at"]
+        event["analysis"] = "started"
+        self._events.append(event)
+        logger.info(f"[Watch] {symbol}: {', '.join(signals)} -> re-analysing")
+        task = asyncio.create_task(self._run_trigger(symbol, event, lease_key, token), name=f"watch-trigger-{symbol}")
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_trigger(self, symbol: str, event: Dict[str, Any], lease_key: str, token: str) -> None:
+        async with self._semaphore:
+            for attempt in range(1, TRIGGER_ATTEMPTS + 1):
+                try:
+                    await self._trigger(symbol)
+                    event["analysis"] = "completed"
+                    return
+                except admission.Overloaded as e:
+                    # Background runs are shed while the worker is busy; wait for a slot and try again
+                    if attempt == TRIGGER_ATTEMPTS:
+                        logger.warning(f"[Watch] Triggered analysis for {symbol} shed {attempt} times, giving up")
+                        event["analysis"] = "shed"
+                        break
+                    await asyncio.sleep(e.retry_after)
+                except Exception as e:
+                    logger.error(f"[Watch] Triggered analysis failed for {symbol}: {e}")
+                    event["analysis"] = "failed"
+                    break
+        # No analysis ran, so the signal shouldn't block the symbol for the whole cooldown
+        self._failed_total += 1
+        try:
+            await anyio.to_thread.run_sync(shared_cache.get_cache().release_lease, lease_key, token)
+        except Exception as e:
+            logger.warning(f"[Watch] Could not release the cooldown for {symbol}: {e}")
+
+    # --- Loop ---
+
+    def start(self) -> None:
+        if self._task is None:
+            self._semaphore = asyncio.Semaphore(settings.WATCH_CONCURRENCY)
+            self._task = asyncio.create_task(self._loop(), name="watch-engine")
+            logger.info(f"[Watch] Engine started ({self.interval} bars)")
+
+    async def stop(self) -> None:
+        tasks = [t for t in [self._task, *self._running] if t is not None]
+        self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_cycle(self) -> None:
+        symbols = await anyio.to_thread.run_sync(self.watchlist)
+        for symbol in set(self._watches) - set(symbols):
+            del self._watches[symbol]
+        # Least recently polled first, so a rate-limited cycle doesn't starve the tail of the list
+        symbols.sort(key=lambda s: self._watches[s].polled_at if s in self._watches else 0.0)
+        for symbol in symbols:
+            signals = await anyio.to_thread.run_sync(self._poll_symbol, symbol)
+            if signals:
+                await self._fire(symbol, signals)
+
+    async def _loop(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                await self.run_cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Watch] Cycle failed: {e}")
+            await asyncio.sleep(max(1.0, self._poll_seconds() - (time.monotonic() - started)))
+
+    def indicators(self, symbol: Optional[str] = None) -> Dict[str, Any]:
+        """Current indicator values for one symbol or every watched symbol"""
+        if symbol is not None:
+            watches = [self._watches[symbol]] if symbol in self._watches else []
+        else:
+            watches = list(self._watches.values())
+        return {
+            w.symbol: {**w.state.snapshot(), "active": sorted(w.active or []), "last_signals": w.last_signals,
+                       "triggered_at": w.triggered_at}
+            for w in watches
+        }
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "poll_seconds": self._poll_seconds(),
+            "symbols": len(self._watches),
+            "bars_total": self._bars_total,
+            "triggered_total": self._triggered_total,
+            "suppressed_total": self._suppressed_total,
+            "failed_total": self._failed_total,
+            "analyses_running": len(self._running),
+            "recent_events": list(self._events)[-20:],
+        }
@@ -0,0 +1,162 @@
+# In-process stand-in for the MongoDB collection used by the backend
+# Implements the small subset of the pymongo Collection API that the app touches,
+# so benchmarks can run without a database server.
+
+import copy
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id: Any):
+        self.inserted_id = inserted_id
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id: Any = None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+def _get(doc: Dict[str, Any], dotted: str) -> Any:
+    value: Any = doc
+    for part in dotted.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    for key, cond in (query or {}).items():
+        value = _get(doc, key)
+        if isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                if op == "$in" and value not in arg:
+                    return False
+                if op == "$nin" and value in arg:
+                    return False
+                if op == "$ne" and value == arg:
+                    return False
+                if op == "$exists" and (value is not None) != bool(arg):
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    try:
+                        if op == "$gt" and not value > arg:
+                            return False
+                        if op == "$gte" and not value >= arg:
+                            return False
+                        if op == "$lt" and not value < arg:
+                            return False
+                        if op == "$lte" and not value <= arg:
+                            return False
+                    except TypeError:
+                        # Like MongoDB, range operators only match values of a comparable type
+                        return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self._docs = docs
+
+    def sort(self, key, direction: int = 1) -> "FakeCursor":
+        keys: List[Tuple[str, int]] = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self._docs.sort(key=lambda d: (_get(d, field) is None, _get(d, field)), reverse=order < 0)
+        return self
+
+    def skip(self, n: int) -> "FakeCursor":
+        self._docs = self._docs[n:]
+        return self
+
+    def limit(self, n: int) -> "FakeCursor":
+        if n:
+            self._docs = self._docs[:n]
+        return self
+
+    def batch_size(self, n: int) -> "FakeCursor":
+        return self
+
+    def __iter__(self):
+        return iter(self._docs)
+
+    def close(self) -> None:
+        pass
+
+
+class FakeCollection:
+    """Thread-safe in-memory collection with a pymongo-like surface"""
+
+    def __init__(self, name: str = "analyses"):
+        self.name = name
+        self._docs: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _project(self, doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        doc = copy.deepcopy(doc)
+        if not projection:
+            return doc
+        include = {k for k, v in projection.items() if v and k != "_id"}
+        if include:
+            keep = include | ({"_id"} if projection.get("_id", 1) else set())
+            return {k: v for k, v in doc.items() if k in keep}
+        return {k: v for k, v in doc.items() if k not in projection}
+
+    def insert_one(self, doc: Dict[str, Any]) -> InsertOneResult:
+        with self._lock:
+            doc.setdefault("_id", ObjectId())
+            self._docs.append(copy.deepcopy(doc))
+        return InsertOneResult(doc["_id"])
+
+    def find_one(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+                 sort: Optional[List[Tuple[str, int]]] = None) -> Optional[Dict[str, Any]]:
+        docs = list(self.find(query, projection, sort=sort).limit(1))
+        return docs[0] if docs else None
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+             sort: Optional[List[Tuple[str, int]]] = None, **kwargs) -> FakeCursor:
+        with self._lock:
+            docs = [self._project(d, projection) for d in self._docs if _matches(d, query)]
+        cursor = FakeCursor(docs)
+        return cursor.sort(sort) if sort else cursor
+
+    def count_documents(self, query: Optional[Dict[str, Any]] = None) -> int:
+        with self._lock:
+            return sum(1 for d in self._docs if _matches(d, query))
+
+    def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        with self._lock:
+            for doc in self._docs:
+                if _matches(doc, query):
+                    doc.update(copy.deepcopy(update.get("$set", {})))
+                    return UpdateResult(1, 1)
+            if not upsert:
+                return UpdateResult(0, 0)
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            doc.update(copy.deepcopy(update.get("$setOnInsert", {})))
+            doc.update(copy.deepcopy(update.get("$set", {})))
+            doc.setdefault("_id", ObjectId())
+            self._docs.append(doc)
+            return UpdateResult(0, 0, doc["_id"])
+
+    def delete_one(self, query: Dict[str, Any]) -> None:
+        with self._lock:
+            for i, doc in enumerate(self._docs):
+                if _matches(doc, query):
+                    del self._docs[i]
+                    return
+
+    def delete_many(self, query: Dict[str, Any]) -> None:
+        with self._lock:
+            self._docs = [d for d in self._docs if not _matches(d, query)]
+
+    def create_index(self, keys: Iterable, **kwargs) -> str:
+        # Indexes are irrelevant for an in-memory list
+        return "fake_index"
@@ -0,0 +1,230 @@
+# Local stand-ins for the upstream APIs the agents talk to (TwelveData, Tavily, OpenAI)
+# Each fake runs a small threaded HTTP server with configurable latency and error rates,
+# and counts every call so the load test can report upstream traffic per route.
+
+import json
+import re
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class LatencyProfile:
+    """Latency and error distribution for one fake provider"""
+
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    def sample_delay(self) -> float:
+        # Gaussian jitter around the mean, never negative
+        delay = random.gauss(self.latency_ms, self.jitter_ms) if self.jitter_ms else self.latency_ms
+        return max(0.0, delay) / 1000.0
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class FakeUpstream:
+    """Threaded HTTP server that routes requests by path to a handler function"""
+
+    name = "upstream"
+
+    def __init__(self, profile: Optional[LatencyProfile] = None):
+        self.profile = profile or LatencyProfile()
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # Subclasses return (status, payload) for a path, query and JSON body
+    def routes(self) -> Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Tuple[int, Any]]]:
+        raise NotImplementedError
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeUpstream":
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                parsed = urlparse(self.path)
+                path = parsed.path.rstrip("/")
+                query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+                body: Dict[str, Any] = {}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    try:
+                        body = json.loads(self.rfile.read(length) or b"{}")
+                    except ValueError:
+                        body = {}
+                status, payload = upstream.dispatch(path, query, body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format, *args):
+                # Keep benchmark output readable
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"fake-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def dispatch(self, path: str, query: Dict[str, Any], body: Dict[str, Any]) -> Tuple[int, Any]:
+        with self._lock:
+            self.calls[path] += 1
+        time.sleep(self.profile.sample_delay())
+        if self.profile.should_fail():
+            with self._lock:
+                self.calls[f"{path} (error)"] += 1
+            return self.profile.error_status, {"error": "injected failure"}
+        handler = self.routes().get(path)
+        if handler is None:
+            return 404, {"error": f"unknown path {path}"}
+        return handler(query, body)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+
+# Bar spacing for intraday /time_series intervals (anything else is served as daily bars)
+INTRADAY_STEPS = {"1min": 60, "5min": 300, "15min": 900, "30min": 1800, "45min": 2700, "1h": 3600, "2h": 7200, "4h": 14400}
+
+
+class FakeTwelveData(FakeUpstream):
+    name = "twelvedata"
+
+    def routes(self):
+        return {"/price": self._price, "/time_series": self._time_series}
+
+    @staticmethod
+    def _base_price(symbol: str) -> float:
+        return 50.0 + (sum(ord(c) for c in symbol) % 400)
+
+    def _price(self, query, body):
+        symbol = query.get("symbol", "AAPL")
+        return 200, {"price": f"{self._base_price(symbol):.2f}"}
+
+    def _time_series(self, query, body):
+        symbol = query.get("symbol", "AAPL")
+        size = int(query.get("outputsize", 7))
+        interval = query.get("interval", "1day")
+        step = INTRADAY_STEPS.get(interval, 86400)
+        stamp_format = "%Y-%m-%d %H:%M:%S" if interval in INTRADAY_STEPS else "%Y-%m-%d"
+        base = self._base_price(symbol)
+        values = []
+        for i in range(size):
+            close = base * (1 + 0.004 * ((i * 7) % 5 - 2))
+            values.append({
+                "datetime": time.strftime(stamp_format, time.gmtime(time.time() - i * step)),
+                "open": f"{close * 0.99:.2f}",
+                "high": f"{close * 1.01:.2f}",
+                "low": f"{close * 0.98:.2f}",
+                "close": f"{close:.2f}",
+                "volume": str(1_000_000 + i * 1000),
+            })
+        return 200, {"meta": {"symbol": symbol, "interval": interval}, "values": values, "status": "ok"}
+
+
+class FakeTavily(FakeUpstream):
+    name = "tavily"
+
+    def routes(self):
+        return {"/search": self._search, "/extract": self._extract}
+
+    def _search(self, query, body):
+        text = body.get("query", "")
+        ticker = text.split(" ")[0] if text else "TICK"
+        count = int(body.get("max_results", 5))
+        results = []
+        for i in range(count):
+            results.append({
+                "title": f"{ticker} shares move after earnings update #{i}",
+                "url": f"https://news.example.com/{ticker.lower()}/{abs(hash(text)) % 10_000}/{i}",
+                "content": f"{ticker} stock reported strong revenue growth of 12% as earnings beat estimates. " * 3,
+                "raw_content": ("Full article body about earnings, revenue and outlook. " * 40) if body.get("include_raw_content") else None,
+                "score": round(0.9 - i * 0.05, 2),
+            })
+        payload = {"query": text, "results": results}
+        if body.get("include_answer"):
+            payload["answer"] = f"{ticker} trades with solid fundamentals and growing revenue."
+            payload["follow_up_questions"] = [f"What is {ticker}'s P/E ratio?"]
+        return 200, payload
+
+    def _extract(self, query, body):
+        results = []
+        for url in body.get("urls", []):
+            results.append({
+                "url": url,
+                "title": "Extracted article",
+                "content": 'Revenue rose to $12.5 billion in revenue. "Our outlook remains strong," the CEO said. ' * 30,
+            })
+        return 200, {"results": results, "failed_results": []}
+
+
+class FakeOpenAI(FakeUpstream):
+    name = "openai"
+
+    def routes(self):
+        return {"/chat/completions": self._chat}
+
+    def _chat(self, query, body):
+        messages = body.get("messages", [])
+        system = messages[0].get("content", "").lower() if messages else ""
+        if "sentiment" in system:
+            # Per-article scores: micro-batched items ("### <id>"), numbered articles, or a single article
+            user = messages[-1].get("content", "") if messages else ""
+            score = {"score": 0.4, "confidence": 0.72}
+            item_ids = re.findall(r"^### (\S+)", user, re.MULTILINE)
+            numbers = re.findall(r"^\[(\d+)\]", user, re.MULTILINE)
+            if item_ids:
+                content = json.dumps({item_id: score for item_id in item_ids})
+            elif numbers:
+                content = json.dumps({number: score for number in numbers})
+            else:
+                content = json.dumps(score)
+        elif "trend" in system:
+            content = json.dumps({
+                "direction": "Uptrend", "strength": "Moderate", "confidence": 0.66, "risk": "Medium",
+                "timeframe": "1 week", "keyFactors": ["higher closes"], "summary": "Prices drifted higher.",
+            })
+        elif "advisor" in system:
+            content = json.dumps({
+                "recommendation": "Hold", "confidence": 0.6, "reasoning": "Mixed signals.",
+                "keyFactors": ["sentiment", "trend"], "riskLevel": "Medium", "timeHorizon": "Medium-term",
+            })
+        else:
+            content = "This is a benchmark summary paragraph. " * 10
+        return 200, {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+        }
@@ -0,0 +1,66 @@
+# Micro-benchmark for the watchlist indicator engine
+# Feeds random-walk bars for a few thousand symbols through IndicatorState.update plus the
+# threshold check, one bar per symbol per round, as the watch engine does on each poll, and
+# reports the cost per bar and per full sweep of the watchlist.
+#
+# Usage (from the project root):
+#   python -m benchmarks.indicator_updates --symbols 5000 --bars 200
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict
+
+from backend.services.indicators import IndicatorState, conditions
+
+
+def run(symbols: int, bars: int, window: int, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    states = [IndicatorState(window) for _ in range(symbols)]
+    closes = [rng.uniform(10, 500) for _ in range(symbols)]
+    sweeps = []
+    signals = 0
+    for bar in range(bars):
+        # Prices are generated up front so only the indicator work is timed
+        ticks = []
+        for i in range(symbols):
+            closes[i] *= 1 + rng.gauss(0, 0.01)
+            ticks.append((closes[i], closes[i] * 1.005, closes[i] * 0.995, rng.uniform(1e4, 1e6)))
+        t0 = time.perf_counter()
+        for state, (close, high, low, volume) in zip(states, ticks):
+            state.update(bar, close, high, low, volume)
+            signals += len(conditions(state, 70, 30, 1.5, 2.5))
+        sweeps.append(time.perf_counter() - t0)
+    total = sum(sweeps)
+    sweeps.sort()
+    return {
+        "symbols": symbols,
+        "bars_per_symbol": bars,
+        "updates": symbols * bars,
+        "us_per_update": round(total / (symbols * bars) * 1e6, 3),
+        "sweep_ms_median": round(sweeps[len(sweeps) // 2] * 1000, 2),
+        "sweep_ms_max": round(sweeps[-1] * 1000, 2),
+        "active_conditions": signals,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="EchoMarket incremental indicator benchmark")
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--bars", type=int, default=200, help="bars fed to every symbol")
+    parser.add_argument("--window", type=int, default=20, help="rolling volatility / VWAP window")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    result = run(args.symbols, args.bars, args.window)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:<18} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
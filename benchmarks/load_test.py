@@ -0,0 +1,218 @@
+# End-to-end load test for the analysis routes
+# Starts local fakes for TwelveData, Tavily and OpenAI, swaps MongoDB for an in-memory
+# collection, serves the real FastAPI app with uvicorn and drives it at a fixed concurrency.
+#
+# Usage (from the project root):
+#   python -m benchmarks.load_test --requests 40 --concurrency 8
+#   python -m benchmarks.load_test --routes ui --latency openai=800:200 --error-rate tavily=0.05
+
+import argparse
+import json
+import math
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import requests
+
+from benchmarks.fake_upstreams import FakeOpenAI, FakeTavily, FakeTwelveData, LatencyProfile
+
+# Route name -> (method, path template, JSON body builder)
+ROUTES = {
+    "analyze": ("POST", "/analyze", lambda t: {"ticker": t}),
+    "ui": ("GET", "/ui/analyze/{ticker}", None),
+    "query": ("POST", "/query", lambda t: {"ticker": t}),
+}
+
+DEFAULT_LATENCY = {"twelvedata": "40:10", "tavily": "150:40", "openai": "400:100"}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    # Nearest-rank percentile on an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _parse_pairs(values: List[str]) -> Dict[str, str]:
+    pairs = {}
+    for value in values or []:
+        name, _, setting = value.partition("=")
+        pairs[name.strip().lower()] = setting.strip()
+    return pairs
+
+
+def build_profiles(args) -> Dict[str, LatencyProfile]:
+    latency = {**DEFAULT_LATENCY, **_parse_pairs(args.latency)}
+    errors = _parse_pairs(args.error_rate)
+    profiles = {}
+    for name in ("twelvedata", "tavily", "openai"):
+        mean, _, jitter = latency[name].partition(":")
+        profiles[name] = LatencyProfile(
+            latency_ms=float(mean or 0) * args.latency_scale,
+            jitter_ms=float(jitter or 0) * args.latency_scale,
+            error_rate=float(errors.get(name, 0.0)),
+        )
+    return profiles
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(fakes: Dict[str, Any], cache_backend: str = "none"):
+    # Settings are read at import time, so point the backend at the fakes first
+    os.environ.update({
+        "OPENAI_API_KEY": "bench-key",
+        "TWELVE_DATA_API_KEY": "bench-key",
+        "TAVILY_API_KEY": "bench-key",
+        "OPENAI_API_BASE": fakes["openai"].base_url,
+        "TWELVE_DATA_BASE_URL": fakes["twelvedata"].base_url,
+        "TAVILY_BASE_URL": fakes["tavily"].base_url,
+        "MONGODB_URI": "mongodb://127.0.0.1:1",
+        "MONGO_DB_NAME": "echomarket_bench",
+        "MONGO_COLLECTION": "analyses",
+        "SHARED_CACHE_BACKEND": cache_backend,
+        # Background work would skew the measurements, and the fake collection doesn't support job claims
+        "PREWARM_ENABLED": "false",
+        "JOBS_ENABLED": "false",
+        "WATCH_ENABLED": "false",
+        "SHARED_CACHE_PATH": os.path.join(tempfile.mkdtemp(prefix="echomarket-bench-"), "cache.sqlite3"),
+    })
+    import uvicorn
+    from benchmarks.fake_mongo import FakeCollection
+    import backend.main as main
+    import backend.agents.logger as agent_logger
+
+    collection = FakeCollection()
+    main.mongo = collection
+    agent_logger.mongo = collection
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    deadline = time.time() + 15
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("uvicorn did not start within 15s")
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def run_route(base_url: str, route: str, tickers: List[str], total: int, concurrency: int, timeout: float,
+              depth: str = "deep") -> Dict[str, Any]:
+    method, template, body_for = ROUTES[route]
+    local = threading.local()
+
+    def one(i: int) -> Tuple[float, bool]:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        ticker = tickers[i % len(tickers)]
+        url = base_url + template.format(ticker=ticker)
+        start = time.perf_counter()
+        try:
+            if method == "POST":
+                resp = session.post(url, json={**body_for(ticker), "depth": depth}, timeout=timeout)
+            else:
+                resp = session.get(url, params={"depth": depth}, timeout=timeout)
+            ok = resp.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r[0] for r in results)
+    errors = sum(1 for r in results if not r[1])
+    return {
+        "route": route,
+        "requests": total,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(total / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+    }
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = f"{'route':<8} {'reqs':>5} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  upstream calls"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        calls = ", ".join(f"{k}={v}" for k, v in sorted(r["upstream_calls"].items())) or "none"
+        print(f"{r['route']:<8} {r['requests']:>5} {r['errors']:>4} {r['throughput_rps']:>8} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}  {calls}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="EchoMarket end-to-end load test against local provider fakes")
+    parser.add_argument("--routes", default="analyze,ui,query", help="comma-separated subset of: " + ", ".join(ROUTES))
+    parser.add_argument("--requests", type=int, default=20, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tickers", default="AAPL,MSFT,NVDA,AMZN,TSLA")
+    parser.add_argument("--latency", action="append", metavar="PROVIDER=MEAN[:JITTER]",
+                        help="per-provider latency in ms (twelvedata, tavily, openai)")
+    parser.add_argument("--error-rate", action="append", metavar="PROVIDER=RATE",
+                        help="fraction of upstream calls that fail with HTTP 500")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply every configured latency")
+    parser.add_argument("--timeout", type=float, default=300.0, help="client timeout per request in seconds")
+    parser.add_argument("--shared-cache", default="none", choices=["none", "sqlite"],
+                        help="shared analysis cache backend (none measures the raw pipeline)")
+    parser.add_argument("--depth", default="deep", choices=["quick", "standard", "deep"],
+                        help="analysis depth requested from every route")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = [r for r in routes if r not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+
+    profiles = build_profiles(args)
+    fakes = {
+        "twelvedata": FakeTwelveData(profiles["twelvedata"]).start(),
+        "tavily": FakeTavily(profiles["tavily"]).start(),
+        "openai": FakeOpenAI(profiles["openai"]).start(),
+    }
+    server, base_url = start_app(fakes, args.shared_cache)
+    results = []
+    try:
+        for route in routes:
+            for fake in fakes.values():
+                fake.reset()
+            result = run_route(base_url, route, tickers, args.requests, args.concurrency, args.timeout, args.depth)
+            result["upstream_calls"] = {
+                f"{name}{path}": count for name, fake in fakes.items() for path, count in fake.calls.items()
+            }
+            results.append(result)
+    finally:
+        server.should_exit = True
+        for fake in fakes.values():
+            fake.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    return 0 if all(r["errors"] == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# Memory per in-flight analysis: article bodies in the graph state vs. in a blob arena
+# Builds Tavily-sized news payloads (SEARCH snippets, CRAWL pages with raw content, EXTRACT full
+# text) for a number of concurrent analyses and pushes each state through the pipeline's seven
+# steps. At every step the state is re-validated the way GraphState's fields are (a new list and,
+# for dict items, a new dict per item). Reports, per analysis:
+#   - state_kb: what every step re-validates and merges (the state's containers and payloads)
+#   - peak_kb: peak traced memory while the analyses are in flight
+#   - retained_kb: memory still held once the results are built (what gets cached and stored)
+#
+# Usage (from the project root):
+#   python -m benchmarks.state_memory --analyses 50
+
+import argparse
+import json
+import random
+import string
+import sys
+import tracemalloc
+from typing import Any, Dict, List
+
+from backend.services import blob_arena
+from backend.services.news_items import NewsItem, extracted_dicts, news_dicts, stash_extracted
+
+STEPS = 7
+
+
+def _text(rng: random.Random, chars: int) -> str:
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(chars // 6)]
+    return " ".join(words)[:chars]
+
+
+def tavily_payload(rng: random.Random, page_kb: int, extract_kb: int) -> Dict[str, Any]:
+    """Results as the news agent receives them: 6 SEARCH, 4 CRAWL (with raw pages), 3 EXTRACT"""
+    search = [{"title": _text(rng, 60), "url": f"https://news.example/{rng.random()}", "snippet": _text(rng, 200),
+               "raw_content": "", "score": rng.random(), "source": "tavily_basic"} for _ in range(6)]
+    crawl = [{"title": _text(rng, 60), "url": f"https://wire.example/{rng.random()}", "snippet": _text(rng, 200),
+              "raw_content": _text(rng, page_kb * 1024), "score": rng.random(), "source": "tavily_advanced"}
+             for _ in range(4)]
+    extracted = [{"url": item["url"], "title": item["title"], "content": _text(rng, extract_kb * 1024),
+                  "word_count": extract_kb * 170, "financial_figures": [], "key_quotes": [], "source": "tavily_extract"}
+                 for item in search[:3]]
+    for item in search + crawl:
+        item["overall_score"] = rng.uniform(0, 100)
+    return {"news": (crawl + search)[:8], "extracted_content": extracted,
+            "structured_data": {"answer": _text(rng, 400), "sources": []}}
+
+
+def initial_state(payload: Dict[str, Any], use_arena: bool) -> Dict[str, Any]:
+    state: Dict[str, Any] = {"ticker": "BENCH", "arena_id": blob_arena.open_arena() if use_arena else None}
+    if use_arena:
+        state["news"] = [NewsItem.from_dict(item, state) for item in payload["news"]]
+        state["extracted_content"] = stash_extracted(state, payload["extracted_content"])
+    else:
+        state["news"] = payload["news"]
+        state["extracted_content"] = payload["extracted_content"]
+    state["structured_data"] = payload["structured_data"]
+    return state
+
+
+def validate(state: Dict[str, Any]) -> Dict[str, Any]:
+    # What validating List[Dict] / List[Any] / Dict fields does between steps: new containers, shared values
+    copied = dict(state)
+    copied["news"] = [dict(item) if isinstance(item, dict) else item for item in state["news"]]
+    copied["extracted_content"] = [dict(item) for item in state["extracted_content"]]
+    copied["structured_data"] = dict(state["structured_data"])
+    return copied
+
+
+def deep_size(value: Any, seen=None) -> int:
+    seen = seen if seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(deep_size(v, seen) for v in value)
+    elif hasattr(value, "__slots__"):
+        size += sum(deep_size(getattr(value, s), seen) for s in value.__slots__ if hasattr(value, s))
+    return size
+
+
+def final_result(state: Dict[str, Any], use_arena: bool) -> Dict[str, Any]:
+    result = {
+        "ticker": state["ticker"],
+        "news": news_dicts(state["news"]),
+        "extracted_content": extracted_dicts(state, state["extracted_content"]) if use_arena else state["extracted_content"],
+        "structured_data": state["structured_data"],
+    }
+    blob_arena.close_arena(state["arena_id"])
+    return result
+
+
+def run(analyses: int, page_kb: int, extract_kb: int, use_arena: bool, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    states: List[Dict[str, Any]] = [initial_state(tavily_payload(rng, page_kb, extract_kb), use_arena)
+                                    for _ in range(analyses)]
+    state_bytes = deep_size(states[0]["news"]) + deep_size(states[0]["extracted_content"])
+    # All analyses in flight at once, one step at a time
+    for _ in range(STEPS):
+        states = [validate(state) for state in states]
+    results = [final_result(state, use_arena) for state in states]
+    del states
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "layout": "blob arena + NewsItem" if use_arena else "bodies in state",
+        "analyses": analyses,
+        "state_kb": round(state_bytes / 1024, 1),
+        "peak_kb": round((peak - base) / analyses / 1024, 1),
+        "retained_kb": round((retained - base) / analyses / 1024, 1),
+        "result_json_kb": round(len(json.dumps(results[0])) / 1024, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="EchoMarket graph state memory benchmark")
+    parser.add_argument("--analyses", type=int, default=50, help="analyses in flight at once")
+    parser.add_argument("--page-kb", type=int, default=40, help="raw content per crawled page")
+    parser.add_argument("--extract-kb", type=int, default=15, help="full text per extracted article")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    results = [run(args.analyses, args.page_kb, args.extract_kb, use_arena) for use_arena in (False, True)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(result.pop("layout"))
+            for key, value in result.items():
+                print(f"  {key:<15} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+# Micro-benchmark for ticker autocomplete
+# Builds a symbol index from a full-exchange sized listing (a synthetic one by default, or a real
+# CSV with symbol,name,exchange,aliases columns) and times SymbolIndex.suggest for every prefix
+# of a set of queries, i.e. one call per simulated keystroke.
+#
+# Usage (from the project root):
+#   python -m benchmarks.symbol_suggest --symbols 10000
+#   python -m benchmarks.symbol_suggest --listing nasdaq_listed.csv --json
+
+import argparse
+import json
+import math
+import random
+import string
+import time
+from typing import Any, Dict, List
+
+from backend.services.symbols import DEFAULT_LISTING, SymbolIndex
+
+_WORDS = [
+    "american", "global", "first", "united", "pacific", "national", "energy", "financial", "capital",
+    "health", "medical", "bio", "pharma", "therapeutics", "systems", "software", "networks", "digital",
+    "semiconductor", "resources", "mining", "gold", "oil", "gas", "realty", "trust", "bank", "bancorp",
+    "insurance", "foods", "brands", "retail", "motors", "aerospace", "industries", "technologies",
+    "solutions", "communications", "media", "entertainment", "logistics", "airlines", "water", "power",
+    "solar", "materials", "chemical", "steel", "genomics", "devices", "labs", "partners", "ventures",
+]
+_SUFFIXES = ["Inc.", "Corp.", "Holdings Inc.", "Group", "Ltd.", "Co.", "plc", ""]
+_EXCHANGES = ["NASDAQ", "NYSE", "NYSE American"]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    # Nearest-rank percentile, as in load_test (kept local so this runs without `requests`)
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def synthetic_index(count: int, seed: int = 7) -> SymbolIndex:
+    """Index of `count` made-up listings with realistic ticker and name shapes"""
+    rng = random.Random(seed)
+    index = SymbolIndex()
+    used = set()
+    while len(index) < count:
+        symbol = "".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(1, 5)))
+        if symbol in used:
+            continue
+        used.add(symbol)
+        words = [w.title() for w in rng.sample(_WORDS, rng.randint(1, 3))]
+        name = " ".join(words + [rng.choice(_SUFFIXES)]).strip()
+        index.add(symbol, name, rng.choice(_EXCHANGES))
+    return index
+
+
+def keystrokes(queries: List[str]) -> List[str]:
+    return [q[:i] for q in queries for i in range(1, len(q) + 1)]
+
+
+def run(index: SymbolIndex, queries: List[str], limit: int, repeat: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    index.suggest("warm-up", limit)  # builds the prefix arrays
+    build_ms = (time.perf_counter() - started) * 1000
+    prefixes = keystrokes(queries)
+    timings = []
+    empty = 0
+    for _ in range(repeat):
+        for prefix in prefixes:
+            t0 = time.perf_counter()
+            results = index.suggest(prefix, limit)
+            timings.append((time.perf_counter() - t0) * 1e6)
+            empty += not results
+    timings.sort()
+    return {
+        "symbols": len(index),
+        "build_ms": round(build_ms, 1),
+        "calls": len(timings),
+        "empty_results": empty,
+        "mean_us": round(sum(timings) / len(timings), 2),
+        "p50_us": round(percentile(timings, 50), 2),
+        "p95_us": round(percentile(timings, 95), 2),
+        "p99_us": round(percentile(timings, 99), 2),
+        "max_us": round(timings[-1], 2),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="EchoMarket ticker autocomplete benchmark")
+    parser.add_argument("--symbols", type=int, default=10000, help="size of the synthetic listing")
+    parser.add_argument("--listing", help="benchmark a real listing CSV instead of a synthetic one")
+    parser.add_argument("--queries", default="a,aa,aapl,apple,general motors,nvda,bank,solar power,zz,brk.b",
+                        help="comma-separated queries, each typed one character at a time")
+    parser.add_argument("--limit", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    if args.listing:
+        index = SymbolIndex()
+        index.load_csv(args.listing)
+    else:
+        index = synthetic_index(args.symbols)
+        # Keep the real popular names in so the sample queries have true hits
+        index.load_csv(DEFAULT_LISTING)
+    result = run(index, [q for q in args.queries.split(",") if q], args.limit, args.repeat)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:<14} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,11 +2,13 @@
 // Input field where users can type company names or ticker symbols.
 
 import React from "react";
-import { useRef, useEffect } from "react";
+import { useRef, useEffect, useState } from "react";
 import { Input } from "@/components/ui/input";
 import { Button } from "@/components/ui/button";
 import { Loader2 } from "lucide-react";
 
+type Suggestion = { ticker: string; name: string; exchange: string };
+
 type SearchBarProps = {
   symbol: string;
   onSymbolChange: (value: string) => void;
@@ -21,6 +23,32 @@ const SearchBar: React.FC<SearchBarProps> = ({
   loading = false,
 }) => {
   const inputRef = useRef<HTMLInputElement>(null);
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
+  const apiUrl = import.meta.env.VITE_API_URL;
+
+  // Fetch ticker suggestions as the user types (debounced, stale replies are dropped)
+  useEffect(() => {
+    const query = symbol.trim();
+    if (!query || loading) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const res = await fetch(`${apiUrl}/symbols/suggest?q=${encodeURIComponent(query)}&limit=8`, {
+          signal: controller.signal,
+        });
+        if (res.ok) setSuggestions((await res.json()).suggestions || []);
+      } catch {
+        // Aborted or offline: keep whatever is shown
+      }
+    }, 120);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [symbol, loading, apiUrl]);
 
   // Auto-focus the input when component loads and after analysis finishes
   useEffect(() => {
@@ -36,6 +64,7 @@ const SearchBar: React.FC<SearchBarProps> = ({
         type="text"
         value={symbol}
         autoComplete="off"    
+        list="symbol-suggestions"
         spellCheck={false}  
         onChange={(e) => {
           console.log("💡 Triggering onSymbolChange with:", e.target.value);
@@ -59,6 +88,13 @@ const SearchBar: React.FC<SearchBarProps> = ({
         className="sm:w-96"
         disabled={loading}   
       />
+      <datalist id="symbol-suggestions">
+        {suggestions.map((s) => (
+          <option key={s.ticker} value={s.ticker}>
+            {s.name}{s.exchange ? ` (${s.exchange})` : ""}
+          </option>
+        ))}
+      </datalist>
       <Button
         onClick={() => {
           console.log("💥 Analyze button clicked");
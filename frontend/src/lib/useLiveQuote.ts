@@ -0,0 +1,43 @@
+// Live Quote Hook
+// Subscribes to the backend's /ws/quotes feed for one symbol and returns the latest price.
+// Reconnects with a short delay if the socket drops; returns undefined until a quote arrives.
+
+import { useEffect, useState } from "react";
+
+type QuoteMessage = { type: string; symbol?: string; price?: number; ts?: number };
+
+export function useLiveQuote(symbol: string | undefined): number | undefined {
+  const [price, setPrice] = useState<number | undefined>(undefined);
+
+  useEffect(() => {
+    setPrice(undefined);
+    if (!symbol) return;
+    const apiUrl: string = import.meta.env.VITE_API_URL || window.location.origin;
+    const wsUrl = `${apiUrl.replace(/^http/, "ws")}/ws/quotes?symbols=${encodeURIComponent(symbol)}`;
+    let socket: WebSocket | null = null;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+
+    const connect = () => {
+      socket = new WebSocket(wsUrl);
+      socket.onmessage = (event) => {
+        const message: QuoteMessage = JSON.parse(event.data);
+        if (message.type === "quote" && message.symbol === symbol && typeof message.price === "number") {
+          setPrice(message.price);
+        }
+      };
+      socket.onclose = () => {
+        if (!closed) retry = setTimeout(connect, 5000);
+      };
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      if (retry) clearTimeout(retry);
+      socket?.close();
+    };
+  }, [symbol]);
+
+  return price;
+}
@@ -18,6 +18,7 @@ import ExportActions from "@/components/ui/ExportActions";
 import { TrendAnalysisSection } from "@/components/ui/TrendAnalysisSection";
 import Loader from "@/components/ui/Loader";
 import { PriceStats } from "@/components/ui/PriceStats";
+import { useLiveQuote } from "@/lib/useLiveQuote";
 
 // Quick lookup for common company names - saves API calls for popular stocks
 const tickerMap: Record<string, string> = {
@@ -159,7 +160,11 @@ const Home: React.FC = () => {
   console.log("Fetched analysis data:", data);
   console.log("Price in UI:", data?.price, typeof data?.price);
 
-  const lastPrice = (typeof data?.price === 'number' && isFinite(data.price) && data.price > 0)
+  // Prefer the live quote (pushed over /ws/quotes) over the price from the last analysis run
+  const liveQuote = useLiveQuote(data?.symbol);
+  const lastPrice = (typeof liveQuote === 'number' && liveQuote > 0)
+    ? liveQuote
+    : (typeof data?.price === 'number' && isFinite(data.price) && data.price > 0)
     ? data.price
     : undefined;
   // let lastPriceRaw = (typeof data?.price === 'number' && data.price > 0) ? data.price : undefined;
@@ -0,0 +1,63 @@
+# Shared test setup
+# Settings are read from the environment when backend.config is imported, so the test values are
+# set before anything from the backend is loaded. No test talks to a real upstream or MongoDB.
+
+import os
+import tempfile
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB_NAME", "echomarket_test")
+os.environ.setdefault("MONGO_COLLECTION", "analyses")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="echomarket-tests-"))
+os.environ.setdefault("SHARED_CACHE_BACKEND", "none")
+
+import pytest
+from backend.services import circuit_breaker, rate_limiter, shared_cache
+from tests.helpers import sample_result
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """A fresh SQLite shared cache, used by everything that calls shared_cache.get_cache()"""
+    instance = shared_cache.SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(shared_cache, "_cache", instance)
+    return instance
+
+
+@pytest.fixture(autouse=True)
+def fresh_registries(monkeypatch):
+    """Process-wide breakers and token buckets start empty in every test"""
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(rate_limiter, "_buckets", {})
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """In-memory analysis collection in place of the app's MongoDB"""
+    import mongomock
+    from backend import main
+    collection = mongomock.MongoClient()["echomarket_test"]["analyses"]
+    monkeypatch.setattr(main, "mongo", collection)
+    return collection
+
+
+@pytest.fixture
+def pipeline(cache, mongo, monkeypatch):
+    """Stand-in for the analysis graph; returns the (ticker, priority, depth) of every run"""
+    from backend import main
+    calls = []
+
+    def invoke_pipeline(ticker, priority="default", depth="deep"):
+        calls.append((ticker, priority, depth))
+        return sample_result(ticker, depth)
+
+    monkeypatch.setattr(main, "invoke_pipeline", invoke_pipeline)
+    return calls
+
+
+@pytest.fixture
+def client(pipeline):
+    """Test client for the app; lifespan tasks (pre-warm, watch, job runners) are not started"""
+    from fastapi.testclient import TestClient
+    from backend import main
+    return TestClient(main.app)
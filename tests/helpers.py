@@ -0,0 +1,23 @@
+import time
+from typing import Any, Callable, Dict
+
+
+def sample_result(ticker: str = "AAPL", depth: str = "deep") -> Dict[str, Any]:
+    """A finished analysis in the shape invoke_pipeline returns"""
+    return {
+        "ticker": ticker, "depth": depth, "price": 190.5, "prices": {"2024-06-06": 189.0, "2024-06-07": 190.5},
+        "sentiment": "Bullish", "confidence": 0.7, "article_sentiments": [], "summary": "Steady gains.",
+        "trend": {"direction": "Uptrend", "strength": "Moderate"}, "recommendation": "Buy", "insight": "Momentum.",
+        "news": [{"title": "Apple beats estimates", "url": "https://news.example.com/1", "snippet": "Revenue up."}],
+        "extracted_content": [], "indicators": {"rsi": 61.2},
+    }
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 3.0) -> bool:
+    """Poll `condition` until it holds (True) or `timeout` seconds pass (False)"""
+    give_up_at = time.time() + timeout
+    while time.time() < give_up_at:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
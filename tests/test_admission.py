@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+from backend import main
+from backend.config import settings
+from backend.services import admission
+from backend.services.admission import AdmissionController, Overloaded
+from tests.helpers import sample_result
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_IN_FLIGHT", 1)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT", 1.0)
+
+
+async def hold(controller, priority, release, order, name):
+    async with controller.admit(priority):
+        order.append(name)
+        await release.wait()
+
+
+def test_runs_within_the_limit_are_admitted_at_once(limits):
+    controller = AdmissionController()
+
+    async def scenario():
+        async with controller.admit():
+            assert controller.stats()["in_flight"] == 1
+        assert controller.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+    assert controller.stats()["admitted_total"] == 1
+
+
+def test_waiters_get_the_slot_interactive_first(limits):
+    controller = AdmissionController()
+    order = []
+
+    async def scenario():
+        release = asyncio.Event()
+        first = asyncio.create_task(hold(controller, "default", release, order, "first"))
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(hold(controller, "default", release, order, "default")),
+                   asyncio.create_task(hold(controller, "interactive", release, order, "interactive"))]
+        await asyncio.sleep(0.01)
+        assert controller.stats()["queued"] == {"interactive": 1, "default": 1}
+        release.set()
+        await asyncio.gather(first, *waiting)
+
+    asyncio.run(scenario())
+    assert order == ["first", "interactive", "default"]
+    stats = controller.stats()
+    assert stats["in_flight"] == 0 and stats["queued_total"] == 2
+
+
+def test_background_work_never_queues(limits):
+    controller = AdmissionController()
+
+    async def scenario():
+        release = asyncio.Event()
+        running = asyncio.create_task(hold(controller, "default", release, [], "run"))
+        await asyncio.sleep(0)
+        for priority in ("background", "batch"):
+            with pytest.raises(Overloaded) as shed:
+                async with controller.admit(priority):
+                    pass
+            assert shed.value.status_code == 429 and "Retry-After" in shed.value.headers
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+    assert controller.stats()["shed_background"] == 2
+
+
+def test_full_queue_and_wait_timeout_are_shed(limits, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT", 0.05)
+    controller = AdmissionController()
+
+    async def scenario():
+        release = asyncio.Event()
+        running = asyncio.create_task(hold(controller, "default", release, [], "run"))
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(hold(controller, "default", release, [], f"w{i}")) for i in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded, match="queue is full"):
+            async with controller.admit("interactive"):
+                pass
+        results = await asyncio.gather(*waiting, return_exceptions=True)
+        assert all(isinstance(r, Overloaded) and "timed out" in r.detail for r in results)
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+    stats = controller.stats()
+    assert stats["rejected_queue_full"] == 1 and stats["rejected_queue_timeout"] == 2
+    assert stats["in_flight"] == 0 and stats["queued"] == {"interactive": 0, "default": 0}
+
+
+def test_a_cancelled_waiter_passes_its_slot_on(limits):
+    controller = AdmissionController()
+    order = []
+
+    async def scenario():
+        release = asyncio.Event()
+        first = asyncio.create_task(hold(controller, "default", release, order, "first"))
+        await asyncio.sleep(0)
+        gone = asyncio.create_task(hold(controller, "interactive", release, order, "gone"))
+        last = asyncio.create_task(hold(controller, "default", release, order, "last"))
+        await asyncio.sleep(0.01)
+        gone.cancel()
+        release.set()
+        await asyncio.gather(first, last, gone, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert order == ["first", "last"]
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_retry_after_grows_with_the_queue(limits, monkeypatch):
+    controller = AdmissionController()
+    assert controller.retry_after() == int(admission.RUN_SECONDS_PRIOR)
+    controller._queues["default"].extend([None, None])
+    assert controller.retry_after() == 3 * int(admission.RUN_SECONDS_PRIOR)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_IN_FLIGHT", 0)
+    controller._queues["default"].extend([None] * 100)
+    assert controller.retry_after() == admission.MAX_RETRY_AFTER
+
+
+def test_a_busy_worker_answers_429_but_still_serves_cached_results(client, pipeline, cache, limits, monkeypatch):
+    controller = AdmissionController()
+    controller._in_flight = 1
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_SIZE", 0)
+    monkeypatch.setattr(main, "admission_controller", controller)
+    response = client.get("/analyze/AAPL")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert pipeline == []
+    cache.set(main.analysis_key("MSFT"), sample_result("MSFT"), 600)
+    assert client.get("/analyze/MSFT").status_code == 200
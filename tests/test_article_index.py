@@ -0,0 +1,131 @@
+import time
+import pytest
+from backend.config import settings
+from backend.services import article_index, symbols
+from backend.services.article_index import article_key, ticker_key
+
+
+@pytest.fixture(autouse=True)
+def index(monkeypatch):
+    listing = symbols.SymbolIndex()
+    listing.add("NVDA", "NVIDIA Corporation", "NASDAQ", ["Nvidia"])
+    listing.add("AMD", "Advanced Micro Devices Inc.", "NASDAQ", ["AMD", "Advanced Micro Devices"])
+    listing.add("INTC", "Intel Corporation", "NASDAQ", ["Intel"])
+    listing.add("ALL", "Allstate Corp", "NYSE")
+    listing.add("KEY", "KeyCorp", "NYSE")
+    monkeypatch.setattr(symbols, "_index", listing)
+    return listing
+
+
+def stat(name):
+    return article_index.index_stats()[name]
+
+
+def article(n, title="Chip stocks rally", snippet="Shares rose.", **extra):
+    return {"title": title, "url": f"https://news.example.com/{n}", "snippet": snippet, "score": 0.8, **extra}
+
+
+def set_fetched(cache, ticker, feature, at):
+    cache.set(ticker_key(ticker), {"articles": {}, "fetched": {feature: at}}, 3600)
+
+
+def test_mentions_come_from_tags_and_company_names():
+    found = article_index.mentioned("Nvidia and Advanced Micro Devices gain; $INTC slips (NYSE: KEY) flat")
+    assert found == {"NVDA": "NVIDIA Corporation", "AMD": "Advanced Micro Devices Inc.", "INTC": "Intel Corporation",
+                     "KEY": "KeyCorp"}
+
+
+def test_bare_capitals_are_not_taken_for_tickers():
+    assert article_index.mentioned("ALL EYES ON THE KEY NUMBERS as markets open") == {}
+    assert article_index.mentioned("$ZZZZ is not listed") == {}
+
+
+def test_an_article_is_indexed_under_every_ticker_it_mentions(cache):
+    item = article(1, title="Nvidia, AMD and Intel report earnings")
+    article_index.record("nvda", "SEARCH", [item])
+    stored = cache.get(article_key(item["url"]))
+    assert stored["tickers"] == ["AMD", "INTC", "NVDA"]
+    assert "Intel Corporation" in stored["entities"]
+    for ticker in ("NVDA", "AMD", "INTC"):
+        assert [a["url"] for a in article_index.articles_for(ticker)] == [item["url"]]
+    # Only the ticker that was searched for gets a fetch time
+    assert article_index.last_fetch("NVDA", "SEARCH") is not None
+    assert article_index.last_fetch("AMD", "SEARCH") is None
+
+
+def test_a_later_snippet_does_not_replace_the_crawled_page(cache):
+    article_index.record("NVDA", "CRAWL", [article(1, raw_content="The whole page.")])
+    article_index.record("NVDA", "SEARCH", [article(1, snippet="Short.", raw_content=None)])
+    stored = cache.get(article_key(article(1)["url"]))
+    assert stored["raw_content"] == "The whole page." and stored["snippet"] == "Short."
+
+
+def test_articles_for_is_newest_first_without_excluded_urls(cache):
+    for n in range(3):
+        article_index.record("NVDA", "SEARCH", [article(n)])
+        time.sleep(0.01)
+    urls = [a["url"] for a in article_index.articles_for("NVDA")]
+    assert urls == [article(n)["url"] for n in (2, 1, 0)]
+    assert [a["url"] for a in article_index.articles_for("NVDA", exclude=[urls[0]])] == urls[1:]
+    assert set(article_index.articles_for("NVDA")[0]) == set(article_index.NEWS_FIELDS)
+
+
+def test_each_ticker_keeps_its_newest_articles(cache, monkeypatch):
+    monkeypatch.setattr(settings, "ARTICLE_INDEX_MAX_PER_TICKER", 2)
+    for n in range(4):
+        article_index.record("NVDA", "SEARCH", [article(n)])
+        time.sleep(0.01)
+    assert [a["url"] for a in article_index.articles_for("NVDA")] == [article(n)["url"] for n in (3, 2)]
+
+
+def test_articles_older_than_the_max_age_are_not_reused(cache):
+    url = article(1)["url"]
+    article_index.record("NVDA", "SEARCH", [article(1)])
+    entry = cache.get(ticker_key("NVDA"))
+    entry["articles"][url] = time.time() - (settings.ARTICLE_INDEX_MAX_AGE_HOURS + 1) * 3600
+    cache.set(ticker_key("NVDA"), entry, 3600)
+    assert article_index.articles_for("NVDA") == []
+
+
+def test_a_held_lease_skips_the_ticker_update(cache):
+    before = stat("skipped_updates")
+    token = cache.acquire_lease(ticker_key("NVDA"), 60)
+    article_index.record("NVDA", "SEARCH", [article(1)])
+    assert stat("skipped_updates") == before + 1
+    # The article itself is indexed; only the link from the ticker is missed
+    assert cache.get(article_key(article(1)["url"])) is not None
+    assert article_index.articles_for("NVDA") == []
+    cache.release_lease(ticker_key("NVDA"), token)
+    article_index.record("NVDA", "SEARCH", [article(1)])
+    assert len(article_index.articles_for("NVDA")) == 1
+
+
+def test_recent_fetches_answer_from_the_index(cache):
+    assert not article_index.is_fresh("NVDA", "SEARCH")
+    set_fetched(cache, "NVDA", "SEARCH", time.time() - 60)
+    assert article_index.is_fresh("NVDA", "SEARCH")
+    set_fetched(cache, "NVDA", "SEARCH", time.time() - settings.ARTICLE_INDEX_REFRESH_SECONDS - 1)
+    assert not article_index.is_fresh("NVDA", "SEARCH")
+
+
+def test_delta_window_covers_the_time_since_the_last_fetch(cache):
+    assert article_index.delta_window("NVDA", "SEARCH") is None
+    set_fetched(cache, "NVDA", "SEARCH", time.time() - 3600)
+    assert article_index.delta_window("NVDA", "SEARCH") == "day"
+    set_fetched(cache, "NVDA", "SEARCH", time.time() - 30 * 3600)
+    assert article_index.delta_window("NVDA", "SEARCH") == "week"
+    # Articles from before the max age have left the index, so a full search is needed
+    set_fetched(cache, "NVDA", "SEARCH", time.time() - (settings.ARTICLE_INDEX_MAX_AGE_HOURS + 1) * 3600)
+    assert article_index.delta_window("NVDA", "SEARCH") is None
+
+
+def test_extracts_are_shared_across_tickers(cache):
+    item = article(1, title="Chip stocks rally")
+    article_index.record("NVDA", "SEARCH", [item])
+    article_index.record_extracted("NVDA", [{"url": item["url"], "content": "Intel also rose 3% on the news.",
+                                             "word_count": 7}])
+    found = article_index.extracted_for([item["url"], "https://news.example.com/other"])
+    assert list(found) == [item["url"]]
+    assert found[item["url"]]["content"].startswith("Intel") and found[item["url"]]["source"] == "tavily_extract"
+    # The full text named Intel, so the article is now in Intel's index too
+    assert [a["url"] for a in article_index.articles_for("INTC")] == [item["url"]]
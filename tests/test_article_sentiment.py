@@ -0,0 +1,142 @@
+import re
+from types import SimpleNamespace
+import pytest
+from backend.agents import sentiment
+from backend.services import article_sentiment, llm_gateway
+
+
+def news(*numbers, overall_score=0):
+    return [{"url": f"https://news.example.com/{n}", "title": f"Headline {n}", "snippet": f"Snippet {n}",
+             "overall_score": overall_score} for n in numbers]
+
+
+def state(items, extracted=(), priority="default"):
+    return SimpleNamespace(ticker="aapl", news=list(items), extracted_content=list(extracted), priority=priority,
+                           deadline_at=None, content_quality_score=50)
+
+
+@pytest.fixture
+def scorer(monkeypatch):
+    """Fake llm_gateway.run: rates every numbered article in the prompt, records how many it saw"""
+    scorer = SimpleNamespace(prompts=[], score=0.6, answered=None, unavailable=False)
+
+    def run(state, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        numbers = re.findall(r"^\[(\d+)\]", prompt, re.MULTILINE)
+        scorer.prompts.append(numbers)
+        if scorer.unavailable:
+            raise llm_gateway.LLMUnavailable("down")
+        answered = numbers if scorer.answered is None else numbers[:scorer.answered]
+        return {n: {"score": scorer.score, "confidence": 0.8} for n in answered}
+
+    monkeypatch.setattr(llm_gateway, "run", run)
+    return scorer
+
+
+def test_article_text_adds_the_extract_excerpt_and_figures():
+    item = news(1)[0]
+    assert article_sentiment.article_text(item) == "Headline 1: Snippet 1"
+    text = article_sentiment.article_text(item, {"content": "x" * 1000, "financial_figures": ["revenue: $5B"],
+                                                 "sentiment_indicators": ["beat"]})
+    assert "Excerpt: " + "x" * article_sentiment.CONTENT_CHARS + "\n" in text
+    assert "Financial Data: revenue: $5B" in text and "Market Indicators: beat" in text
+
+
+def test_scores_are_keyed_by_ticker_url_and_text():
+    key = article_sentiment.score_key("aapl", "https://a", "text")
+    assert key == article_sentiment.score_key("AAPL", "https://a", "text")
+    assert key != article_sentiment.score_key("MSFT", "https://a", "text")
+    assert key != article_sentiment.score_key("AAPL", "https://a", "other text")
+
+
+def test_normalize_score_clamps_and_rejects():
+    assert article_sentiment.normalize_score({"score": 3, "confidence": -1}) == {"score": 1.0, "confidence": 0.0}
+    assert article_sentiment.normalize_score({"score": "-0.4"}) == {"score": -0.4, "confidence": 0.5}
+    assert article_sentiment.normalize_score({"confidence": 0.9}) is None
+    assert article_sentiment.normalize_score({"score": "high"}) is None
+    assert article_sentiment.normalize_score(None) is None
+
+
+def test_aggregate_weights_and_agreement():
+    items = news(1, 2, 3)
+    agreeing = {item["url"]: {"score": 0.5, "confidence": 0.8} for item in items}
+    assert article_sentiment.aggregate(items, agreeing) == {"sentiment": "Bullish", "confidence": 0.8, "score": 0.5}
+    split = {items[0]["url"]: {"score": 0.9, "confidence": 0.8}, items[1]["url"]: {"score": -0.9, "confidence": 0.8}}
+    result = article_sentiment.aggregate(items, split)
+    assert result["sentiment"] == "Neutral" and result["confidence"] == 0.4
+    assert article_sentiment.aggregate(items, {}) == {"sentiment": "Neutral", "confidence": 0.0, "score": 0.0}
+
+
+def test_premium_articles_weigh_more():
+    plain, premium = news(1)[0], news(2, overall_score=100)[0]
+    scores = {plain["url"]: {"score": -1.0, "confidence": 1.0}, premium["url"]: {"score": 1.0, "confidence": 1.0}}
+    assert article_sentiment.aggregate([plain, premium], scores)["score"] == 0.5
+
+
+def test_cached_scores_splits_stored_from_missing(cache):
+    articles = [(item, article_sentiment.article_text(item)) for item in news(1, 2, 3)]
+    article_sentiment.store_score("AAPL", articles[1][0]["url"], articles[1][1], {"score": 0.2, "confidence": 0.5})
+    scores, missing = article_sentiment.cached_scores("AAPL", articles)
+    assert list(scores) == [articles[1][0]["url"]]
+    assert missing == [0, 2]
+
+
+def test_too_little_news_is_neutral_without_a_call(cache, scorer):
+    assert sentiment.sentiment_agent(state(news(1, 2))) == {"sentiment": "Neutral", "confidence": 0.0}
+    assert scorer.prompts == []
+
+
+def test_only_new_articles_are_scored(cache, scorer):
+    out = sentiment.sentiment_agent(state(news(1, 2, 3)))
+    assert out["sentiment"] == "Bullish" and out["unscored_articles"] == 0
+    assert len(out["article_sentiments"]) == 3
+    # A fourth article changes the stage inputs; the first three scores come from the cache
+    sentiment.sentiment_agent(state(news(1, 2, 3, 4)))
+    assert scorer.prompts == [["1", "2", "3"], ["1"]]
+
+
+def test_a_changed_extract_rescores_its_article(cache, scorer):
+    items = news(1, 2, 3)
+    sentiment.sentiment_agent(state(items))
+    sentiment.sentiment_agent(state(items, [{"url": items[0]["url"], "content": "Guidance raised."}]))
+    assert scorer.prompts == [["1", "2", "3"], ["1"]]
+
+
+def test_complete_aggregates_are_reused(cache, scorer):
+    first = sentiment.sentiment_agent(state(news(1, 2, 3)))
+    assert sentiment.sentiment_agent(state(news(1, 2, 3))) == first
+    assert len(scorer.prompts) == 1
+
+
+def test_partial_aggregates_are_not_reused(cache, scorer):
+    scorer.answered = 1
+    out = sentiment.sentiment_agent(state(news(1, 2, 3)))
+    assert out["unscored_articles"] == 2 and out["confidence"] > 0
+    scorer.answered = None
+    out = sentiment.sentiment_agent(state(news(1, 2, 3)))
+    assert out["unscored_articles"] == 0
+    # The retry only asks for the two articles that had no score
+    assert scorer.prompts == [["1", "2", "3"], ["1", "2"]]
+
+
+def test_an_unavailable_model_leaves_everything_unscored(cache, scorer):
+    scorer.unavailable = True
+    out = sentiment.sentiment_agent(state(news(1, 2, 3)))
+    assert out == {"sentiment": "Neutral", "confidence": 0.0, "article_sentiments": [], "unscored_articles": 3}
+    scorer.unavailable = False
+    assert sentiment.sentiment_agent(state(news(1, 2, 3)))["unscored_articles"] == 0
+
+
+def test_batch_runs_go_through_the_micro_batcher(cache, scorer, monkeypatch):
+    classified = []
+
+    def classify(state, instruction, prompts, *args, **kwargs):
+        classified.extend(prompts)
+        # One prompt gets no answer and is scored directly
+        return [{"score": -0.7, "confidence": 0.9}] * (len(prompts) - 1) + [None]
+
+    monkeypatch.setattr(llm_gateway, "classify", classify)
+    out = sentiment.sentiment_agent(state(news(1, 2, 3), priority="batch"))
+    assert len(classified) == 3 and all("AAPL" in prompt for prompt in classified)
+    assert scorer.prompts == [["1"]]
+    assert out["unscored_articles"] == 0
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+import pytest
+from backend import main
+from backend.services import blob_arena, news_items
+from backend.services.news_items import NewsItem
+
+
+@pytest.fixture
+def run_state():
+    arena_id = blob_arena.open_arena()
+    yield SimpleNamespace(arena_id=arena_id)
+    blob_arena.close_arena(arena_id)
+
+
+def test_payloads_are_stored_by_reference(run_state):
+    ref = blob_arena.store(run_state, "full page text")
+    assert ref.startswith(blob_arena.REF_PREFIX)
+    assert blob_arena.load(run_state, ref) == "full page text"
+    assert blob_arena.load({"arena_id": run_state.arena_id}, ref) == "full page text"
+
+
+def test_without_an_arena_values_stay_inline():
+    state = SimpleNamespace()
+    assert blob_arena.store(state, "text") == "text"
+    assert blob_arena.load(state, "text") == "text"
+    assert blob_arena.load(state, None, "default") == "default"
+    assert blob_arena.store(state, "") == ""
+
+
+def test_closing_the_arena_frees_every_body(run_state):
+    ref = blob_arena.store(run_state, "x" * 1000)
+    before = blob_arena.arena_stats()
+    assert before["payload_chars"] >= 1000
+    blob_arena.close_arena(run_state.arena_id)
+    assert blob_arena.load(run_state, ref, "gone") == "gone"
+    after = blob_arena.arena_stats()
+    assert after["open_arenas"] == before["open_arenas"] - 1
+    assert after["payload_chars"] == before["payload_chars"] - 1000
+
+
+def test_news_item_keeps_dict_style_access(run_state):
+    item = NewsItem.from_dict({"title": "NVDA beats", "url": "https://a", "snippet": "Up 5%", "score": 0.9,
+                               "raw_content": "the whole page"}, run_state)
+    assert item["title"] == "NVDA beats" and item.get("url") == "https://a"
+    assert item.get("raw_content", "n/a") == "n/a" and "raw_content" not in item and "snippet" in item
+    with pytest.raises(KeyError):
+        item["raw_content"]
+    assert blob_arena.load(run_state, item.raw_ref) == "the whole page"
+    assert news_items.as_record(item) is item
+    assert news_items.news_dicts([item, {"url": "https://old"}]) == [
+        {"title": "NVDA beats", "url": "https://a", "snippet": "Up 5%", "score": 0.9, "source": "",
+         "overall_score": 0},
+        {"url": "https://old"},
+    ]
+
+
+def test_extracted_text_round_trips_through_the_arena(run_state):
+    stashed = news_items.stash_extracted(run_state, [{"url": "https://a", "content": "Revenue rose.", "word_count": 2}])
+    assert "content" not in stashed[0] and stashed[0]["word_count"] == 2
+    assert news_items.extracted_text(run_state, stashed[0]) == "Revenue rose."
+    assert news_items.extracted_text(run_state, {"url": "https://b", "content": "inline"}) == "inline"
+    assert news_items.extracted_dicts(run_state, stashed) == [
+        {"url": "https://a", "word_count": 2, "content": "Revenue rose."}
+    ]
+
+
+def test_api_result_resolves_bodies_before_the_arena_closes(monkeypatch):
+    seen = {}
+
+    class Graph:
+        def invoke(self, initial):
+            state = SimpleNamespace(arena_id=initial["arena_id"])
+            seen["arena_id"] = initial["arena_id"]
+            return {
+                "ticker": initial["ticker"], "arena_id": initial["arena_id"],
+                "news": [NewsItem.from_dict({"title": "T", "url": "https://a", "raw_content": "page"}, state)],
+                "extracted_content": news_items.stash_extracted(state, [{"url": "https://a", "content": "body"}]),
+            }
+
+    monkeypatch.setitem(main.compiled_graphs, "quick", Graph())
+    result = main.invoke_pipeline("AAPL", depth="quick")
+    assert "arena_id" not in result
+    assert result["news"][0]["url"] == "https://a" and "raw_ref" not in result["news"][0]
+    assert result["extracted_content"] == [{"url": "https://a", "content": "body"}]
+    assert blob_arena.arena_of(SimpleNamespace(arena_id=seen["arena_id"])) is None
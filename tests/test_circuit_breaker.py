@@ -0,0 +1,118 @@
+import time
+import pytest
+import requests
+from openai import error as openai_error
+from backend.services import circuit_breaker, rate_limiter
+from backend.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def open_breaker(**kwargs) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=0.1, **kwargs)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.ready() and not breaker.allow()
+    assert breaker.snapshot()["rejected_total"] == 1
+
+
+def test_success_resets_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_admits_a_single_probe():
+    breaker = open_breaker()
+    time.sleep(0.15)
+    assert breaker.state == HALF_OPEN
+    assert breaker.ready()
+    assert breaker.allow()
+    # The probe is out: nobody else gets through until it reports back
+    assert not breaker.ready() and not breaker.allow()
+
+
+def test_ready_does_not_take_the_probe():
+    breaker = open_breaker()
+    time.sleep(0.15)
+    for _ in range(3):
+        assert breaker.ready()
+    assert breaker.allow()
+
+
+def test_probe_result_closes_or_reopens():
+    breaker = open_breaker()
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+    breaker = open_breaker()
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+
+def test_lost_probe_is_released_after_recovery_timeout():
+    breaker = open_breaker()
+    time.sleep(0.15)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.15)
+    assert breaker.allow()
+
+
+def test_allow_or_refund_returns_tokens_when_the_breaker_refuses():
+    bucket = rate_limiter.get_bucket("twelvedata")
+    breaker = circuit_breaker.get_breaker("twelvedata")
+    breaker.failure_threshold = 1
+    breaker.record_failure()
+    assert rate_limiter.acquire("twelvedata", 1, timeout=0)
+    before = bucket.snapshot()["tokens_available"]
+    assert not rate_limiter.allow_or_refund(breaker, "twelvedata", 1)
+    assert bucket.snapshot()["tokens_available"] == pytest.approx(before + 1, abs=0.1)
+
+
+@pytest.mark.parametrize("exc, counted", [
+    (requests.exceptions.Timeout(), True),
+    (requests.exceptions.ConnectionError(), True),
+    (openai_error.RateLimitError("slow down"), True),
+    (openai_error.InvalidRequestError("bad", "messages"), False),
+    (ValueError("parse"), False),
+])
+def test_provider_failures(exc, counted):
+    assert circuit_breaker.is_provider_failure(exc) is counted
+
+
+def test_http_status_decides_provider_failure():
+    def http_error(status):
+        response = requests.Response()
+        response.status_code = status
+        return requests.exceptions.HTTPError(response=response)
+    assert circuit_breaker.is_provider_failure(http_error(503))
+    assert circuit_breaker.is_provider_failure(http_error(429))
+    assert not circuit_breaker.is_provider_failure(http_error(404))
+
+
+def test_limiter_refusal_does_not_spend_the_half_open_probe(monkeypatch):
+    from backend.config import settings
+    from backend.services import watch
+    monkeypatch.setattr(settings, "TWELVE_DATA_API_KEY", "test")
+    monkeypatch.setattr(rate_limiter, "acquire", lambda *args, **kwargs: False)
+    breaker = circuit_breaker.get_breaker("twelvedata")
+    breaker.failure_threshold, breaker.recovery_timeout = 1, 0.1
+    breaker.record_failure()
+    time.sleep(0.15)
+    assert watch.fetch_bars("AAPL", "1min", 5) is None
+    assert breaker.ready() and breaker.allow()
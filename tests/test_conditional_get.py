@@ -0,0 +1,68 @@
+import gzip
+import pytest
+from backend.config import settings
+from backend.services import responses
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", "gzip"),
+    ("gzip, br", "br" if responses.brotli else "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("identity", None),
+    ("gzip;q=0", None),
+    ("*", "br" if responses.brotli else "gzip"),
+    ("", None),
+])
+def test_preferred_encoding(header, expected):
+    assert responses.preferred_encoding(header) == expected
+
+
+def test_small_bodies_are_not_compressed():
+    resp = responses._encoded_response("gzip", b"{}", "application/json", None)
+    assert "Content-Encoding" not in resp.headers
+    assert resp.headers["ETag"].startswith('"')
+
+
+def test_compressed_variants_get_their_own_etag(monkeypatch):
+    monkeypatch.setattr(settings, "COMPRESSION_MIN_BYTES", 10)
+    body = b'{"news": "' + b"x" * 2000 + b'"}'
+    resp = responses._encoded_response("gzip", body, "application/json", '"abc"')
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.headers["ETag"] == '"abc-gzip"'
+    assert gzip.decompress(resp.body) == body
+
+
+def test_etag_matching_is_weak_and_ignores_the_encoding_suffix():
+    assert responses._matches('W/"abc-gzip"', '"abc"')
+    assert responses._matches('"other", "abc-br"', 'W/"abc"')
+    assert responses._matches("*", '"abc"')
+    assert not responses._matches('"abd"', '"abc"')
+    assert not responses._matches(None, '"abc"')
+
+
+def test_analysis_route_revalidates_to_304(client):
+    first = client.get("/analyze/AAPL")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    again = client.get("/analyze/AAPL", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    # Another fieldset is another representation
+    other = client.get("/analyze/AAPL", params={"fields": "price"}, headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_analysis_route_compresses_when_accepted(client, monkeypatch):
+    monkeypatch.setattr(settings, "COMPRESSION_MIN_BYTES", 10)
+    resp = client.get("/analyze/AAPL", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert resp.json()["ticker"] == "AAPL"
+    # The compressed variant's validator still revalidates
+    assert client.get("/analyze/AAPL", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
+
+
+def test_post_analysis_is_compressed_too(client, monkeypatch):
+    monkeypatch.setattr(settings, "COMPRESSION_MIN_BYTES", 10)
+    resp = client.post("/analyze", json={"ticker": "AAPL"}, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
@@ -0,0 +1,33 @@
+import time
+from types import SimpleNamespace
+from backend.services import deadline
+
+
+def test_no_deadline_keeps_defaults():
+    state = SimpleNamespace()
+    assert deadline.remaining(state) is None
+    assert deadline.has_time(state, 1000)
+    assert deadline.timeout_for(state, 10, reserve=5) == 10
+
+
+def test_timeout_is_capped_by_budget_and_reserve():
+    state = SimpleNamespace(deadline_at=time.time() + 8)
+    assert deadline.timeout_for(state, 20) <= 8
+    assert 2.5 < deadline.timeout_for(state, 20, reserve=5) <= 3
+    assert deadline.timeout_for(state, 20, reserve=30) == 0.0
+    assert deadline.has_time(state, 5) and not deadline.has_time(state, 9)
+
+
+def test_expired_deadline_skips_backoff():
+    state = SimpleNamespace(deadline_at=time.time() - 1)
+    assert deadline.remaining(state) == 0.0
+    started = time.monotonic()
+    assert not deadline.sleep_within(state, 5)
+    assert time.monotonic() - started < 0.1
+
+
+def test_backoff_is_shortened_to_the_budget():
+    state = SimpleNamespace(deadline_at=time.time() + deadline.MIN_CALL_SECONDS + 0.1)
+    started = time.monotonic()
+    assert deadline.sleep_within(state, 5)
+    assert time.monotonic() - started < 0.5
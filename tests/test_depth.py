@@ -0,0 +1,99 @@
+import mongomock
+import numpy as np
+import pytest
+from backend import main
+from backend.agents import logger as logger_module
+from backend.agents.indicators import indicator_agent
+from backend.agents.logger import logger_agent
+from backend.services.price_series import PriceSeries
+from tests.helpers import sample_result
+
+
+def daily_series(closes):
+    rows = [{"datetime": str(np.datetime64("2024-05-01") + np.timedelta64(i, "D")), "close": str(close),
+             "volume": "1000"} for i, close in enumerate(closes)]
+    return PriceSeries.from_twelvedata(list(reversed(rows)), "1day")
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    collection = mongomock.MongoClient()["echomarket_test"]["analyses"]
+    monkeypatch.setattr(logger_module, "mongo", collection)
+    return collection
+
+
+def test_every_depth_starts_with_price_and_ends_with_the_logger():
+    for depth in main.DEPTHS:
+        steps = [name for name, _ in main.PIPELINES[depth]]
+        assert steps[0] == "price" and steps[-1] == "logger"
+    assert [name for name, _ in main.PIPELINES["quick"]] == ["price", "indicators", "logger"]
+    assert set(main.compiled_graphs) == set(main.DEPTHS)
+
+
+def test_deeper_results_cover_shallower_requests():
+    assert main.covering_depths("quick") == ["deep", "standard", "quick"]
+    assert main.covering_depths("standard") == ["deep", "standard"]
+    assert main.covering_depths("deep") == ["deep"]
+
+
+def test_deep_keeps_the_original_cache_keys():
+    assert main.analysis_key("aapl") == "analysis:AAPL"
+    assert main.analysis_key("aapl", "quick") == "analysis:quick:AAPL"
+    assert main.analysis_key("aapl", "standard", last=True) == "analysis:last:standard:AAPL"
+
+
+def test_depth_query_parameter_selects_the_pipeline(client, pipeline):
+    body = client.get("/analyze/AAPL", params={"depth": "quick"}).json()
+    assert pipeline == [("AAPL", "default", "quick")]
+    assert body["depth"] == "quick"
+    client.post("/analyze", json={"ticker": "MSFT", "depth": "standard"})
+    assert pipeline[-1] == ("MSFT", "default", "standard")
+
+
+def test_unknown_depth_is_rejected(client, pipeline):
+    assert client.get("/analyze/AAPL", params={"depth": "fast"}).status_code == 422
+    assert pipeline == []
+
+
+def test_a_cached_deep_result_answers_a_quick_request(client, pipeline, cache):
+    cache.set(main.analysis_key("AAPL"), sample_result("AAPL", "deep"), 600)
+    body = client.get("/analyze/AAPL", params={"depth": "quick"}).json()
+    assert pipeline == []
+    assert body["depth"] == "deep"
+    # but a quick result never answers a deep request
+    cache.set(main.analysis_key("NVDA", "quick"), sample_result("NVDA", "quick"), 600)
+    client.get("/analyze/NVDA")
+    assert pipeline == [("NVDA", "default", "deep")]
+
+
+def test_indicator_agent_reads_the_trend_off_the_series():
+    state = main.GraphState(ticker="AAPL", price_series=daily_series([100 * 1.01 ** i for i in range(40)]))
+    out = indicator_agent(state)
+    assert out["trend"]["direction"] == "Uptrend"
+    assert out["trend"]["source"] == "indicators"
+    assert out["indicators"]["ready"] is True and out["indicators"]["ema_fast"] > out["indicators"]["ema_slow"]
+
+
+def test_indicator_agent_without_prices():
+    out = indicator_agent(main.GraphState(ticker="AAPL"))
+    assert out["trend"]["direction"] == "Unknown"
+    assert out["indicators"] == {}
+
+
+def test_quick_pipeline_stores_its_indicators(stored):
+    def price_agent(state):
+        return {"price": 148.0, "price_series": daily_series([100 + i for i in range(49)])}
+
+    graph = main.build_graph([("price", price_agent), *main.PIPELINES["quick"][1:]]).compile()
+    final = graph.invoke(main.pipeline_input("AAPL", depth="quick"))
+    assert final["log_id"] is not None
+    record = stored.find_one({"ticker": "AAPL"})
+    assert record["depth"] == "quick"
+    assert record["indicators"]["bars"] == 49
+    assert record["trend"]["source"] == "indicators"
+    assert len(record["prices"]) == 49
+
+
+def test_logger_skips_storage_without_mongo(monkeypatch):
+    monkeypatch.setattr(logger_module, "mongo", None)
+    assert logger_agent(main.GraphState(ticker="AAPL")) == {"log_id": None}
@@ -0,0 +1,79 @@
+import csv
+import io
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from backend.services import history_export
+
+
+def stored(ticker: str, when, **extra):
+    return {"query_id": f"{ticker}-{when}", "ticker": ticker, "timestamp": when, "price": "190.5",
+            "sentiment": "Bullish", "confidence": 0.7, "recommendation": "Buy",
+            "trend": {"direction": "Uptrend", "strength": "Moderate"}, "summary": {"content": "Steady."},
+            "news": [{"url": "https://a", "raw_content": "x" * 1000}, {"url": "https://b"}], **extra}
+
+
+def seed(mongo):
+    mongo.insert_many([
+        stored("AAPL", datetime(2024, 6, 3)),
+        stored("aapl", "2024-06-04T10:00:00"),  # /query stores ISO strings
+        stored("MSFT", datetime(2024, 6, 5)),
+        stored("AAPL", datetime(2024, 7, 1)),
+    ])
+
+
+def test_flatten_reads_only_the_exported_columns():
+    row = history_export.flatten(stored("aapl", datetime(2024, 6, 3)))
+    assert list(row) == history_export.HISTORY_COLUMNS
+    assert row["ticker"] == "AAPL" and row["price"] == 190.5
+    assert row["timestamp"] == "2024-06-03T00:00:00"
+    assert row["summary"] == "Steady." and row["news_count"] == 2
+
+
+def test_filter_covers_both_timestamp_types(mongo):
+    seed(mongo)
+    query = history_export.history_filter(["AAPL"], datetime(2024, 6, 1), datetime(2024, 6, 30))
+    docs = list(history_export.open_cursor(mongo, query))
+    assert [d["query_id"] for d in docs] == ["AAPL-2024-06-03 00:00:00", "aapl-2024-06-04T10:00:00"]
+    # Article bodies never leave the database
+    assert all(set(item) == {"url"} for d in docs for item in d["news"])
+
+
+def test_csv_is_streamed_in_chunks(monkeypatch):
+    monkeypatch.setattr(history_export, "CSV_CHUNK_ROWS", 2)
+    docs = [stored("AAPL", datetime(2024, 6, day)) for day in range(1, 6)]
+    chunks = list(history_export.iter_csv(docs))
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+    assert len(rows) == 5 and rows[0]["trend_direction"] == "Uptrend"
+
+
+def test_parquet_round_trips_in_row_groups():
+    docs = [stored("AAPL", datetime(2024, 6, 1 + i % 28)) for i in range(25)]
+    chunks = list(history_export.iter_parquet(docs, row_group_size=10))
+    table = pq.read_table(pa.BufferReader(b"".join(chunks)))
+    assert table.num_rows == 25
+    assert pq.ParquetFile(pa.BufferReader(b"".join(chunks))).num_row_groups == 3
+    assert table.column("price").to_pylist()[0] == 190.5
+
+
+def test_empty_parquet_export_is_still_a_file():
+    table = pq.read_table(pa.BufferReader(b"".join(history_export.iter_parquet([]))))
+    assert table.num_rows == 0 and table.column_names == history_export.HISTORY_COLUMNS
+
+
+def test_export_route(client, mongo):
+    seed(mongo)
+    resp = client.get("/export/history", params={"tickers": "aapl", "start": "2024-06-01", "end": "2024-06-30"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert len(list(csv.DictReader(io.StringIO(resp.text)))) == 2
+    parquet = client.get("/export/history", params={"format": "parquet"})
+    assert pq.read_table(pa.BufferReader(parquet.content)).num_rows == 4
+    assert client.get("/export/history", params={"format": "xlsx"}).status_code == 400
+    assert client.get("/export/history", params={"start": "June"}).status_code == 400
+
+
+def test_parquet_without_pyarrow_is_a_501(client, monkeypatch):
+    monkeypatch.setattr(history_export, "pq", None)
+    assert client.get("/export/history", params={"format": "parquet"}).status_code == 501
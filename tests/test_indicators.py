@@ -0,0 +1,182 @@
+import numpy as np
+import pytest
+from backend.config import settings
+from backend.services import indicators
+from backend.services.indicators import IndicatorState, conditions
+from backend.services.watch import WatchEngine, closed_bars
+
+WINDOW = 20
+
+
+def random_walk(n, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    high = close * (1 + rng.uniform(0, 0.005, n))
+    low = close * (1 - rng.uniform(0, 0.005, n))
+    volume = rng.integers(100, 10000, n).astype(float)
+    return close, high, low, volume
+
+
+def batch_ema(values, period):
+    alpha = 2 / (period + 1)
+    ema = [values[0]]
+    for value in values[1:]:
+        ema.append(alpha * value + (1 - alpha) * ema[-1])
+    return ema[-1]
+
+
+def batch_rsi(values, period=indicators.RSI_PERIOD):
+    changes = np.diff(values)
+    gains, losses = np.clip(changes, 0, None), np.clip(-changes, 0, None)
+    avg_gain, avg_loss = gains[:period].mean(), losses[:period].mean()
+    for gain, loss in zip(gains[period:], losses[period:]):
+        avg_gain = (avg_gain * (period - 1) + gain) / period
+        avg_loss = (avg_loss * (period - 1) + loss) / period
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def fed(close, high, low, volume, window=WINDOW):
+    state = IndicatorState(window)
+    for i in range(len(close)):
+        state.update(i, close[i], high[i], low[i], volume[i])
+    return state
+
+
+@pytest.mark.parametrize("n", [30, 120, 500])
+def test_incremental_indicators_match_a_batch_computation(n):
+    close, high, low, volume = random_walk(n)
+    state = fed(close, high, low, volume)
+    assert state.ema_fast == pytest.approx(batch_ema(close, indicators.EMA_FAST))
+    assert state.ema_slow == pytest.approx(batch_ema(close, indicators.EMA_SLOW))
+    assert state.rsi == pytest.approx(batch_rsi(close))
+    returns = np.diff(close) / close[:-1]
+    assert state.volatility_pct == pytest.approx(np.std(returns[-WINDOW:], ddof=1) * 100)
+    typical = ((close + high + low) / 3)[-WINDOW:]
+    assert state.vwap == pytest.approx((typical * volume[-WINDOW:]).sum() / volume[-WINDOW:].sum())
+
+
+def test_rsi_and_volatility_wait_for_enough_bars():
+    close, high, low, volume = random_walk(WINDOW)
+    state = fed(close[:indicators.RSI_PERIOD], high, low, volume)
+    assert state.rsi is None
+    state.update(indicators.RSI_PERIOD, close[indicators.RSI_PERIOD])
+    assert state.rsi is not None
+    assert state.volatility_pct is None  # fewer than WINDOW returns so far
+
+
+def test_ready_needs_the_slow_ema_and_the_window():
+    close, high, low, volume = random_walk(60)
+    state = IndicatorState(40)
+    for i in range(41):
+        assert not state.ready()
+        state.update(i, close[i], high[i], low[i], volume[i])
+    assert state.ready() and state.snapshot()["ready"]
+    short = fed(close[:indicators.EMA_SLOW - 1], high, low, volume, window=5)
+    assert not short.ready()
+
+
+def test_old_and_repeated_bars_are_ignored():
+    close, high, low, volume = random_walk(40)
+    state = fed(close, high, low, volume)
+    before = state.snapshot()
+    state.update(39, 1.0, volume=1e9)
+    state.update(10, 1.0, volume=1e9)
+    assert state.snapshot() == before
+
+
+def test_vwap_is_none_without_volume():
+    state = IndicatorState(WINDOW)
+    for i in range(30):
+        state.update(i, 100.0 + i)
+    assert state.vwap is None
+
+
+def test_flat_series_has_neutral_rsi():
+    state = IndicatorState(WINDOW)
+    for i in range(30):
+        state.update(i, 50.0, volume=10)
+    assert state.rsi == 50.0
+    assert state.volatility_pct == pytest.approx(0.0)
+
+
+def test_conditions_on_a_steady_rally():
+    state = IndicatorState(WINDOW)
+    for i in range(40):
+        state.update(i, 100 * 1.01 ** i, volume=100)
+    assert state.rsi == 100.0
+    active = conditions(state, rsi_high=70, rsi_low=30, volatility_pct=5, vwap_deviation_pct=5)
+    assert active == {"rsi_overbought", "ema_bullish", "vwap_breakout"}
+    assert conditions(IndicatorState(WINDOW), 70, 30, 5, 5) == set()
+
+
+def test_conditions_flag_volatility_and_breakdowns():
+    state = IndicatorState(WINDOW)
+    for i in range(40):
+        state.update(i, 100 * (1.05 if i % 2 else 0.95), volume=100)
+    state.update(40, 80.0, volume=100)
+    active = conditions(state, rsi_high=101, rsi_low=-1, volatility_pct=1.5, vwap_deviation_pct=2.5)
+    assert {"volatility_spike", "vwap_breakdown", "ema_bearish"} <= active
+
+
+# --- Watch engine edge triggering ---
+
+def five_minute_bars(closes, start=0):
+    # TwelveData order: newest first
+    rows = []
+    for i, close in enumerate(closes, start):
+        stamp = np.datetime64("2024-06-03T09:30:00") + np.timedelta64(5 * i, "m")
+        rows.append({"datetime": str(stamp).replace("T", " "), "open": str(close), "high": str(close),
+                     "low": str(close), "close": str(close), "volume": "100"})
+    return list(reversed(rows))
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(settings, "WATCH_WINDOW", WINDOW)
+    # Only the RSI band and the EMA crossover, so each step below flips one known condition
+    monkeypatch.setattr(settings, "WATCH_VOLATILITY_PCT", 1000.0)
+    monkeypatch.setattr(settings, "WATCH_VWAP_DEVIATION_PCT", 1000.0)
+
+    async def trigger(symbol):
+        return None
+
+    return WatchEngine(trigger)
+
+
+def ingest(engine, closes, start):
+    return engine.ingest("NVDA", closed_bars(five_minute_bars(closes, start), "5min"))
+
+
+def test_the_first_ready_bar_only_sets_the_baseline(engine):
+    rally = [100 * 1.01 ** i for i in range(41)]
+    assert ingest(engine, rally, 0) == []
+    assert engine._watches["NVDA"].active == {"rsi_overbought", "ema_bullish"}
+    # Still rallying: the conditions stay true and nothing fires again
+    assert ingest(engine, [rally[-1] * 1.01 ** i for i in range(1, 6)], 41) == []
+
+
+def test_signals_fire_once_when_a_condition_turns_on(engine):
+    rally = [100 * 1.01 ** i for i in range(41)]
+    ingest(engine, rally, 0)
+    top = rally[-2]  # the newest row is the forming bar and is dropped
+    fired = []
+    for step in range(1, 40):
+        fired += ingest(engine, [top * 0.99 ** step, 0.0], 40 + step - 1)
+    assert fired.count("ema_bearish") == 1
+    assert fired.count("rsi_oversold") == 1
+    assert engine._watches["NVDA"].active == {"rsi_oversold", "ema_bearish"}
+
+
+def test_replayed_bars_do_not_advance_the_state(engine):
+    rally = [100 * 1.01 ** i for i in range(41)]
+    ingest(engine, rally, 0)
+    bars = engine._watches["NVDA"].state.bars
+    assert ingest(engine, rally, 0) == []
+    assert engine._watches["NVDA"].state.bars == bars == 40
+
+
+def test_closed_bars_drops_the_forming_bar():
+    series = closed_bars(five_minute_bars([1.0, 2.0, 3.0]), "5min")
+    assert list(series.close) == [1.0, 2.0]
+    assert len(closed_bars([], "5min")) == 0
+    assert closed_bars(five_minute_bars([4.0]), "5min").last_close() is None
@@ -0,0 +1,200 @@
+import asyncio
+from datetime import datetime, timedelta
+import mongomock
+import pytest
+from pymongo.errors import DuplicateKeyError
+from backend import main
+from backend.config import settings
+from backend.services import admission, jobs
+from backend.services.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue
+from tests.helpers import sample_result
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient()["echomarket_test"]["analysis_jobs"]
+
+
+@pytest.fixture
+def fast_jobs(monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_WORKERS", 2)
+    monkeypatch.setattr(settings, "JOBS_POLL_SECONDS", 0.05)
+    monkeypatch.setattr(jobs, "POLL_INTERVAL", 0.05)
+
+
+def queue_for(collection, run=None, worker=None):
+    async def default_run(ticker, depth):
+        return sample_result(ticker, depth)
+
+    queue = JobQueue(lambda: collection, run or default_run)
+    if worker:
+        queue._worker_id = worker
+    return queue
+
+
+def test_one_active_job_per_analysis_is_enforced_by_the_index(collection):
+    queue_for(collection).ensure_indexes()
+    index = collection.index_information()["one_active_job"]
+    assert index["unique"] and index["partialFilterExpression"] == {"active": True}
+    collection.insert_one({"_id": "a", "ticker": "AAPL", "depth": "deep", "active": True})
+    with pytest.raises(DuplicateKeyError):
+        collection.insert_one({"_id": "b", "ticker": "AAPL", "depth": "deep", "active": True})
+    # Other depths, and finished jobs without the flag, are not constrained
+    collection.insert_one({"_id": "c", "ticker": "AAPL", "depth": "quick", "active": True})
+    collection.insert_one({"_id": "d", "ticker": "AAPL", "depth": "deep"})
+
+
+def test_submitting_an_active_analysis_shares_the_job(collection):
+    queue = queue_for(collection)
+    first = queue._create("AAPL", "deep")
+    assert queue._create("AAPL", "deep")["_id"] == first["_id"]
+    assert queue._create("AAPL", "quick")["_id"] != first["_id"]
+    assert collection.count_documents({}) == 2
+
+
+def test_a_finished_job_frees_the_analysis(collection):
+    queue = queue_for(collection)
+    first = queue._create("AAPL", "deep")
+    claimed = queue._claim()
+    queue._finish(claimed["_id"], DONE, {"price": 1.0})
+    stored = collection.find_one({"_id": first["_id"]})
+    assert stored["status"] == DONE and "active" not in stored and stored["result"] == {"price": 1.0}
+    assert queue._create("AAPL", "deep")["_id"] != first["_id"]
+
+
+def test_claims_take_the_oldest_job_once(collection):
+    one, two = queue_for(collection, worker="w1"), queue_for(collection, worker="w2")
+    older = one._create("AAPL", "deep")
+    newer = one._create("MSFT", "deep")
+    assert one._claim()["_id"] == older["_id"]
+    claimed = two._claim()
+    assert claimed["_id"] == newer["_id"] and claimed["worker"] == "w2" and claimed["attempts"] == 1
+    assert one._claim() is None and two._claim() is None
+
+
+def test_only_the_claiming_worker_can_finish_a_job(collection):
+    one, two = queue_for(collection, worker="w1"), queue_for(collection, worker="w2")
+    job = one._create("AAPL", "deep")
+    one._claim()
+    two._finish(job["_id"], DONE, {"price": 1.0})
+    assert collection.find_one({"_id": job["_id"]})["status"] == RUNNING
+
+
+def test_stale_jobs_are_reclaimed_until_attempts_run_out(collection, monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_MAX_ATTEMPTS", 2)
+    dead, alive = queue_for(collection, worker="dead"), queue_for(collection, worker="alive")
+    job = dead._create("AAPL", "deep")
+    dead._claim()
+    assert alive._claim() is None  # still heartbeating
+
+    def stop_heartbeat():
+        collection.update_one({"_id": job["_id"]}, {"$set": {"heartbeat_at": datetime.utcnow() - timedelta(hours=1)}})
+
+    stop_heartbeat()
+    reclaimed = alive._claim()
+    assert reclaimed["worker"] == "alive" and reclaimed["attempts"] == 2
+    stop_heartbeat()
+    assert dead._claim() is None
+    alive._fail_exhausted()
+    stored = collection.find_one({"_id": job["_id"]})
+    assert stored["status"] == FAILED and "active" not in stored
+    assert stored["error"] == "job was interrupted too many times"
+
+
+def test_interrupted_jobs_are_requeued_without_spending_an_attempt(collection):
+    queue = queue_for(collection)
+    job = queue._create("AAPL", "deep")
+    queue._claim()
+    queue._requeue([job["_id"]])
+    stored = collection.find_one({"_id": job["_id"]})
+    assert stored["status"] == QUEUED and stored["attempts"] == 0
+
+
+def test_runners_execute_jobs_and_wake_long_polls(collection, fast_jobs):
+    ran = []
+
+    async def run(ticker, depth):
+        ran.append((ticker, depth))
+        await asyncio.sleep(0.05)
+        return sample_result(ticker, depth)
+
+    queue = queue_for(collection, run)
+
+    async def scenario():
+        queue.start()
+        try:
+            job = await queue.submit("AAPL", "quick")
+            assert job["status"] == QUEUED
+            return await queue.wait(job["job_id"], timeout=5)
+        finally:
+            await queue.stop()
+
+    finished = asyncio.run(scenario())
+    assert finished["status"] == DONE and finished["result"]["depth"] == "quick"
+    assert ran == [("AAPL", "quick")]
+    assert queue.status()["completed_total"] == 1
+
+
+def test_failed_runs_are_stored_with_their_error(collection, fast_jobs):
+    async def run(ticker, depth):
+        raise RuntimeError("upstream down")
+
+    queue = queue_for(collection, run)
+
+    async def scenario():
+        queue.start()
+        try:
+            job = await queue.submit("AAPL")
+            return await queue.wait(job["job_id"], timeout=5)
+        finally:
+            await queue.stop()
+
+    finished = asyncio.run(scenario())
+    assert finished["status"] == FAILED and finished["error"] == "upstream down"
+    assert "result" not in finished
+
+
+def test_shed_runs_are_retried_instead_of_failing(collection, fast_jobs):
+    attempts = []
+
+    async def run(ticker, depth):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise admission.Overloaded("busy", retry_after=0)
+        return sample_result(ticker, depth)
+
+    queue = queue_for(collection, run)
+
+    async def scenario():
+        queue.start()
+        try:
+            job = await queue.submit("AAPL")
+            return await queue.wait(job["job_id"], timeout=5)
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(scenario())["status"] == DONE
+    assert len(attempts) == 2
+
+
+def test_long_poll_returns_the_job_as_it_stands_after_the_wait(collection):
+    queue = queue_for(collection)
+
+    async def scenario():
+        job = await queue.submit("AAPL")
+        return await queue.wait(job["job_id"], timeout=0.1), await queue.wait("missing", timeout=0.1)
+
+    pending, missing = asyncio.run(scenario())
+    assert pending["status"] == QUEUED and missing is None
+
+
+def test_job_routes(client, mongo, monkeypatch):
+    monkeypatch.setattr(main.job_queue, "_indexed", False)
+    response = client.post("/jobs", json={"ticker": " aapl ", "depth": "standard"})
+    assert response.status_code == 202
+    job = response.json()
+    assert response.headers["Location"] == f"/jobs/{job['job_id']}"
+    assert job["ticker"] == "AAPL" and job["depth"] == "standard"
+    assert client.post("/jobs", json={"ticker": "AAPL", "depth": "standard"}).json()["job_id"] == job["job_id"]
+    assert client.get(f"/jobs/{job['job_id']}").json()["status"] == QUEUED
+    assert client.get("/jobs/missing").status_code == 404
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+import openai
+import pytest
+from openai import error as openai_error
+from backend.config import settings
+from backend.services import circuit_breaker, llm_gateway, model_router
+from backend.services.llm_gateway import FALLBACK_MODEL, PRIMARY_MODEL, LLMUnavailable
+from tests.helpers import wait_for
+
+MESSAGES = [{"role": "user", "content": "Is this bullish?"}]
+
+
+def completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake ChatCompletion.acreate; `answer(model, messages)` returns the text or raises"""
+    calls = []
+    fake = SimpleNamespace(calls=calls, delay=0.0, answer=lambda model, messages: '{"sentiment": "Bullish"}')
+
+    async def acreate(model, messages, request_timeout, **params):
+        calls.append((model, messages))
+        await asyncio.sleep(fake.delay)
+        return completion(fake.answer(model, messages))
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", acreate)
+    return fake
+
+
+@pytest.fixture
+def router(monkeypatch):
+    """A fresh router (and its loop) per test, so a shutdown here doesn't reach other tests"""
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", False)
+    instance = model_router.ModelRouter()
+    monkeypatch.setattr(model_router, "_router", instance)
+    yield instance
+    instance.shutdown()
+
+
+@pytest.fixture
+def gateway(router, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BATCH_WINDOW_MS", 100)
+    monkeypatch.setattr(llm_gateway, "_bulk", None)
+    monkeypatch.setattr(llm_gateway, "_closed", False)
+    monkeypatch.setattr(llm_gateway, "_batcher", llm_gateway.MicroBatcher())
+    monkeypatch.setattr(llm_gateway, "_counters", dict.fromkeys(llm_gateway._counters, 0))
+    yield llm_gateway
+    if llm_gateway._bulk is not None:
+        llm_gateway._bulk.shutdown(wait=True)
+
+
+def pipeline_state(seconds=30.0):
+    return SimpleNamespace(deadline_at=time.time() + seconds, priority="default")
+
+
+def router_threads():
+    return [t for t in threading.enumerate() if t.name == "model-router" and t.is_alive()]
+
+
+# --- One long-lived event loop ---
+
+def test_calls_share_one_event_loop(router, upstream):
+    before = len(router_threads())
+    router.complete(PRIMARY_MODEL, MESSAGES, timeout=5)
+    loop = router._loop
+    router.complete(PRIMARY_MODEL, MESSAGES, timeout=5)
+    router.complete(PRIMARY_MODEL, MESSAGES, timeout=5)
+    assert router._loop is loop and loop.is_running()
+    assert len(router_threads()) == before + 1
+
+
+def test_calls_from_many_threads_share_the_loop(router, upstream):
+    upstream.delay = 0.05
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(router.complete(PRIMARY_MODEL, MESSAGES, timeout=5)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(results) == 8
+    assert len(upstream.calls) == 8
+
+
+def test_shutdown_cancels_calls_still_racing(router, upstream):
+    upstream.delay = 10
+    errors = []
+
+    def call():
+        try:
+            router.complete(PRIMARY_MODEL, MESSAGES, timeout=30)
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    assert wait_for(lambda: len(upstream.calls) == 1)
+    loop = router._loop
+    router.shutdown()
+    thread.join(2)
+    assert not thread.is_alive() and len(errors) == 1
+    assert wait_for(loop.is_closed)
+
+
+def test_a_call_after_shutdown_starts_a_new_loop(router, upstream):
+    router.complete(PRIMARY_MODEL, MESSAGES, timeout=5)
+    first = router._loop
+    router.shutdown()
+    assert wait_for(first.is_closed)
+    assert router.complete(PRIMARY_MODEL, MESSAGES, timeout=5).choices[0].message.content
+    assert router._loop is not first
+
+
+def test_gateway_shutdown_stops_the_router_loop(gateway, router, upstream):
+    gateway.chat(PRIMARY_MODEL, MESSAGES, timeout=5)
+    loop = router._loop
+    gateway.shutdown()
+    assert wait_for(loop.is_closed)
+    with pytest.raises(LLMUnavailable):
+        gateway.submit_bulk(MESSAGES)
+
+
+# --- Retry / fallback policy ---
+
+def test_run_parses_the_primary_answer(gateway, upstream):
+    answer = gateway.run(pipeline_state(), MESSAGES, 50, 0.0, 10, parse=gateway.json_parser(["sentiment"]))
+    assert answer == {"sentiment": "Bullish"}
+    assert [model for model, _ in upstream.calls] == [PRIMARY_MODEL]
+    assert gateway.gateway_stats()["calls"] == 1
+
+
+def test_run_falls_back_after_a_failed_attempt(gateway, upstream):
+    def answer(model, messages):
+        if model == PRIMARY_MODEL:
+            raise openai_error.APIConnectionError("reset")
+        return '{"sentiment": "Bearish"}'
+
+    upstream.answer = answer
+    result = gateway.run(pipeline_state(), MESSAGES, 50, 0.0, 10, parse=gateway.json_parser(["sentiment"]))
+    assert result == {"sentiment": "Bearish"}
+    assert [model for model, _ in upstream.calls] == [PRIMARY_MODEL, FALLBACK_MODEL]
+
+
+def test_unparseable_answers_use_up_the_attempts(gateway, upstream):
+    upstream.answer = lambda model, messages: "no json here"
+    with pytest.raises(LLMUnavailable, match="all 2 attempts failed"):
+        gateway.run(pipeline_state(), MESSAGES, 50, 0.0, 10, parse=gateway.json_parser())
+
+
+def test_open_primary_circuit_goes_straight_to_the_fallback(gateway, upstream):
+    breaker = circuit_breaker.get_breaker(f"openai:{PRIMARY_MODEL}")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert gateway.run(pipeline_state(), MESSAGES, 50, 0.0, 10) == '{"sentiment": "Bullish"}'
+    assert [model for model, _ in upstream.calls] == [FALLBACK_MODEL]
+
+
+def test_no_call_without_time_budget(gateway, upstream):
+    with pytest.raises(LLMUnavailable, match="time budget"):
+        gateway.run(pipeline_state(-1), MESSAGES, 50, 0.0, 10)
+    assert upstream.calls == []
+
+
+# --- Bulk lane and micro-batching ---
+
+def batch_answer(model, messages):
+    ids = re.findall(r"### (item\d+)", messages[-1]["content"])
+    if not ids:
+        return '{"label": "single"}'
+    return json.dumps({item_id: {"label": f"answer-{item_id}"} for item_id in ids})
+
+
+def test_bulk_calls_run_at_batch_priority(gateway, upstream):
+    assert gateway.submit_bulk(MESSAGES).result(5) == '{"sentiment": "Bullish"}'
+    stats = gateway.gateway_stats()
+    assert stats["bulk_submitted"] == stats["bulk_completed"] == 1
+
+
+def test_prompts_close_together_share_one_request(gateway, upstream):
+    upstream.answer = batch_answer
+    answers = gateway.classify(pipeline_state(), "Label each headline", ["a", "b", "c"], 20, 10)
+    assert len(upstream.calls) == 1
+    assert [answer["label"] for answer in answers] == [f"answer-item{i}" for i in (1, 2, 3)]
+    stats = gateway.gateway_stats()
+    assert stats["batches"] == 1 and stats["batched_items"] == 3
+
+
+def test_a_lone_prompt_is_sent_without_batch_framing(gateway, upstream):
+    upstream.answer = batch_answer
+    assert gateway.classify(pipeline_state(), "Label it", ["a"], 20, 10) == [{"label": "single"}]
+    assert gateway.gateway_stats()["batches"] == 0
+
+
+def test_full_batches_are_sent_before_the_window_closes(gateway, upstream, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BATCH_WINDOW_MS", 10_000)
+    monkeypatch.setattr(settings, "LLM_BATCH_MAX_ITEMS", 2)
+    upstream.answer = batch_answer
+    started = time.monotonic()
+    answers = gateway.classify(pipeline_state(), "Label each", ["a", "b"], 20, 10)
+    assert time.monotonic() - started < 2
+    assert all(answer is not None for answer in answers)
+
+
+def test_items_missing_from_a_batched_answer_come_back_as_none(gateway, upstream):
+    upstream.answer = lambda model, messages: json.dumps({"item1": {"label": "ok"}})
+    assert gateway.classify(pipeline_state(), "Label each", ["a", "b"], 20, 10) == [{"label": "ok"}, None]
+
+
+def test_expired_callers_are_not_sent(gateway, upstream):
+    future = gateway._batcher.submit("Label it", "a", 20, deadline_at=time.monotonic() - 1)
+    with pytest.raises(LLMUnavailable):
+        future.result(5)
+    assert upstream.calls == []
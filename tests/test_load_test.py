@@ -0,0 +1,34 @@
+import requests
+from benchmarks.fake_upstreams import FakeTwelveData, LatencyProfile
+from benchmarks.load_test import percentile
+
+
+def test_percentile_is_nearest_rank():
+    values = sorted(float(v) for v in range(1, 101))
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 99) == 0.0
+
+
+def test_fake_upstream_serves_and_counts_calls():
+    fake = FakeTwelveData(LatencyProfile(latency_ms=0)).start()
+    try:
+        resp = requests.get(f"{fake.base_url}/price", params={"symbol": "AAPL"}, timeout=5)
+        assert resp.status_code == 200
+        assert float(resp.json()["price"]) > 0
+        series = requests.get(f"{fake.base_url}/time_series", params={"symbol": "AAPL", "outputsize": 3}, timeout=5)
+        assert len(series.json()["values"]) == 3
+        assert fake.calls["/price"] == 1 and fake.calls["/time_series"] == 1
+    finally:
+        fake.stop()
+
+
+def test_fake_upstream_injects_errors():
+    fake = FakeTwelveData(LatencyProfile(latency_ms=0, error_rate=1.0, error_status=503)).start()
+    try:
+        resp = requests.get(f"{fake.base_url}/price", params={"symbol": "AAPL"}, timeout=5)
+        assert resp.status_code == 503
+        assert fake.calls["/price (error)"] == 1
+    finally:
+        fake.stop()
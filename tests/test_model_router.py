@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import openai
+import pytest
+from openai import error as openai_error
+from backend.config import settings
+from backend.services import circuit_breaker, rate_limiter
+from backend.services.model_router import LatencyTracker, ModelRouter
+
+MESSAGES = [{"role": "user", "content": "Classify: shares rallied"}]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake ChatCompletion.acreate: per-model latency, and an optional error raised after it"""
+    behaviour = {"primary": (0.01, None), "fallback": (0.01, None)}
+    calls = []
+
+    async def acreate(model, messages, request_timeout, **params):
+        calls.append(model)
+        delay, error = behaviour[model]
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return {"model": model}
+
+    monkeypatch.setattr(openai.ChatCompletion, "acreate", acreate)
+    return behaviour, calls
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY", 0.05)
+    monkeypatch.setattr(settings, "LLM_HEDGE_PERCENTILE", 95)
+    instance = ModelRouter()
+    yield instance
+    instance.shutdown()
+
+
+def warm(router, model="primary", seconds=0.05, samples=5):
+    for _ in range(samples):
+        router.tracker(model).record(seconds)
+
+
+def tokens_available():
+    return rate_limiter.get_bucket("openai").snapshot()["tokens_available"]
+
+
+def test_percentiles_over_the_sliding_window():
+    tracker = LatencyTracker(window=4)
+    assert tracker.percentile(95) is None
+    for seconds in (9.0, 1.0, 2.0, 3.0, 4.0):
+        tracker.record(seconds)
+    assert tracker.samples() == 4  # the 9s call has left the window
+    assert tracker.percentile(50) == 3.0
+    assert tracker.percentile(95) == 4.0
+    tracker.record(0.5, completed=False)
+    assert tracker.calls == 5 and tracker.cancelled == 1
+
+
+def test_hedge_delay_needs_samples_and_headroom(router):
+    assert router.hedge_delay("primary", timeout=10) is None
+    warm(router, seconds=0.01)
+    assert router.hedge_delay("primary", timeout=10) == 0.05  # floored at LLM_HEDGE_MIN_DELAY
+    warm(router, seconds=2.0, samples=20)
+    assert router.hedge_delay("primary", timeout=10) == 2.0
+    # Hedging at 2s into a 2.4s budget would leave the fallback no time
+    assert router.hedge_delay("primary", timeout=2.4) is None
+
+
+def test_fast_primary_is_not_hedged(router, upstream):
+    _, calls = upstream
+    warm(router)
+    assert router.complete("primary", MESSAGES, timeout=5, hedge_to="fallback") == {"model": "primary"}
+    assert calls == ["primary"]
+    assert router.stats()["hedged_total"] == 0
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled(router, upstream):
+    behaviour, calls = upstream
+    behaviour["primary"] = (2.0, None)
+    warm(router)
+    assert router.complete("primary", MESSAGES, timeout=5, hedge_to="fallback") == {"model": "fallback"}
+    assert calls == ["primary", "fallback"]
+    stats = router.stats()
+    assert stats["hedged_total"] == 1 and stats["hedge_wins"] == 1 and stats["hedge_win_rate"] == 1.0
+    assert stats["models"]["primary"]["cancelled"] == 1
+    assert stats["models"]["fallback"]["calls"] == 1
+
+
+def test_primary_can_still_win_after_a_hedge(router, upstream):
+    behaviour, _ = upstream
+    behaviour["primary"] = (0.15, None)
+    behaviour["fallback"] = (2.0, None)
+    warm(router)
+    assert router.complete("primary", MESSAGES, timeout=5, hedge_to="fallback") == {"model": "primary"}
+    stats = router.stats()
+    assert stats["primary_wins_after_hedge"] == 1 and stats["hedge_wins"] == 0
+    assert stats["models"]["fallback"]["cancelled"] == 1
+
+
+def test_a_failed_side_leaves_the_race_to_the_other(router, upstream):
+    behaviour, _ = upstream
+    behaviour["primary"] = (0.15, openai_error.APIConnectionError("reset"))
+    behaviour["fallback"] = (0.3, None)
+    warm(router)
+    assert router.complete("primary", MESSAGES, timeout=5, hedge_to="fallback") == {"model": "fallback"}
+    assert router.stats()["models"]["primary"]["failures"] == 1
+    assert circuit_breaker.get_breaker("openai:primary").snapshot()["failures_total"] == 1
+
+
+def test_the_first_error_is_raised_when_both_sides_fail(router, upstream):
+    behaviour, _ = upstream
+    behaviour["primary"] = (0.1, openai_error.APIConnectionError("primary down"))
+    behaviour["fallback"] = (0.2, openai_error.APIConnectionError("fallback down"))
+    warm(router)
+    with pytest.raises(openai_error.APIConnectionError, match="primary down"):
+        router.complete("primary", MESSAGES, timeout=5, hedge_to="fallback")
+
+
+def test_no_hedge_without_a_free_slot(router, upstream):
+    behaviour, calls = upstream
+    behaviour["primary"] = (0.15, None)
+    warm(router)
+    before = tokens_available()
+    result = router.complete("primary", MESSAGES, timeout=5, hedge_to="fallback",
+                             slots=lambda model: threading.Semaphore(0))
+    assert result == {"model": "primary"}
+    assert calls == ["primary"]
+    assert router.stats()["hedges_skipped_no_capacity"] == 1
+    assert tokens_available() == pytest.approx(before, abs=1)
+
+
+def test_may_hedge_asks_the_breaker_before_taking_anything(router):
+    breaker = circuit_breaker.get_breaker("openai:fallback")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    slot = threading.Semaphore(1)
+    before = tokens_available()
+    assert not router._may_hedge("fallback", 500, "default", slot)
+    assert slot.acquire(blocking=False)  # the slot was never taken
+    assert tokens_available() == pytest.approx(before, abs=1)
+
+
+def test_may_hedge_refunds_when_the_probe_is_refused(router, monkeypatch):
+    breaker = circuit_breaker.get_breaker("openai:fallback")
+    monkeypatch.setattr(breaker, "allow", lambda: False)
+    slot = threading.Semaphore(1)
+    before = tokens_available()
+    assert not router._may_hedge("fallback", 500, "default", slot)
+    assert slot.acquire(blocking=False)
+    assert tokens_available() == pytest.approx(before, abs=1)
+
+
+def test_may_hedge_holds_a_slot_and_tokens_when_granted(router):
+    slot = threading.Semaphore(1)
+    before = tokens_available()
+    assert router._may_hedge("fallback", 500, "default", slot)
+    assert not slot.acquire(blocking=False)
+    assert tokens_available() == pytest.approx(before - 500, abs=1)
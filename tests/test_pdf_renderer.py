@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from backend.config import settings
+from backend.services import pdf_renderer
+from backend.services.pdf_renderer import RenderedCache
+from tests.helpers import sample_result
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(pdf_renderer, "_cache", RenderedCache(1024 * 1024))
+    monkeypatch.setattr(settings, "PDF_RENDER_WORKERS", 0)  # render in a thread; no process pool in tests
+
+
+def test_lru_is_bounded_by_bytes():
+    cache = RenderedCache(10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"  # "a" is now the most recently used
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    stats = cache.stats()
+    assert stats["bytes"] == 8 and stats["evictions"] == 1
+
+
+def test_oversized_files_are_not_cached():
+    cache = RenderedCache(10)
+    cache.put("big", b"x" * 11)
+    assert cache.get("big") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_report_renders_with_non_latin_text():
+    report = pdf_renderer.report_inputs({**sample_result(), "summary": "Gains — “strong” quarter ✓"})
+    pdf = pdf_renderer.render_report("AAPL", report)
+    assert pdf.startswith(b"%PDF")
+
+
+def test_concurrent_requests_share_one_render(monkeypatch):
+    renders = []
+    original = pdf_renderer.render_report
+
+    def counting_render(ticker, report):
+        renders.append(ticker)
+        return original(ticker, report)
+
+    monkeypatch.setattr(pdf_renderer, "render_report", counting_render)
+
+    async def requests():
+        return await asyncio.gather(*(pdf_renderer.render_pdf("AAPL", sample_result(), key="run-1") for _ in range(5)))
+
+    results = asyncio.run(requests())
+    assert len(set(results)) == 1
+    assert renders == ["AAPL"]
+    # Later requests for the same run come from the cache
+    asyncio.run(pdf_renderer.render_pdf("AAPL", sample_result(), key="run-1"))
+    assert renders == ["AAPL"]
+    assert pdf_renderer.cache_stats()["hits"] == 1
+
+
+def test_changed_inputs_render_again_without_a_key():
+    first = asyncio.run(pdf_renderer.render_pdf("AAPL", sample_result()))
+    asyncio.run(pdf_renderer.render_pdf("AAPL", {**sample_result(), "recommendation": "Sell"}))
+    assert pdf_renderer.cache_stats()["entries"] == 2
+    assert asyncio.run(pdf_renderer.render_pdf("AAPL", sample_result())) == first
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta
+import mongomock
+from backend.config import settings
+from backend.services.prewarm import PrewarmScheduler
+
+
+async def no_refresh(ticker):
+    return None
+
+
+def test_hot_tickers_combines_history_and_local_counts():
+    collection = mongomock.MongoClient().db.analyses
+    now = datetime.utcnow()
+    collection.insert_many(
+        [{"ticker": "aapl", "timestamp": now} for _ in range(3)]
+        + [{"ticker": "MSFT", "timestamp": now.isoformat()} for _ in range(2)]
+        + [{"ticker": "TSLA", "timestamp": now - timedelta(days=30)} for _ in range(10)]
+    )
+    scheduler = PrewarmScheduler(lambda: collection, no_refresh)
+    for _ in range(4):
+        scheduler.record_request("nvda")
+    assert scheduler.hot_tickers(limit=3) == ["NVDA", "AAPL", "MSFT"]
+
+
+def test_hot_tickers_without_mongo_uses_local_counts():
+    scheduler = PrewarmScheduler(lambda: None, no_refresh)
+    scheduler.record_request("amd")
+    assert scheduler.hot_tickers() == ["AMD"]
+
+
+def test_next_preopen_skips_the_weekend(monkeypatch):
+    monkeypatch.setattr(settings, "PREWARM_PREOPEN_MINUTES", "30,5")
+    scheduler = PrewarmScheduler(lambda: None, no_refresh)
+    # Saturday 2024-06-08 12:00 UTC -> Monday 09:00 ET (13:00 UTC, daylight saving time)
+    assert scheduler._next_preopen(datetime(2024, 6, 8, 12, 0)) == datetime(2024, 6, 10, 13, 0)
+    # Monday 13:10 UTC -> the second slot, 09:25 ET
+    assert scheduler._next_preopen(datetime(2024, 6, 10, 13, 10)) == datetime(2024, 6, 10, 13, 25)
+
+
+def test_one_worker_runs_each_cycle(cache, monkeypatch):
+    monkeypatch.setattr(settings, "PREWARM_CONCURRENCY", 2)
+    refreshed = []
+
+    async def refresh(ticker):
+        refreshed.append(ticker)
+
+    first = PrewarmScheduler(lambda: None, refresh)
+    second = PrewarmScheduler(lambda: None, refresh)
+    first.record_request("AAPL")
+    second.record_request("MSFT")
+
+    async def both():
+        await first.run_cycle()
+        await second.run_cycle()
+
+    asyncio.run(both())
+    assert refreshed == ["AAPL"]
+    assert first.status()["refreshed_total"] == 1
+
+
+def test_failed_refreshes_are_counted(cache):
+    async def refresh(ticker):
+        raise RuntimeError("upstream down")
+
+    scheduler = PrewarmScheduler(lambda: None, refresh)
+    scheduler.record_request("AAPL")
+    asyncio.run(scheduler.run_cycle())
+    assert scheduler.status()["failed_total"] == 1
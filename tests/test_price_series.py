@@ -0,0 +1,108 @@
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from backend.services import price_series
+from backend.services.price_series import PriceSeries
+
+
+def bar(stamp, close, high=None, low=None, open_=None, volume=100):
+    return {"datetime": stamp, "open": str(open_ if open_ is not None else close),
+            "high": str(high if high is not None else close), "low": str(low if low is not None else close),
+            "close": str(close), "volume": str(volume)}
+
+
+def daily(values):
+    # TwelveData order: newest first
+    return PriceSeries.from_twelvedata(list(reversed(values)), "1day")
+
+
+def test_parses_newest_first_rows_into_ascending_bars():
+    series = daily([bar("2024-06-03", 10), bar("2024-06-04", 11), bar("2024-06-05", 12)])
+    assert series.to_dict() == {"2024-06-03": 10.0, "2024-06-04": 11.0, "2024-06-05": 12.0}
+    assert series.last_close() == 12.0
+
+
+def test_malformed_rows_are_dropped_and_gaps_filled_from_close():
+    rows = [bar("2024-06-03", 10), {"datetime": "not a date", "close": "11"}, {"datetime": "2024-06-05", "close": "x"},
+            {"datetime": "2024-06-06", "close": "13"}]
+    series = PriceSeries.from_twelvedata(rows, "1day")
+    assert series.labels() == ["2024-06-03", "2024-06-06"]
+    assert series.high[-1] == 13.0 and series.volume[-1] == 0.0
+
+
+def test_weekly_resample_aggregates_ohlcv_from_monday():
+    # Thu 2024-06-06 .. Tue 2024-06-11: two ISO weeks
+    series = daily([
+        bar("2024-06-06", 10, high=11, low=9, open_=9.5, volume=100),
+        bar("2024-06-07", 12, high=13, low=10, volume=200),
+        bar("2024-06-10", 8, high=9, low=7, open_=8.5, volume=300),
+        bar("2024-06-11", 9, high=10, low=8, volume=400),
+    ])
+    weekly = series.resample("1week")
+    assert weekly.labels() == ["2024-06-03", "2024-06-10"]
+    assert weekly.open.tolist() == [9.5, 8.5]
+    assert weekly.high.tolist() == [13.0, 10.0]
+    assert weekly.low.tolist() == [9.0, 7.0]
+    assert weekly.close.tolist() == [12.0, 9.0]
+    assert weekly.volume.tolist() == [300.0, 700.0]
+
+
+def test_monthly_resample_uses_calendar_months():
+    series = daily([bar("2024-01-31", 1), bar("2024-02-01", 2), bar("2024-02-29", 3), bar("2024-03-01", 4)])
+    monthly = series.resample("1month")
+    assert monthly.labels() == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    assert monthly.close.tolist() == [1.0, 3.0, 4.0]
+
+
+def test_intraday_resample_to_hours():
+    rows = [bar(f"2024-06-03 09:{minute:02d}:00", 100 + minute) for minute in range(30, 60, 5)]
+    rows += [bar(f"2024-06-03 10:{minute:02d}:00", 200 + minute) for minute in range(0, 30, 5)]
+    series = PriceSeries.from_twelvedata(list(reversed(rows)), "5min")
+    hourly = series.resample("1h")
+    assert hourly.labels() == ["2024-06-03 09:00:00", "2024-06-03 10:00:00"]
+    assert hourly.close.tolist() == [155.0, 225.0]
+
+
+def test_resample_rejects_unknown_intervals():
+    with pytest.raises(ValueError):
+        PriceSeries.empty().resample("3day")
+
+
+def test_downsample_picks_the_finest_interval_that_fits():
+    rows = [bar(str(np.datetime64("2024-01-01") + i), 100 + i) for i in range(120)]
+    series = PriceSeries.from_twelvedata(rows, "1day")
+    assert len(series.downsample(200)) == 120
+    weekly = series.downsample(40)
+    assert weekly.interval == "1week" and len(weekly) <= 40
+    assert weekly.close[-1] == series.close[-1]
+
+
+def test_stats():
+    stats = daily([bar("2024-06-03", 100), bar("2024-06-04", 120), bar("2024-06-05", 90)]).stats()
+    assert stats["change_pct"] == pytest.approx(-10.0)
+    assert stats["max_drawdown_pct"] == pytest.approx(-25.0)
+    assert stats["bars"] == 3
+    assert PriceSeries.empty().stats() == {}
+
+
+def test_fingerprint_changes_with_the_data():
+    a = daily([bar("2024-06-03", 100)])
+    assert a.fingerprint() == daily([bar("2024-06-03", 100)]).fingerprint()
+    assert a.fingerprint() != daily([bar("2024-06-03", 101)]).fingerprint()
+
+
+def test_fetch_plan_for_weekly_and_intraday_views():
+    now = datetime(2024, 6, 7, 16, 0)
+    interval, params = price_series.fetch_plan("1week", 365, now)
+    assert interval == "1day" and params["outputsize"] == 264
+    assert params["start_date"] == "2023-06-08 16:00:00"
+    interval, params = price_series.fetch_plan("1min", 30, now)
+    assert interval == "1min" and params["outputsize"] == price_series.MAX_OUTPUTSIZE
+
+
+def test_series_of_falls_back_to_the_legacy_dict():
+    state = SimpleNamespace(prices={"2024-06-03": 10, "2024-06-04": 11})
+    assert price_series.series_of(state).last_close() == 11.0
+    assert len(price_series.series_of(SimpleNamespace())) == 0
+    assert price_series.normalize_interval("2day") == "1day"
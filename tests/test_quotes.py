@@ -0,0 +1,87 @@
+import asyncio
+import time
+import pytest
+from backend.config import settings
+from backend.services import quotes
+
+
+@pytest.fixture(autouse=True)
+def derived_interval(monkeypatch):
+    monkeypatch.setattr(settings, "QUOTE_POLL_SECONDS", 0)
+    monkeypatch.setattr(settings, "TWELVE_DATA_CREDITS_PER_MINUTE", 8)
+    monkeypatch.setattr(settings, "QUOTE_CREDIT_SHARE", 0.25)
+
+
+def test_poll_interval_is_derived_from_the_credit_budget(monkeypatch):
+    # 2 credits per minute for quotes: one symbol every 30s, ten symbols every 300s
+    assert quotes.poll_interval(1) == 30.0
+    assert quotes.poll_interval(10) == 300.0
+    monkeypatch.setattr(settings, "TWELVE_DATA_CREDITS_PER_MINUTE", 800)
+    assert quotes.poll_interval(1) == quotes.MIN_POLL_SECONDS
+    monkeypatch.setattr(settings, "QUOTE_POLL_SECONDS", 7)
+    assert quotes.poll_interval(10) == 7
+
+
+def test_interval_counts_symbols_of_every_worker(cache):
+    assert quotes.shared_interval(["AAPL"]) == 30.0
+    # Another worker polls two other symbols: both see three distinct symbols
+    assert quotes.shared_interval(["MSFT", "NVDA"]) == 90.0
+    assert quotes.shared_interval(["AAPL"]) == 90.0
+    # A symbol polled by two workers is only counted once
+    assert quotes.shared_interval(["AAPL", "MSFT"]) == 90.0
+
+
+def test_symbols_nobody_polls_stop_counting(cache):
+    cache.set(quotes.LIVE_SYMBOLS_KEY, {"OLD": time.time() - 3600, "MSFT": time.time()}, 60)
+    assert quotes.shared_interval(["AAPL"]) == 60.0
+    assert set(cache.get(quotes.LIVE_SYMBOLS_KEY)) == {"AAPL", "MSFT"}
+
+
+def test_shared_quote_fetches_once_per_interval(cache, monkeypatch):
+    calls = []
+    monkeypatch.setattr(quotes, "fetch_quote", lambda symbol, interval=None: calls.append(symbol) or
+                        {"type": "quote", "symbol": symbol, "price": 1.0, "ts": time.time()})
+    first = quotes.shared_quote("AAPL", 30)
+    assert quotes.shared_quote("AAPL", 30) == first
+    assert calls == ["AAPL"]
+
+
+def test_offer_drops_the_oldest_message():
+    queue = asyncio.Queue(maxsize=2)
+    for n in range(3):
+        quotes.offer(queue, {"n": n})
+    assert [queue.get_nowait()["n"] for _ in range(2)] == [1, 2]
+
+
+def test_one_poller_per_symbol_fans_out_to_all_subscribers(cache, monkeypatch):
+    polls = []
+
+    def fake_quote(symbol, interval=None):
+        polls.append(symbol)
+        return {"type": "quote", "symbol": symbol, "price": 1.0, "ts": len(polls)}
+
+    monkeypatch.setattr(quotes, "shared_quote", fake_quote)
+
+    async def scenario():
+        hub = quotes.QuoteHub()
+        first, second = hub.new_queue(), hub.new_queue()
+        hub.subscribe("AAPL", first)
+        hub.subscribe("AAPL", second)
+        received = await asyncio.wait_for(asyncio.gather(first.get(), second.get()), 2)
+        status = hub.status()
+        hub.unsubscribe_all(first)
+        assert hub.status()["symbols"] == 1
+        hub.unsubscribe("AAPL", second)
+        assert hub.status()["symbols"] == 0
+        await hub.stop()
+        return received, status
+
+    received, status = asyncio.run(scenario())
+    assert received[0] == received[1]
+    assert polls == ["AAPL"]
+    assert status["subscriptions"] == 2 and status["feeds"]["AAPL"]["subscribers"] == 2
+
+
+def test_parse_symbols():
+    assert quotes.parse_symbols("aapl, msft,,bad symbol,BRK.B") == {"AAPL", "MSFT", "BRK.B"}
+    assert quotes.parse_symbols(["nvda", "NVDA"]) == {"NVDA"}
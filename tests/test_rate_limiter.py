@@ -0,0 +1,90 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from backend.services import rate_limiter
+from backend.services.rate_limiter import PriorityTokenBucket
+
+
+def slow_bucket() -> PriorityTokenBucket:
+    # One token, refilled every 100 seconds: only refunds release waiters during a test
+    return PriorityTokenBucket("test", per_minute=0.6, burst=1)
+
+
+def wait_for_queue(bucket: PriorityTokenBucket, size: int) -> None:
+    for _ in range(200):
+        if bucket.snapshot()["queued"] == size:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"expected {size} queued callers")
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    bucket = slow_bucket()
+    assert bucket.acquire(1, timeout=0)
+    served = []
+    threads = []
+    for name, priority in [("bg", "background"), ("batch", "batch"), ("ui-1", "interactive"), ("ui-2", "interactive")]:
+        thread = threading.Thread(target=lambda n=name, p=priority: bucket.acquire(1, p, timeout=5) and served.append(n))
+        thread.start()
+        threads.append(thread)
+        wait_for_queue(bucket, len(threads))
+    for expected in range(1, 5):
+        bucket.refund(1)
+        for _ in range(200):
+            if len(served) == expected:
+                break
+            time.sleep(0.01)
+    for thread in threads:
+        thread.join(5)
+    assert served == ["ui-1", "ui-2", "batch", "bg"]
+
+
+def test_timeouts_and_skips_are_counted_separately():
+    bucket = slow_bucket()
+    assert bucket.acquire(1, timeout=0)
+    assert not bucket.acquire(1, timeout=0)
+    assert not bucket.acquire(1, timeout=0.05)
+    snapshot = bucket.snapshot()
+    assert snapshot["skipped_total"] == 1
+    assert snapshot["timed_out_total"] == 1
+    assert snapshot["granted_total"] == 1
+
+
+def test_refund_is_capped_at_capacity():
+    bucket = PriorityTokenBucket("test", per_minute=0.6, burst=2)
+    assert bucket.acquire(1, timeout=0)
+    bucket.refund(5)
+    assert bucket.snapshot()["tokens_available"] == pytest.approx(2.0, abs=0.01)
+
+
+def test_refund_wakes_a_waiter():
+    bucket = slow_bucket()
+    assert bucket.acquire(1, timeout=0)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(bucket.acquire(1, timeout=5)))
+    thread.start()
+    wait_for_queue(bucket, 1)
+    bucket.refund(1)
+    thread.join(1)
+    assert result == [True]
+
+
+def test_cost_larger_than_capacity_is_capped():
+    bucket = PriorityTokenBucket("test", per_minute=60, burst=10)
+    assert bucket.acquire(50, timeout=0)
+
+
+def test_acquire_for_uses_the_run_priority_and_budget(monkeypatch):
+    calls = []
+    monkeypatch.setattr(rate_limiter, "acquire", lambda *args: calls.append(args) or True)
+    state = SimpleNamespace(priority="interactive", deadline_at=time.time() + 5)
+    assert rate_limiter.acquire_for(state, "tavily", 2, reserve=1)
+    provider, cost, priority, timeout = calls[0]
+    assert (provider, cost, priority) == ("tavily", 2, "interactive")
+    assert timeout <= 5 - 1 - 1
+
+
+def test_estimate_tokens():
+    messages = [{"role": "user", "content": "x" * 400}]
+    assert rate_limiter.estimate_tokens(messages, 100) == 200
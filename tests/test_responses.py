@@ -0,0 +1,51 @@
+import json
+import pytest
+from fastapi import HTTPException
+from backend.services import responses
+from backend.services.responses import select_fields
+
+PAYLOAD = {"ticker": "AAPL", "price": 190.5, "trend": {"direction": "Uptrend", "strength": "Moderate"},
+           "news": [{"title": "t"}]}
+
+
+def test_no_fields_returns_everything():
+    assert select_fields(PAYLOAD, None) is PAYLOAD
+    assert select_fields(PAYLOAD, " , ") is PAYLOAD
+
+
+def test_top_level_and_dotted_fields():
+    assert select_fields(PAYLOAD, "price, ticker") == {"price": 190.5, "ticker": "AAPL"}
+    assert select_fields(PAYLOAD, "trend.direction") == {"trend": {"direction": "Uptrend"}}
+    assert select_fields(PAYLOAD, "trend.direction,trend.strength") == {"trend": PAYLOAD["trend"]}
+
+
+def test_missing_nested_paths_are_skipped():
+    assert select_fields(PAYLOAD, "trend.risk,price") == {"price": 190.5}
+    assert select_fields(PAYLOAD, "price.value") == {}
+
+
+def test_unknown_top_level_field_is_a_400():
+    with pytest.raises(HTTPException) as error:
+        select_fields(PAYLOAD, "price,bogus")
+    assert error.value.status_code == 400
+    assert "bogus" in error.value.detail
+
+
+def test_fast_json_response_renders_non_json_types():
+    import numpy as np
+    from datetime import datetime
+    body = responses.FastJSONResponse({"when": datetime(2024, 6, 7), "close": np.float64(1.5), 1: "x"}).body
+    decoded = json.loads(body)
+    assert decoded["close"] == 1.5 and decoded["1"] == "x" and decoded["when"].startswith("2024-06-07")
+
+
+def test_fields_on_the_analysis_route(client):
+    resp = client.get("/analyze/AAPL", params={"fields": "price,trend.direction"})
+    assert resp.status_code == 200
+    assert resp.json() == {"price": 190.5, "trend": {"direction": "Uptrend"}}
+    assert client.get("/analyze/AAPL", params={"fields": "nope"}).status_code == 400
+
+
+def test_fields_on_post_routes(client):
+    resp = client.post("/analyze", params={"fields": "ticker,recommendation"}, json={"ticker": "AAPL"})
+    assert resp.json() == {"ticker": "AAPL", "recommendation": "Buy"}
@@ -0,0 +1,132 @@
+import threading
+import time
+import mongomock
+import pytest
+from backend.services import shared_cache
+
+
+@pytest.fixture(params=["sqlite", "mongo"])
+def backend(request, tmp_path, monkeypatch):
+    if request.param == "sqlite":
+        return shared_cache.SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr("pymongo.MongoClient", mongomock.MongoClient)
+    return shared_cache.MongoCache("mongodb://localhost", "echomarket_test")
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        shared_cache.SharedCache()
+
+
+def test_entries_expire(backend):
+    backend.set("k", {"a": 1}, ttl=0.2)
+    assert backend.get("k") == {"a": 1}
+    time.sleep(0.3)
+    assert backend.get("k") is None
+    backend.set("k", [1, 2], ttl=60)
+    backend.delete("k")
+    assert backend.get("k") is None
+
+
+def test_lease_is_exclusive_until_released_or_expired(backend):
+    token = backend.acquire_lease("job", ttl=0.3)
+    assert token
+    assert backend.acquire_lease("job", ttl=0.3) is None
+    # Only the owner can release it
+    backend.release_lease("job", "someone-else")
+    assert backend.acquire_lease("job", ttl=0.3) is None
+    backend.release_lease("job", token)
+    token = backend.acquire_lease("job", ttl=0.3)
+    assert token
+    time.sleep(0.4)
+    assert backend.acquire_lease("job", ttl=0.3)
+
+
+def test_get_or_compute_caches_the_result(backend):
+    calls = []
+    compute = lambda: calls.append(1) or {"v": len(calls)}
+    assert backend.get_or_compute("k", compute, ttl=60) == {"v": 1}
+    assert backend.get_or_compute("k", compute, ttl=60) == {"v": 1}
+    assert len(calls) == 1
+
+
+def test_get_or_compute_does_not_cache_none(backend):
+    calls = []
+    assert backend.get_or_compute("k", lambda: calls.append(1), ttl=60) is None
+    assert backend.get_or_compute("k", lambda: calls.append(1), ttl=60) is None
+    assert len(calls) == 2
+
+
+def test_concurrent_callers_compute_once(backend):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {"v": 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(backend.get_or_compute("k", compute, ttl=60, poll_interval=0.02)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert results == [{"v": 1}] * 5
+    assert len(calls) == 1
+
+
+def test_force_recomputes_under_the_lease(backend):
+    backend.set("k", {"v": "old"}, ttl=60)
+    assert backend.get_or_compute("k", lambda: {"v": "new"}, ttl=60, force=True) == {"v": "new"}
+    assert backend.get("k") == {"v": "new"}
+
+
+def test_force_yields_to_a_refresh_in_progress(backend):
+    backend.set("k", {"v": "old"}, ttl=60)
+    token = backend.acquire_lease("k", ttl=60)
+    calls = []
+    assert backend.get_or_compute("k", lambda: calls.append(1), ttl=60, force=True) is None
+    assert not calls
+    backend.release_lease("k", token)
+
+
+def test_waiter_computes_locally_when_the_holder_is_stuck(backend):
+    backend.acquire_lease("k", ttl=60)
+    started = time.monotonic()
+    value = backend.get_or_compute("k", lambda: {"v": "local"}, ttl=60, wait_timeout=0.2, poll_interval=0.05)
+    assert value == {"v": "local"}
+    assert 0.2 <= time.monotonic() - started < 1.0
+
+
+def test_waiter_picks_up_the_holders_result(backend):
+    token = backend.acquire_lease("k", ttl=60)
+
+    def finish():
+        time.sleep(0.1)
+        backend.set("k", {"v": "theirs"}, ttl=60)
+        backend.release_lease("k", token)
+
+    threading.Thread(target=finish).start()
+    calls = []
+    value = backend.get_or_compute("k", lambda: calls.append(1) or {"v": "mine"}, ttl=60, wait_timeout=2, poll_interval=0.02)
+    assert value == {"v": "theirs"}
+    assert not calls
+
+
+def test_null_cache_never_stores():
+    cache = shared_cache.NullCache()
+    cache.set("k", 1, ttl=60)
+    assert cache.get("k") is None
+    assert cache.acquire_lease("k", 60) and cache.acquire_lease("k", 60)
+
+
+def test_sqlite_default_path_is_under_the_data_dir(tmp_path, monkeypatch):
+    from backend.config import settings
+    monkeypatch.setattr(settings, "SHARED_CACHE_BACKEND", "sqlite")
+    monkeypatch.setattr(settings, "SHARED_CACHE_PATH", "")
+    monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(shared_cache, "_cache", None)
+    cache = shared_cache.get_cache()
+    assert isinstance(cache, shared_cache.SQLiteCache)
+    assert cache.path == str(tmp_path / "data" / "cache.sqlite3")
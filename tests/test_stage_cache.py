@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+from backend.agents import sentiment, trend
+from backend.services import llm_gateway, stage_cache
+from backend.services.price_series import PriceSeries
+
+
+def counting_stage(cacheable=None):
+    calls = []
+
+    @stage_cache.reuse_if_unchanged("test", lambda state: {"x": state.x}, cacheable=cacheable)
+    def stage(state):
+        calls.append(state.x)
+        return {"out": state.x * 2}
+
+    return stage, calls
+
+
+def test_unchanged_inputs_reuse_the_stored_result(cache):
+    stage, calls = counting_stage()
+    assert stage(SimpleNamespace(x=1)) == {"out": 2}
+    assert stage(SimpleNamespace(x=1)) == {"out": 2}
+    assert stage(SimpleNamespace(x=2)) == {"out": 4}
+    assert calls == [1, 2]
+
+
+def test_rejected_outputs_are_not_stored(cache):
+    stage, calls = counting_stage(cacheable=lambda out: False)
+    stage(SimpleNamespace(x=1))
+    stage(SimpleNamespace(x=1))
+    assert calls == [1, 1]
+
+
+def test_fingerprint_ignores_key_order():
+    assert stage_cache.fingerprint("s", {"a": 1, "b": 2}) == stage_cache.fingerprint("s", {"b": 2, "a": 1})
+    assert stage_cache.fingerprint("s", {"a": 1}) != stage_cache.fingerprint("t", {"a": 1})
+
+
+def price_state():
+    prices = {f"2024-06-{day:02d}": 100.0 + day for day in range(3, 8)}
+    return SimpleNamespace(ticker="AAPL", price=107.0, price_series=PriceSeries.from_dict(prices), deadline_at=None)
+
+
+def test_trend_fallback_is_flagged_and_not_reused(cache, monkeypatch):
+    calls = []
+
+    def unavailable(*args, **kwargs):
+        calls.append(1)
+        raise llm_gateway.LLMUnavailable("down")
+
+    monkeypatch.setattr(llm_gateway, "run", unavailable)
+    out = trend.trend_agent(price_state())
+    assert out["trend"]["fallback"] is True
+    assert out["trend"]["direction"] == "Uptrend"
+    trend.trend_agent(price_state())
+    assert len(calls) == 2
+
+
+def test_llm_trend_is_reused(cache, monkeypatch):
+    calls = []
+    answer = {"direction": "Uptrend", "strength": "Strong", "confidence": 0.8}
+    monkeypatch.setattr(llm_gateway, "run", lambda *args, **kwargs: calls.append(1) or dict(answer))
+    assert trend.trend_agent(price_state()) == {"trend": answer}
+    assert trend.trend_agent(price_state()) == {"trend": answer}
+    assert len(calls) == 1
+
+
+def test_no_data_trend_is_a_fallback(cache):
+    out = trend.trend_agent(SimpleNamespace(ticker="AAPL", price=None))
+    assert out["trend"]["direction"] == "Unknown"
+    assert not trend._is_llm_trend(out)
+
+
+def test_sentiment_fingerprint_follows_extracted_text():
+    def state(content):
+        return SimpleNamespace(ticker="AAPL", news=[{"url": "https://a"}],
+                               extracted_content=[{"url": "https://a", "content": content}])
+    first = sentiment._sentiment_inputs(state("Revenue up 10%"))
+    assert sentiment._sentiment_inputs(state("Revenue up 10%")) == first
+    assert sentiment._sentiment_inputs(state("Revenue down 10%")) != first
@@ -0,0 +1,43 @@
+import time
+from datetime import datetime, timedelta
+from backend import main
+from tests.helpers import sample_result, wait_for
+
+
+def test_miss_runs_the_pipeline_at_interactive_priority(client, pipeline):
+    body = client.get("/ui/analyze/AAPL").json()
+    assert pipeline == [("AAPL", "interactive", "deep")]
+    assert body["stale"] is False
+    # The fresh result is served from the cache from now on
+    client.get("/ui/analyze/AAPL")
+    assert len(pipeline) == 1
+
+
+def test_expired_result_is_served_stale_while_refreshing(client, pipeline, cache):
+    cache.set(main.analysis_key("AAPL", last=True), {**sample_result(), "analyzed_at": time.time() - 600}, 3600)
+    body = client.get("/ui/analyze/AAPL").json()
+    assert body["stale"] is True
+    assert body["age_seconds"] >= 600
+    assert wait_for(lambda: pipeline == [("AAPL", "default", "deep")])
+    assert wait_for(lambda: cache.get(main.analysis_key("AAPL")) is not None)
+
+
+def test_stored_analysis_is_served_when_the_cache_is_empty(client, pipeline, mongo):
+    mongo.insert_one({**sample_result(), "recommendation": "Hold", "timestamp": datetime.utcnow() - timedelta(minutes=5)})
+    body = client.get("/ui/analyze/aapl").json()
+    assert body["stale"] is True
+    assert body["recommendation"] == "Hold"
+
+
+def test_stored_analysis_older_than_max_age_is_not_served(client, pipeline, mongo):
+    mongo.insert_one({**sample_result(), "timestamp": datetime.utcnow() - timedelta(days=2)})
+    body = client.get("/ui/analyze/AAPL").json()
+    assert body["stale"] is False
+    assert pipeline == [("AAPL", "interactive", "deep")]
+
+
+def test_swr_can_be_turned_off_per_request(client, pipeline, cache):
+    cache.set(main.analysis_key("AAPL", last=True), {**sample_result(), "analyzed_at": time.time() - 600}, 3600)
+    body = client.get("/ui/analyze/AAPL", params={"swr": "false"}).json()
+    assert body["stale"] is False
+    assert pipeline == [("AAPL", "interactive", "deep")]
@@ -0,0 +1,60 @@
+import pytest
+from backend.services.symbols import SUGGEST_MAX_LIMIT, SymbolIndex
+
+
+@pytest.fixture
+def index():
+    index = SymbolIndex()
+    index.add("GM", "General Motors Company", "NYSE")
+    index.add("GE", "General Electric Company", "NYSE")
+    index.add("GME", "GameStop Corp.", "NYSE")
+    index.add("TSLA", "Tesla, Inc.", "NASDAQ", ["Tesla Motors"])
+    index.add("AAPL", "Apple Inc.", "NASDAQ", ["Apple"])
+    return index
+
+
+def tickers(results):
+    return [r["ticker"] for r in results]
+
+
+def test_ticker_prefixes_rank_before_names(index):
+    results = index.suggest("gm")
+    assert tickers(results)[:2] == ["GM", "GME"]
+    assert {r["match"] for r in results[:2]} == {"ticker"}
+
+
+def test_name_prefix_and_single_word_token(index):
+    assert tickers(index.suggest("general m")) == ["GM"]
+    # "motors" is the second word of both names; each company is listed once
+    assert sorted(tickers(index.suggest("motors"))) == ["GM", "TSLA"]
+    assert index.suggest("motors")[0]["match"] == "token"
+
+
+def test_stopwords_are_dropped_except_the_word_being_typed(index):
+    assert tickers(index.suggest("the apple")) == ["AAPL"]
+
+
+def test_limit_is_clamped(index):
+    assert len(index.suggest("g", limit=1)) == 1
+    assert len(index.suggest("g", limit=0)) == 1
+    for i in range(SUGGEST_MAX_LIMIT + 5):
+        index.add(f"Z{i:03d}", f"Zeta {i}")
+    assert len(index.suggest("z", limit=1000)) == SUGGEST_MAX_LIMIT
+
+
+def test_additions_show_up_in_suggestions(index):
+    assert index.suggest("nvid") == []
+    index.add("NVDA", "NVIDIA Corporation", "NASDAQ")
+    assert tickers(index.suggest("nvid")) == ["NVDA"]
+
+
+def test_empty_query(index):
+    assert index.suggest("") == []
+    assert index.suggest("  ,. ") == []
+
+
+def test_suggest_endpoint(client):
+    body = client.get("/symbols/suggest", params={"q": "micro", "limit": 3}).json()
+    assert body["query"] == "micro"
+    assert "MSFT" in tickers(body["suggestions"])
+    assert len(body["suggestions"]) <= 3
@@ -0,0 +1,56 @@
+import pytest
+from backend.config import settings
+from backend.services import symbols
+from backend.services.symbols import SymbolIndex
+
+
+@pytest.fixture
+def index():
+    index = SymbolIndex()
+    index.add("AAPL", "Apple Inc.", "NASDAQ", ["Apple", "Apple Computer"])
+    index.add("MSFT", "Microsoft Corporation", "NASDAQ", ["Microsoft"])
+    index.add("GM", "General Motors Company", "NYSE")
+    index.add("TGT", "Target Corporation", "NYSE", ["Target"])
+    index.add("BRK.B", "Berkshire Hathaway Inc. Class B", "NYSE", ["Berkshire Hathaway"])
+    return index
+
+
+def test_normalize_drops_suffixes_and_punctuation():
+    assert symbols.normalize("Apple Inc.") == "apple"
+    assert symbols.normalize("The Procter & Gamble Company") == "procter & gamble"
+
+
+def test_lookup_by_ticker_name_alias_and_fuzzy(index):
+    assert index.lookup("brk.b")["ticker"] == "BRK.B"
+    assert index.lookup("brk.b")["match"] == "ticker"
+    assert index.lookup("Microsoft Corp")["match"] == "exact"
+    assert index.lookup("apple computer")["ticker"] == "AAPL"
+    fuzzy = index.lookup("Microsfot")
+    assert fuzzy["ticker"] == "MSFT" and fuzzy["match"] == "fuzzy"
+    assert index.lookup("Completely Unknown Holdings") is None
+    assert index.lookup("   ") is None
+
+
+def test_first_listing_keeps_a_shared_name(index):
+    index.add("AAPL.X", "Apple Inc.")
+    assert index.lookup("Apple")["ticker"] == "AAPL"
+
+
+def test_mentions_only_match_capitalised_names(index):
+    assert index.mentions("Apple and General Motors rallied") == {"AAPL", "GM"}
+    assert index.mentions("analysts raised their price target") == set()
+
+
+def test_learned_symbols_persist_under_the_data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(settings, "SYMBOL_LEARNED_PATH", "")
+    SymbolIndex().learn("Acme Rockets", "ACME")
+    reloaded = SymbolIndex()
+    reloaded.load_csv(str(tmp_path / "data" / "symbols_learned.csv"))
+    assert reloaded.lookup("acme rockets")["ticker"] == "ACME"
+
+
+def test_bundled_listing_loads():
+    index = SymbolIndex()
+    assert index.load_csv(symbols.DEFAULT_LISTING) > 100
+    assert index.lookup("Google")["ticker"] == "GOOGL"